@@ -12,14 +12,41 @@ from datetime import datetime, timedelta
 
 # Third-party imports
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, jsonify, Response, stream_with_context, abort
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.http import is_resource_modified
 from sqlalchemy import text
+from sqlalchemy.orm import deferred, defer, undefer_group
 from PIL import Image, ImageDraw, ImageFont
 import requests
 
+# Local imports
+import nutrition_db
+import meal_planner
+import health_metrics
+import gemini_parser
+import gemini_client
+import rollups
+import metrics
+import db_pool
+import db_routing
+import db_sqlite
+import structured_logging
+import profiling
+import query_guard
+import purge
+import data_export
+import assets
+import compression
+import template_cache
+import result_cache
+import passwords
+import ratelimit
+import cassettes
+import uploads
+from compressed_text import CompressedText
+
 # Load environment variables from .env file first
 load_dotenv()
 
@@ -27,6 +54,10 @@ load_dotenv()
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'CHANDAN')
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'chandan...$$$')
 
+# External API endpoints (overridable so benchmarks can point at local fake servers;
+# the Gemini endpoint and models are configured in gemini_client.py)
+RESEND_API_URL = os.getenv('RESEND_API_URL', 'https://api.resend.com/emails')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key_change_in_production')  # Use environment variable or default
 
@@ -45,6 +76,9 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Connection pool sizing, pre-ping health checks and statement timeouts (see db_pool.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
 # Configure file upload settings
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -53,7 +87,45 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 # Create uploads directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-db = SQLAlchemy(app)
+# Optional read replica for read-only views (DATABASE_REPLICA_URL, see db_routing.py)
+db_routing.configure(app)
+
+db = SQLAlchemy(app, session_options={'class_': db_routing.RoutingSession})
+
+# Request latency, DB query and outbound call metrics (served at /metrics)
+metrics.init_app(app)
+db_pool.init_app(app, db)
+
+# WAL, pragmas and the single-writer queue when running on a SQLite file (see db_sqlite.py)
+db_sqlite.init_app(app, db)
+db_routing.init_app(app, db)
+
+# Structured JSON logging with per-request ids (see structured_logging.py)
+structured_logging.init_app(app)
+logger = structured_logging.get_logger()
+# Per-request chatter on hot paths is sampled; warnings and errors always pass
+hot_logger = structured_logging.get_logger('hot', sample_rate=structured_logging.HOT_PATH_SAMPLE_RATE)
+
+# Opt-in phase timing and slow-request sampling (PROFILE_REQUESTS=1)
+profiling.init_app(app)
+
+# SQL statement budgets and N+1 / template lazy-load detection (QUERY_GUARD=warn|raise|off)
+query_guard.init_app(app)
+
+# Minified, fingerprinted CSS/JS from static/ with immutable caching (see assets.py)
+assets.init_app(app)
+
+# Shared Jinja bytecode cache and opt-in {% cache %} fragments (see template_cache.py)
+template_cache.init_app(app)
+
+# ETag/rendered-page cache for /result/<id> permalinks (see result_cache.py)
+result_cache.init_app(app)
+
+# gzip/brotli response compression and optional HTML minification (see compression.py)
+compression.init_app(app)
+
+# Record/replay of Gemini and Resend traffic (CASSETTE_MODE=record|replay, see cassettes.py)
+cassettes.init_app(app)
 
 # Database models
 class User(db.Model):
@@ -64,21 +136,43 @@ class User(db.Model):
     gender = db.Column(db.String(10), nullable=False)
     password = db.Column(db.String(200), nullable=False)
     verified = db.Column(db.Boolean, default=False, nullable=False)
-    health_data = db.relationship('HealthData', backref='user', lazy=True)
+    # Lazy per user: pages listing many users must use selectinload(User.health_data)
+    # (query_guard reports the N+1 otherwise)
+    # passive_deletes: the database cascades (ON DELETE CASCADE), purge.py deletes in chunks
+    health_data = db.relationship('HealthData', backref='user', lazy=True, passive_deletes=True)
 
 class HealthData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     age = db.Column(db.Integer, nullable=False)
     height = db.Column(db.Float, nullable=False)
     weight = db.Column(db.Float, nullable=False)
     food_image = db.Column(db.String(255), nullable=True)
     food_name = db.Column(db.String(100), nullable=True)
-    nutrition_info = db.Column(db.Text, nullable=True)
-    assessment = db.Column(db.Text, nullable=True)
-    diet_plan = db.Column(db.Text, nullable=True)
-    recommendation = db.Column(db.Text, nullable=True)
+    # Gemini analysis text is large and only needed when showing a result;
+    # deferred as one group so reading any of them loads all four in one query,
+    # and stored compressed (decompressed only when that query runs)
+    nutrition_info = deferred(db.Column(CompressedText, nullable=True), group='analysis')
+    assessment = deferred(db.Column(CompressedText, nullable=True), group='analysis')
+    diet_plan = deferred(db.Column(CompressedText, nullable=True), group='analysis')
+    recommendation = deferred(db.Column(CompressedText, nullable=True), group='analysis')
+    bmi = db.Column(db.Float, nullable=True)
+    bmr = db.Column(db.Float, nullable=True)
+
+class NutritionRollup(db.Model):
+    """Per-user daily/weekly nutrition totals, maintained by rollups.record_meal()"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    period = db.Column(db.String(5), nullable=False)  # 'day' or 'week'
+    period_start = db.Column(db.Date, nullable=False)
+    meals = db.Column(db.Integer, default=0, nullable=False)
+    calories = db.Column(db.Float, default=0.0, nullable=False)
+    protein_g = db.Column(db.Float, default=0.0, nullable=False)
+    carbs_g = db.Column(db.Float, default=0.0, nullable=False)
+    fat_g = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('user_id', 'period', 'period_start', name='uq_rollup_user_period'),)
 
 class PasswordReset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -96,15 +190,19 @@ class EmailVerification(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
     used = db.Column(db.Boolean, default=False, nullable=False)
 
+# Everything purge.py deletes for an account
+PURGE_MODELS = purge.PurgeModels(User, HealthData, NutritionRollup, PasswordReset, EmailVerification)
+
+# Periodic removal of upload files no health data row references (UPLOAD_GC_INTERVAL, see uploads.py)
+uploads.init_app(app, lambda: purge.delete_orphan_uploads(db.session, HealthData, app.config['UPLOAD_FOLDER']))
+
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def calculate_bmi(weight, height):
-    # Height in meters (convert from cm)
-    height_m = height / 100
-    bmi = weight / (height_m * height_m)
-    return round(bmi, 2)
+    # Height in cm, weight in kg (see health_metrics for the array version)
+    return round(float(health_metrics.bmi(weight, height)), 2)
 
 # CAPTCHA generation function
 def generate_captcha():
@@ -179,17 +277,12 @@ def send_verification_email(email, otp_code):
         
         # Check if Resend API key is configured
         if not resend_api_key:
-            print(f"⚠️  Email not configured. Cannot send OTP to {email}")
-            print(f"   RESEND_API_KEY: NOT SET")
-            print(f"   Environment: {'PRODUCTION (Render)' if os.getenv('DATABASE_URL') else 'LOCAL'}")
-            print(f"   Please configure RESEND_API_KEY in Render Environment Variables:")
-            print(f"   - Go to Render Dashboard → Your Service → Environment tab")
-            print(f"   - Add: RESEND_API_KEY = your-resend-api-key")
-            print(f"   - Get API key from: https://resend.com/api-keys")
+            logger.warning("Email not configured, RESEND_API_KEY is not set (get one at https://resend.com/api-keys)",
+                           extra={'email': email, 'environment': 'production' if os.getenv('DATABASE_URL') else 'local'})
             return False
         
         # Resend API endpoint (HTTPS-based, no SMTP needed)
-        resend_api_url = "https://api.resend.com/emails"
+        resend_api_url = RESEND_API_URL
         
         # Email content
         email_subject = "Verify Your Email - Food Insight"
@@ -217,7 +310,7 @@ Food Insight Team"""
         # Remove these lines in production
         test_mode = os.getenv('TEST_MODE', 'false').lower() == 'true'
         if test_mode:
-            print(f"⚠️  TEST MODE: Redirecting email from {email} to your verified email")
+            logger.warning("TEST_MODE: redirecting verification email to the sender address", extra={'email': email})
             email = from_email
         
         payload = {
@@ -233,62 +326,49 @@ Food Insight Team"""
             "Content-Type": "application/json"
         }
         
-        # Log email attempt
-        print(f"📧 Attempting to send email to {email} via Resend API")
-        print(f"   Environment: {'PRODUCTION (Render)' if os.getenv('DATABASE_URL') else 'LOCAL'}")
+        logger.info("Sending verification email via Resend", extra={'email': email})
         
         # Send email via Resend API (HTTPS request - no SMTP needed)
         try:
-            response = requests.post(
-                resend_api_url,
-                headers=headers,
-                json=payload,
-                timeout=10  # 10 second timeout
-            )
+            with metrics.outbound_timer('resend') as call:
+                response = requests.post(
+                    resend_api_url,
+                    headers=headers,
+                    json=payload,
+                    timeout=10  # 10 second timeout
+                )
+                call['status'] = response.status_code
             
             # Check response status
             if response.status_code == 200:
-                print(f"✓ Verification OTP sent to {email} via Resend API")
+                logger.info("Verification OTP sent", extra={'email': email})
                 return True
             else:
                 # Resend API returned an error
                 error_data = response.json() if response.text else {}
                 error_message = error_data.get('message', f'HTTP {response.status_code}')
-                print(f"❌ Resend API error: {error_message}")
-                print(f"   Status code: {response.status_code}")
-                print(f"   Response: {response.text[:200]}")
-                
-                # Provide helpful error message for unverified emails
+                # Point at the fix for the common unverified sender/domain errors
+                hint = None
                 if 'not a valid sender' in str(error_data).lower():
-                    print("\n⚠️  Error: The 'from' email address is not verified in your Resend account.")
-                    print("   Please verify your email address in the Resend dashboard:")
-                    print("   https://resend.com/email-verification")
+                    hint = "verify the 'from' address at https://resend.com/email-verification"
                 elif 'not authorized' in str(error_data).lower():
-                    print("\n⚠️  Error: The recipient's email domain is not verified.")
-                    print("   In test mode, you can only send to verified email addresses.")
-                    print("   For production, verify your domain in the Resend dashboard:")
-                    print("   https://resend.com/domains")
+                    hint = "verify the recipient domain at https://resend.com/domains"
+                logger.error("Resend API error: %s", error_message,
+                             extra={'status': response.status_code, 'response': response.text[:200], 'hint': hint})
                 return False
                 
         except requests.exceptions.Timeout:
-            print(f"❌ Resend API request timeout for {email}")
-            print(f"   API request took too long (>10 seconds)")
+            logger.error("Resend API request timed out (>10 seconds)", extra={'email': email})
             return False
         except requests.exceptions.ConnectionError as e:
-            print(f"❌ Resend API connection error: {e}")
-            print(f"   Could not connect to Resend API")
+            logger.error("Could not connect to Resend API: %s", e)
             return False
         except requests.exceptions.RequestException as e:
-            print(f"❌ Resend API request error: {e}")
-            print(f"   Error type: {type(e).__name__}")
+            logger.error("Resend API request error: %s", e, extra={'error_type': type(e).__name__})
             return False
         
     except Exception as e:
-        error_msg = f"Error sending email via Resend: {str(e)}"
-        print(f"❌ {error_msg}")
-        print(f"   Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error sending email via Resend: %s", e)
         return False
 
 def analyze_food_with_gemini(image_path, user_data):
@@ -296,16 +376,8 @@ def analyze_food_with_gemini(image_path, user_data):
     Analyze food image using Google's Gemini API
     """
     try:
-        # Debug: Print current working directory and environment
-        print("\n=== Debug Information ===")
-        print(f"Current working directory: {os.getcwd()}")
-        print(f"Environment variables: {os.environ.get('GEMINI_API_KEY', 'Not found')}")
-        
         # Google Gemini API settings
         API_KEY = os.getenv('GEMINI_API_KEY')
-        print(f"API Key loaded: {'Yes' if API_KEY else 'No'}")
-        if API_KEY:
-            print(f"API Key starts with: {API_KEY[:5]}...")
             
         if not API_KEY:
             # Try to load from .env file directly as a fallback
@@ -313,7 +385,7 @@ def analyze_food_with_gemini(image_path, user_data):
                 from dotenv import load_dotenv
                 load_dotenv()
                 API_KEY = os.getenv('GEMINI_API_KEY')
-                print(f"After dotenv load - API Key: {'Yes' if API_KEY else 'No'}")
+                logger.info("Reloaded .env for GEMINI_API_KEY", extra={'configured': bool(API_KEY)})
                 if not API_KEY:
                     raise ValueError("""
                     GEMINI_API_KEY environment variable not found.
@@ -323,12 +395,10 @@ def analyze_food_with_gemini(image_path, user_data):
             except ImportError:
                 raise ImportError("python-dotenv package is required. Please install it with: pip install python-dotenv")
             
-        API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-        print(f"Using API URL: {API_URL}")
-        print("=========================\n")
+        hot_logger.debug("Calling Gemini", extra={'model': gemini_client.PRIMARY_MODEL, 'image': os.path.basename(image_path)})
         
         # Read the image file and convert to base64
-        with open(image_path, "rb") as image_file:
+        with profiling.span('base64'), open(image_path, "rb") as image_file:
             image_bytes = image_file.read()
             image_base64 = base64.b64encode(image_bytes).decode("utf-8")
         
@@ -376,28 +446,29 @@ def analyze_food_with_gemini(image_path, user_data):
                     ]
                 }
             ],
+            # Sampling settings come from gemini_client.GENERATION_CONFIG
             "generation_config": {
-                "temperature": 0.4,
-                "top_p": 0.95,
-                "top_k": 40
+                # Ask for raw JSON matching the schema instead of free text
+                "response_mime_type": "application/json",
+                "response_schema": gemini_parser.RESPONSE_SCHEMA
             }
         }
         
-        # Make the API request
-        response = requests.post(
-            f"{API_URL}?key={API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json=payload
-        )
+        # Make the API request (routed to the primary/fallback model, hedged if enabled)
+        with profiling.span('gemini'), metrics.outbound_timer('gemini') as call:
+            response, model = gemini_client.generate_content(payload, API_KEY)
+            call['status'] = response.status_code
+        hot_logger.debug("Gemini answered", extra={'model': model, 'status': response.status_code})
         
         # Check if request was successful
         if response.status_code == 200:
-            response_data = response.json()
+            with profiling.span('json_decode'):
+                response_data = response.json()
             
             # Check for API errors in the response
             if 'error' in response_data:
                 error_msg = response_data.get('error', {}).get('message', 'Unknown API error')
-                print(f"Gemini API error: {error_msg}")
+                logger.error("Gemini API error: %s", error_msg)
                 if 'API key' in error_msg:
                     raise ValueError("Invalid or missing Gemini API key. Please check your GEMINI_API_KEY environment variable.")
                 elif 'quota' in error_msg.lower():
@@ -409,47 +480,10 @@ def analyze_food_with_gemini(image_path, user_data):
             if 'candidates' in response_data and len(response_data['candidates']) > 0:
                 text_response = response_data['candidates'][0]['content']['parts'][0]['text']
                 
-                # Try to parse JSON from the response
-                try:
-                    # Find JSON in the response (in case there's additional text)
-                    import re
-                    json_match = re.search(r'({.*})', text_response, re.DOTALL)
-                    if json_match:
-                        json_str = json_match.group(1)
-                        result = json.loads(json_str)
-                        
-                        # Ensure all required keys are present
-                        required_keys = ['food_name', 'nutrition', 'good_for_user', 'diet_plan', 'recommendation']
-                        for key in required_keys:
-                            if key not in result:
-                                result[key] = "Information not available"
-                        
-                        return result
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, extract information using regex
-                    patterns = {
-                        'food_name': r'food_name"?\s*:\s*"([^"]+)"',
-                        'nutrition': r'nutrition"?\s*:\s*"(.*?)"(?=,\s*"good_for_user"|,\s*"diet_plan"|,\s*"recommendation"|}})',
-                        'good_for_user': r'good_for_user"?\s*:\s*"([^"]+)"',
-                        'diet_plan': r'diet_plan"?\s*:\s*"([^"]+)"',
-                        'recommendation': r'recommendation"?\s*:\s*"([^"]+)"'
-                    }
-                    
-                    result = {}
-                    for key, pattern in patterns.items():
-                        match = re.search(pattern, text_response, re.DOTALL)
-                        result[key] = match.group(1) if match else "Information not available"
-                    
-                    # Format nutrition as HTML if it's not already
-                    if "<ul>" not in result['nutrition']:
-                        nutrition_text = result['nutrition']
-                        nutrition_html = "<ul>"
-                        for line in nutrition_text.split('\n'):
-                            if line.strip():
-                                nutrition_html += f"<li>{line.strip()}</li>"
-                        nutrition_html += "</ul>"
-                        result['nutrition'] = nutrition_html
-                    
+                # Parse the structured output (tolerates fences, prose and trailing commas)
+                with profiling.span('parse'):
+                    result = gemini_parser.parse_response(text_response)
+                if result:
                     return result
         
         # Fall back to a default response if API call fails or parsing fails
@@ -462,7 +496,7 @@ def analyze_food_with_gemini(image_path, user_data):
         }
     
     except requests.exceptions.RequestException as e:
-        print(f"Network error while calling Gemini API: {e}")
+        logger.error("Network error while calling Gemini API: %s", e)
         return {
             'food_name': "Network Error",
             'nutrition': "<ul><li>Could not connect to the analysis service</li></ul>",
@@ -471,7 +505,7 @@ def analyze_food_with_gemini(image_path, user_data):
             'recommendation': "If the problem persists, please try again later"
         }
     except ValueError as e:
-        print(f"Configuration error: {e}")
+        logger.error("Gemini configuration error: %s", e)
         return {
             'food_name': "Configuration Error",
             'nutrition': "<ul><li>Service configuration issue</li></ul>",
@@ -480,9 +514,7 @@ def analyze_food_with_gemini(image_path, user_data):
             'recommendation': str(e)
         }
     except Exception as e:
-        print(f"Unexpected error in Gemini API call: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error in Gemini API call: %s", e)
         return {
             'food_name': "Analysis Failed",
             'nutrition': "<ul><li>An unexpected error occurred</li></ul>",
@@ -501,10 +533,9 @@ def internal_error(error):
         pass
     
     error_msg = str(error) if error else "Unknown error"
-    print(f"❌ 500 Internal Server Error: {error_msg}")
-    import traceback
-    print("Full traceback:")
-    traceback.print_exc()
+    logger.error("500 Internal Server Error: %s", error_msg,
+                 exc_info=getattr(error, 'original_exception', None) or error,
+                 extra={'path': request.path})
     
     # Try to flash a message and redirect
     try:
@@ -520,6 +551,7 @@ def home():
     return redirect(url_for('login'))
 
 @app.route('/register', methods=['GET', 'POST'])
+@query_guard.budget(8)
 def register():
     if request.method == 'POST':
         try:
@@ -553,14 +585,6 @@ def register():
                 session['register_captcha_code'] = code.upper()
                 return render_template('register.html', captcha_image=f'data:image/png;base64,{img_base64}')
             
-            # Check if database tables exist
-            try:
-                # Test database connection
-                db.session.execute(text('SELECT 1'))
-            except Exception as db_test_error:
-                print(f"❌ Database connection test failed: {db_test_error}")
-                raise Exception(f"Database connection failed: {str(db_test_error)}")
-            
             # Check if email is already registered (check both existing users and pending registrations)
             existing_user = User.query.filter_by(email=email).first()
             if existing_user:
@@ -611,11 +635,11 @@ def register():
             # Commit only the OTP verification record (not the user account)
             try:
                 db.session.commit()
-                print(f"✓ OTP generated for {email} (account not created yet)")
+                logger.info("OTP generated, account not created yet", extra={'email': email})
             except Exception as db_error:
                 db.session.rollback()
                 error_type = type(db_error).__name__
-                print(f"❌ Database commit error [{error_type}]: {str(db_error)}")
+                logger.error("Database commit error [%s]: %s", error_type, db_error)
                 raise  # Re-raise to be caught by outer exception handler
             
             # Clear CAPTCHA from session
@@ -632,13 +656,12 @@ def register():
                     flash('Please check your email for the OTP code to complete registration. If you don\'t see it, check your spam folder.')
                 else:
                     flash('OTP code sent! However, email sending failed. Please check your email configuration or contact support.')
-                    # Log OTP to console for debugging (not shown to user)
-                    print(f"⚠️  OTP for {email} (email failed): {otp_code}")
+                    # The code itself is listed under Pending OTPs on the admin dashboard
+                    logger.warning("Verification email failed, OTP is pending on the admin dashboard", extra={'email': email})
             except Exception as email_error:
                 # If email sending causes any error, don't fail registration
-                print(f"⚠️  Email sending error (non-fatal): {email_error}")
+                logger.warning("Email sending error (non-fatal): %s", email_error, extra={'email': email})
                 flash('OTP code generated! However, email sending encountered an error. Please check your email configuration or contact support.')
-                print(f"⚠️  OTP for {email} (email error): {otp_code}")
             
             return redirect(url_for('verify_otp'))
             
@@ -646,14 +669,10 @@ def register():
             db.session.rollback()
             error_msg = f"Registration failed: {str(e)}"
             error_type = type(e).__name__
-            print(f"❌ Registration error [{error_type}]: {error_msg}")
-            import traceback
-            print("Full traceback:")
-            traceback.print_exc()
-            
-            # Log additional context
-            print(f"   Email: {email if 'email' in locals() else 'N/A'}")
-            print(f"   Database URI: {app.config.get('SQLALCHEMY_DATABASE_URI', 'N/A')[:50]}...")
+            logger.exception("Registration error [%s]: %s", error_type, error_msg, extra={
+                'email': email if 'email' in locals() else None,
+                'database': structured_logging.redact_url(app.config.get('SQLALCHEMY_DATABASE_URI', '')),
+            })
             
             flash(f'Registration error: {error_type}. Please try again or contact support.')
             # Generate new CAPTCHA for retry
@@ -662,7 +681,7 @@ def register():
                 session['register_captcha_code'] = code.upper()
                 return render_template('register.html', captcha_image=f'data:image/png;base64,{img_base64}')
             except Exception as captcha_error:
-                print(f"❌ Error generating CAPTCHA: {captcha_error}")
+                logger.error("Error generating CAPTCHA: %s", captcha_error)
                 flash('Error loading registration page. Please refresh.')
                 return redirect(url_for('register'))
     
@@ -672,9 +691,7 @@ def register():
         session['register_captcha_code'] = code.upper()
         return render_template('register.html', captcha_image=f'data:image/png;base64,{img_base64}')
     except Exception as e:
-        print(f"❌ Error in GET register: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in GET register: %s", e)
         flash('Error loading registration page. Please try again.')
         # Try to generate a simple fallback CAPTCHA
         try:
@@ -687,6 +704,7 @@ def register():
             return redirect(url_for('login'))
 
 @app.route('/verify_otp', methods=['GET', 'POST'])
+@ratelimit.limit('verify_otp', email=ratelimit.session_or_form_email)
 def verify_otp():
     """Verify user email with OTP code and create account only after verification"""
     # Get email from session or form
@@ -734,7 +752,7 @@ def verify_otp():
         
         # OTP is valid - NOW create the user account
         try:
-            hashed_password = generate_password_hash(pending_reg['password'])
+            hashed_password = passwords.hash_password(pending_reg['password'])
             new_user = User(
                 email=pending_reg['email'],
                 number=pending_reg['number'],
@@ -750,7 +768,7 @@ def verify_otp():
             
             # Commit user creation and OTP update
             db.session.commit()
-            print(f"✓ User {email} created successfully after OTP verification")
+            logger.info("User created after OTP verification", extra={'email': email})
             
             # Clear session data
             session.pop('pending_registration', None)
@@ -759,12 +777,15 @@ def verify_otp():
             flash('Email verified successfully! Your account has been created. You can now login.')
             return redirect(url_for('login'))
             
+        except passwords.HashingBusy:
+            # Nothing was written yet: keep the pending registration so the code can be re-submitted
+            db.session.rollback()
+            flash('The server is busy. Please submit the code again in a moment.')
+            return render_template('verify_otp.html', email=email), 503
         except Exception as create_error:
             db.session.rollback()
             error_type = type(create_error).__name__
-            print(f"❌ Error creating user after OTP verification [{error_type}]: {str(create_error)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating user after OTP verification [%s]: %s", error_type, create_error)
             flash('Error creating account. Please try registering again.')
             session.pop('pending_registration', None)
             return redirect(url_for('register'))
@@ -773,6 +794,7 @@ def verify_otp():
     return render_template('verify_otp.html', email=email)
 
 @app.route('/resend_otp', methods=['GET', 'POST'])
+@ratelimit.limit('resend_otp')
 def resend_otp():
     """Resend verification OTP for pending registration"""
     if request.method == 'POST':
@@ -825,46 +847,59 @@ def resend_otp():
                 flash('Verification OTP sent! Please check your email. If you don\'t see it, check your spam folder.')
             else:
                 flash('OTP sending failed. Please check your email configuration or contact support.')
-                # Log OTP to console for debugging (not shown to user)
-                print(f"⚠️  OTP for {email} (email failed): {otp_code}")
+                # The code itself is listed under Pending OTPs on the admin dashboard
+                logger.warning("Verification email failed, OTP is pending on the admin dashboard", extra={'email': email})
         except Exception as email_error:
-            print(f"⚠️  Email sending error (non-fatal): {email_error}")
+            logger.warning("Email sending error (non-fatal): %s", email_error, extra={'email': email})
             flash('OTP generated but email sending encountered an error. Please check your email configuration.')
-            print(f"⚠️  OTP for {email} (email error): {otp_code}")
         
         return redirect(url_for('verify_otp'))
     
     return render_template('resend_otp.html')
 
 @app.route('/login', methods=['GET', 'POST'])
+@ratelimit.limit('login')
+# User lookup, plus the password rehash UPDATE the first time after a cost change
+@query_guard.budget(3)
+@db_routing.read_only
 def login():
     if request.method == 'POST':
         email = request.form.get('email', '').strip()
         password_input = request.form.get('password', '').strip()
         
-        # Debug logging
-        print(f"🔍 Login attempt - Email: '{email}', Password length: {len(password_input)}")
-        print(f"   Admin username check: '{email.upper()}' == '{ADMIN_USERNAME}' = {email.upper() == ADMIN_USERNAME}")
+        hot_logger.info("Login attempt", extra={'email': email, 'admin': email.upper() == ADMIN_USERNAME})
         
         # Exception: If email matches admin username, only check admin credentials (skip database query)
         if email.upper() == ADMIN_USERNAME:
             # Admin login attempt - check admin password
-            print(f"   Admin login detected - Checking password...")
             if password_input == ADMIN_PASSWORD:
                 session['admin'] = True
                 session['admin_username'] = ADMIN_USERNAME
-                print(f"✓ Admin login successful!")
+                logger.info("Admin login successful")
                 flash('Admin login successful!')
                 return redirect(url_for('admin_dashboard'))
             else:
-                print(f"❌ Admin password incorrect. Expected: '{ADMIN_PASSWORD}', Got: '{password_input}'")
+                logger.warning("Admin login failed: incorrect password")
                 flash('Invalid admin password.')
                 return render_template('login.html')
         
         # Regular user login (only if email is not admin username)
         user = User.query.filter_by(email=email).first()
 
-        if user and check_password_hash(user.password, password_input):
+        try:
+            password_ok, new_hash = passwords.verify(user.password, password_input) if user else (False, None)
+        except passwords.HashingBusy:
+            flash('Too many login attempts right now. Please try again in a moment.')
+            return render_template('login.html'), 503
+
+        if password_ok:
+            if new_hash:
+                # Stored hash predates the configured method/cost: upgrade it now
+                # that the plain password is at hand
+                user.password = new_hash
+                db.session.commit()
+                metrics.inc('password_rehash_total')
+            
             # Check if email is verified
             if not user.verified:
                 session['verification_email'] = email
@@ -880,6 +915,8 @@ def login():
     return render_template('login.html')
 
 @app.route('/admin/dashboard')
+@query_guard.budget(5)
+@db_routing.read_only
 def admin_dashboard():
     """Admin dashboard to view and manage all users"""
     # Check if user is admin
@@ -887,8 +924,8 @@ def admin_dashboard():
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('login'))
     
-    # Get all users
-    users = User.query.order_by(User.id.desc()).all()
+    # Get all users (password hashes are not shown, so don't load them)
+    users = User.query.options(defer(User.password)).order_by(User.id.desc()).all()
     
     # Get user statistics
     total_users = len(users)
@@ -898,6 +935,9 @@ def admin_dashboard():
     # Get pending OTPs (for troubleshooting email issues)
     pending_otps = EmailVerification.query.filter_by(used=False).order_by(EmailVerification.created_at.desc()).limit(10).all()
     
+    # BMI/BMR cohort statistics, aggregated in SQL
+    cohort_stats = health_metrics.cohort_stats(db.session, HealthData, User)
+    
     # Get current time in UTC
     current_time = datetime.utcnow()
     
@@ -907,23 +947,22 @@ def admin_dashboard():
                          verified_users=verified_users,
                          unverified_users=unverified_users,
                          pending_otps=pending_otps,
+                         cohort_stats=cohort_stats,
+                         purge_jobs=purge.recent_jobs(),
                          now=current_time,
                          ADMIN_USERNAME=ADMIN_USERNAME)
 
 @app.route('/admin/delete_user/<int:user_id>', methods=['POST'])
 def delete_user(user_id):
     """Delete a user account (admin only) - Admin account is protected and cannot be deleted"""
-    print(f"🗑️  Delete user request received for user_id: {user_id}")
-    
     # Check if user is admin
     if not session.get('admin'):
-        print(f"❌ Access denied - not admin")
+        logger.warning("Delete user denied: not admin", extra={'user_id': user_id})
         flash('Access denied. Admin privileges required.')
         return redirect(url_for('login'))
     
     try:
         user = User.query.get_or_404(user_id)
-        print(f"📋 Found user: {user.email} (ID: {user.id})")
         
         # STRICT PROTECTION: Prevent deletion of admin account
         # Multiple checks to ensure admin account cannot be deleted
@@ -932,43 +971,65 @@ def delete_user(user_id):
             user.name.upper() == ADMIN_USERNAME or
             str(user_id) == "0"):  # Additional safety check
             flash('❌ ERROR: Admin account is protected and cannot be deleted!')
-            print(f"⚠️  Attempted deletion of protected admin account: {user.email}")
+            logger.warning("Attempted deletion of protected admin account", extra={'email': user.email})
             return redirect(url_for('admin_dashboard'))
         
         # Additional check: Prevent deletion if email contains admin username
         if ADMIN_USERNAME.upper() in user.email.upper():
             flash('❌ ERROR: This account is protected and cannot be deleted!')
-            print(f"⚠️  Attempted deletion of protected account: {user.email}")
+            logger.warning("Attempted deletion of protected account", extra={'email': user.email})
             return redirect(url_for('admin_dashboard'))
         
-        # Delete associated health data
-        deleted_health = HealthData.query.filter_by(user_id=user_id).delete()
-        
-        # Delete associated email verifications
-        deleted_verifications = EmailVerification.query.filter_by(email=user.email).delete()
-        
-        # Delete password reset tokens
-        deleted_resets = PasswordReset.query.filter_by(email=user.email).delete()
-        
-        # Store email for logging before deletion
         user_email = user.email
+        upload_folder = app.config['UPLOAD_FOLDER']
         
-        # Delete user
-        db.session.delete(user)
-        db.session.commit()
-        
-        flash(f'✓ User {user_email} has been deleted successfully.')
-        print(f"✓ Admin deleted user: {user_email} (Health data: {deleted_health}, Verifications: {deleted_verifications}, Resets: {deleted_resets})")
+        if purge.BACKGROUND:
+            # End this request's read transaction so the purge thread can write
+            db.session.rollback()
+            job_id = purge.start_background(app, f'Delete user {user_email}', purge.purge_users,
+                                            db.session, PURGE_MODELS, [user_id], upload_folder=upload_folder)
+            flash(f'✓ Deleting user {user_email} in the background (job {job_id}).')
+            logger.info("Admin started user deletion", extra={'email': user_email, 'user_id': user_id, 'job': job_id})
+        else:
+            # Health data, rollups, OTPs, reset tokens and images, in chunks
+            deleted = purge.purge_users(db.session, PURGE_MODELS, [user_id], upload_folder=upload_folder)
+            flash(f'✓ User {user_email} has been deleted successfully.')
+            logger.info("Admin deleted user", extra={'email': user_email, 'user_id': user_id, 'deleted': deleted})
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting user: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting user: %s", e, extra={'user_id': user_id})
         flash('Error deleting user. Please try again.')
     
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/profiles')
+@app.route('/admin/profiles/<name>')
+def admin_profiles(name=None):
+    """Browse slow-request profiles captured with PROFILE_REQUESTS=1 (admin only)"""
+    if not session.get('admin'):
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('login'))
+    
+    profile = None
+    top_frames = []
+    if name:
+        profile = profiling.load_dump(name)
+        if profile is None:
+            flash('Profile not found.')
+            return redirect(url_for('admin_profiles'))
+        if request.args.get('format') == 'json':
+            return jsonify(profile)
+        top_frames = profiling.top_frames(profile)
+    
+    return render_template('admin_profiles.html',
+                          enabled=profiling.PROFILING_ENABLED,
+                          threshold=profiling.SLOW_REQUEST_THRESHOLD,
+                          dumps=profiling.list_dumps() if not name else [],
+                          profile=profile,
+                          name=name,
+                          top_frames=top_frames)
+
 @app.route('/admin/test_email')
 def admin_test_email():
     """
@@ -989,6 +1050,7 @@ def admin_test_email():
     results = {
         'resend_api_key': '✅ SET' if resend_api_key else '❌ NOT SET',
         'resend_from_email': resend_from_email,
+        'resend_api_url': RESEND_API_URL,
         'tests': []
     }
     
@@ -1010,7 +1072,7 @@ def admin_test_email():
     # Test 2: Test Resend API connection (HTTPS request)
     try:
         # Test API endpoint
-        test_url = "https://api.resend.com/emails"
+        test_url = RESEND_API_URL
         headers = {
             "Authorization": f"Bearer {resend_api_key}",
             "Content-Type": "application/json"
@@ -1024,12 +1086,14 @@ def admin_test_email():
             "text": "Test"
         }
         
-        response = requests.post(
-            test_url,
-            headers=headers,
-            json=test_payload,
-            timeout=10
-        )
+        with metrics.outbound_timer('resend') as call:
+            response = requests.post(
+                test_url,
+                headers=headers,
+                json=test_payload,
+                timeout=10
+            )
+            call['status'] = response.status_code
         
         # Even if it fails, if we get a response, the API is reachable
         if response.status_code in [200, 201, 400, 422]:  # 400/422 means API is working but validation failed
@@ -1091,6 +1155,17 @@ def admin_test_email():
     
     return render_template('admin_test_email.html', results=results)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics aggregated over all workers (admin session or METRICS_TOKEN bearer)"""
+    metrics_token = os.getenv('METRICS_TOKEN')
+    authorized = session.get('admin') or (
+        metrics_token and request.headers.get('Authorization') == f'Bearer {metrics_token}'
+    )
+    if not authorized:
+        return Response('Access denied. Admin privileges required.\n', status=403, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/admin/logout')
 def admin_logout():
     """Logout admin"""
@@ -1114,6 +1189,7 @@ def captcha_register():
     return f'data:image/png;base64,{img_base64}'
 
 @app.route('/forgot_password', methods=['GET', 'POST'])
+@ratelimit.limit('forgot_password')
 def forgot_password():
     """Forgot password page with CAPTCHA verification"""
     if request.method == 'POST':
@@ -1198,7 +1274,11 @@ def reset_password(token):
         # Update user password
         user = User.query.filter_by(email=reset_record.email).first()
         if user:
-            user.password = generate_password_hash(new_password)
+            try:
+                user.password = passwords.hash_password(new_password)
+            except passwords.HashingBusy:
+                flash('The server is busy. Please try again in a moment.')
+                return render_template('reset_password.html', token=token), 503
             reset_record.used = True
             db.session.commit()
             flash('Password reset successful! You can now login with your new password.')
@@ -1210,6 +1290,7 @@ def reset_password(token):
     return render_template('reset_password.html', token=token)
 
 @app.route('/dashboard', methods=['GET', 'POST'])
+@query_guard.budget(12)
 def dashboard():
     if 'user_id' not in session:
         flash("Please log in first.")
@@ -1227,8 +1308,9 @@ def dashboard():
         if file and allowed_file(file.filename):
             # Create unique filename to avoid conflicts
             unique_filename = str(uuid.uuid4()) + secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(filepath)
+            with profiling.span('file_save'):
+                filepath = uploads.save(file, app.config['UPLOAD_FOLDER'], unique_filename)
+            metrics.observe('upload_size_bytes', os.path.getsize(filepath))
             
             # Analyze food image using Gemini API
             user_data = {
@@ -1239,50 +1321,186 @@ def dashboard():
             }
             
             analysis_result = analyze_food_with_gemini(filepath, user_data)
+            body_metrics = health_metrics.compute(weight, height, age, session['user_gender'])
             
             # Save the data to the database
-            health_data = HealthData(
-                user_id=session['user_id'],
-                age=age,
-                height=height,
-                weight=weight,
-                food_image=unique_filename,
-                food_name=analysis_result['food_name'],
-                nutrition_info=analysis_result['nutrition'],
-                assessment=analysis_result['good_for_user'],
-                diet_plan=analysis_result['diet_plan'],
-                recommendation=analysis_result['recommendation']
-            )
-            db.session.add(health_data)
-            db.session.commit()
+            user_id = session['user_id']
             
-            # Calculate BMI
-            bmi = calculate_bmi(weight, height)
+            def store(db_session):
+                health_data = HealthData(
+                    user_id=user_id,
+                    age=age,
+                    height=height,
+                    weight=weight,
+                    food_image=unique_filename,
+                    food_name=analysis_result['food_name'],
+                    nutrition_info=analysis_result['nutrition'],
+                    assessment=analysis_result['good_for_user'],
+                    diet_plan=analysis_result['diet_plan'],
+                    recommendation=analysis_result['recommendation'],
+                    bmi=round(float(body_metrics['bmi']), 2),
+                    bmr=round(float(body_metrics['bmr']), 1)
+                )
+                db_session.add(health_data)
+                # Update the day/week rollups in the same transaction as the insert
+                rollups.record_meal(db_session, NutritionRollup, health_data)
+                db_session.flush()
+                return health_data.id
             
-            # Prepare the food image path for display
-            food_image_path = url_for('uploaded_file', filename=unique_filename)
+            # On SQLite the insert goes through the single-writer queue (see db_sqlite.py)
+            with profiling.span('db_commit'):
+                health_data_id = db_sqlite.write(db.session, store)
             
-            return render_template('result.html', 
-                                  name=session['user_name'], 
-                                  gender=session['user_gender'],
-                                  age=age, 
-                                  height=height, 
-                                  weight=weight,
-                                  bmi=bmi,
-                                  food_name=analysis_result['food_name'],
-                                  nutrition=analysis_result['nutrition'],
-                                  good_for_user=analysis_result['good_for_user'],
-                                  diet_plan=analysis_result['diet_plan'],
-                                  recommendation=analysis_result['recommendation'],
-                                  food_image_path=food_image_path)
+            # Post/Redirect/Get: refreshing or revisiting the page is served
+            # from the stored row instead of re-uploading the image
+            return redirect(url_for('result', result_id=health_data_id), code=303)
         else:
             flash("Please upload a valid image file (png, jpg, jpeg).")
 
     return render_template('dashboard.html', name=session['user_name'], gender=session['user_gender'])
 
+@app.route('/result/<int:result_id>')
+@query_guard.budget(2)
+@db_routing.read_only
+def result(result_id):
+    """Permalink for a stored analysis, for its owner or the admin"""
+    row = db.session.execute(
+        db.select(HealthData.id, HealthData.user_id, HealthData.timestamp).where(HealthData.id == result_id)
+    ).first()
+    if row is None:
+        abort(404)
+    if not (session.get('admin') or session.get('user_id') == row.user_id):
+        # Not found rather than forbidden, so result ids cannot be probed
+        abort(404)
+
+    etag = result_cache.etag(row.id, row.timestamp)
+    last_modified = row.timestamp.replace(microsecond=0) if row.timestamp else None
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        html = result_cache.get(etag)
+        if html is None:
+            health_data, owner_name, owner_gender = db.session.execute(
+                db.select(HealthData, User.name, User.gender)
+                .join(User, User.id == HealthData.user_id)
+                .where(HealthData.id == result_id)
+                .options(undefer_group('analysis'))
+            ).one()
+            with profiling.span('render'):
+                html = render_template('result.html',
+                                       name=owner_name,
+                                       gender=owner_gender,
+                                       age=health_data.age,
+                                       height=health_data.height,
+                                       weight=health_data.weight,
+                                       bmi=health_data.bmi,
+                                       food_name=health_data.food_name,
+                                       nutrition=health_data.nutrition_info,
+                                       good_for_user=health_data.assessment,
+                                       diet_plan=health_data.diet_plan,
+                                       recommendation=health_data.recommendation,
+                                       reference_nutrition=nutrition_db.lookup(health_data.food_name),
+                                       food_image_path=url_for('uploaded_file', filename=health_data.food_image))
+            result_cache.put(etag, html)
+        response = Response(html, mimetype='text/html')
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Health data: browsers may reuse the page, shared proxies must not keep it
+    response.cache_control.private = True
+    response.cache_control.max_age = result_cache.MAX_AGE
+    return response
+
+@app.route('/meal_plan')
+@query_guard.budget(2)
+@db_routing.read_only
+def meal_plan():
+    """Show a 7-day meal plan built from the user's latest health profile"""
+    if 'user_id' not in session:
+        flash("Please log in first.")
+        return redirect(url_for('login'))
+    
+    # Default to the most recent measurements the user submitted
+    latest = HealthData.query.filter_by(user_id=session['user_id']).order_by(HealthData.timestamp.desc()).first()
+    try:
+        age = int(request.args.get('age') or (latest.age if latest else 0))
+        height = float(request.args.get('height') or (latest.height if latest else 0))
+        weight = float(request.args.get('weight') or (latest.weight if latest else 0))
+    except ValueError:
+        flash("Please enter valid numbers for age, height and weight.")
+        return redirect(url_for('meal_plan'))
+    activity = request.args.get('activity', 'light')
+    
+    plan = None
+    if 0 < age < 120 and 50 <= height <= 250 and 20 <= weight <= 300:
+        plan = meal_planner.build_meal_plan(age, session['user_gender'], height, weight, activity)
+    elif request.args:
+        flash("Please enter an age, height (cm) and weight (kg) in a realistic range.")
+    
+    return render_template('meal_plan.html',
+                          name=session['user_name'],
+                          age=age or '',
+                          height=height or '',
+                          weight=weight or '',
+                          activity=activity,
+                          activities=list(meal_planner.ACTIVITY_FACTORS),
+                          plan=plan)
+
+@app.route('/nutrition/trend')
+@query_guard.budget(2)
+@db_routing.read_only
+def nutrition_trend():
+    """JSON daily or weekly nutrition totals for the logged-in user (for charts)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please log in first.'}), 401
+    
+    period = request.args.get('period', 'day')
+    if period not in rollups.PERIODS:
+        return jsonify({'error': f'period must be one of {", ".join(rollups.PERIODS)}'}), 400
+    limit = min(max(request.args.get('limit', 30, type=int), 1), 366)
+    
+    return jsonify({
+        'period': period,
+        'rollups': rollups.trend(db.session, NutritionRollup, session['user_id'], period, limit)
+    })
+
+def _export_response(fmt, user_id, filename):
+    """Stream HealthData as a download (rows are read and sent in batches)"""
+    try:
+        chunks = data_export.stream(db.session, HealthData, fmt, user_id=user_id)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e)}), 400
+    mimetype, extension = data_export.FORMATS[fmt]
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}.{extension}"'})
+
+@app.route('/export/<fmt>')
+@db_routing.read_only
+def export_data(fmt):
+    """Download the logged-in user's health data as CSV, JSONL or Parquet"""
+    if 'user_id' not in session:
+        flash("Please log in first.")
+        return redirect(url_for('login'))
+    return _export_response(fmt, session['user_id'], 'health-data')
+
+@app.route('/admin/export/<fmt>')
+@db_routing.read_only
+def admin_export(fmt):
+    """Download all health data, or one user's with ?user_id= (admin only)"""
+    if not session.get('admin'):
+        flash('Access denied. Admin privileges required.')
+        return redirect(url_for('login'))
+    user_id = request.args.get('user_id', type=int)
+    filename = f'health-data-user-{user_id}' if user_id else f'health-data-{datetime.utcnow():%Y%m%d}'
+    return _export_response(fmt, user_id, filename)
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Stored in a hash-prefix subdirectory (or flat, if not migrated yet)
+    path = uploads.locate(app.config['UPLOAD_FOLDER'], filename)
+    if path is None:
+        abort(404)
+    return send_from_directory(os.path.dirname(path), os.path.basename(path))
 
 @app.route('/logout') 
 def logout():
@@ -1301,37 +1519,34 @@ def create_tables():
         inspector = db.inspect(db.engine)
         existing_tables = inspector.get_table_names()
         
-        required_tables = ['user', 'health_data', 'password_reset', 'email_verification']
+        required_tables = ['user', 'health_data', 'password_reset', 'email_verification', 'nutrition_rollup']
         missing_tables = [t for t in required_tables if t not in existing_tables]
         
         if missing_tables:
-            print(f"⚠️  Missing tables: {missing_tables}")
-            print("Attempting to create missing tables...")
+            logger.warning("Missing tables, creating them", extra={'tables': missing_tables})
             db.create_all()
             # Verify again
             inspector = db.inspect(db.engine)
             existing_tables = inspector.get_table_names()
             if all(t in existing_tables for t in required_tables):
-                print("✓ All required tables created successfully.")
+                logger.info("All required tables created")
             else:
-                print("⚠️  Some tables still missing. You may need to restart the app.")
+                logger.warning("Some tables still missing, the app may need a restart")
         else:
-            print("✓ All database tables verified.")
+            logger.info("All database tables verified")
         
         # Now migrate if needed (add new columns to existing tables)
         migrate_database()
         
     except Exception as e:
-        print(f"⚠️  Error creating tables: {e}")
+        logger.warning("Error creating tables: %s", e)
         # If tables don't exist, try to create them
         if "no such table" in str(e).lower():
             try:
-                print("Attempting to create tables...")
                 db.create_all()
-                print("✓ Tables created.")
+                logger.info("Tables created")
             except Exception as e2:
-                print(f"❌ Error creating tables: {e2}")
-                print("Please stop the Flask app, delete instance/users.db, and restart.")
+                logger.error("Error creating tables: %s (stop the app, delete instance/users.db and restart)", e2)
 
 def migrate_database():
     """
@@ -1344,37 +1559,77 @@ def migrate_database():
         tables = inspector.get_table_names()
         
         if 'user' not in tables:
-            print("User table doesn't exist. It should have been created by db.create_all()")
+            logger.warning("User table doesn't exist, it should have been created by db.create_all()")
             return
         
         # Check if 'verified' column exists in user table
         try:
             columns = [col['name'] for col in inspector.get_columns('user')]
             if 'verified' not in columns:
-                print("Adding 'verified' column to user table...")
+                logger.info("Adding 'verified' column to user table")
                 # For SQLite, we need to use ALTER TABLE
                 if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
                     with db.engine.begin() as conn:
                         conn.execute(text('ALTER TABLE user ADD COLUMN verified BOOLEAN DEFAULT 0'))
                         # Mark all existing users as verified
                         conn.execute(text('UPDATE user SET verified = 1 WHERE verified IS NULL'))
-                    print("✓ 'verified' column added to user table.")
                 else:
                     # For PostgreSQL, use ALTER TABLE
                     with db.engine.begin() as conn:
                         conn.execute(text('ALTER TABLE "user" ADD COLUMN IF NOT EXISTS verified BOOLEAN DEFAULT FALSE'))
                         conn.execute(text('UPDATE "user" SET verified = TRUE WHERE verified IS NULL'))
-                    print("✓ 'verified' column added to user table.")
         except Exception as e:
-            print(f"Note: Could not check/add 'verified' column: {e}")
-            print("This is okay if the column already exists.")
+            logger.info("Could not check/add 'verified' column (okay if it already exists): %s", e)
+        
+        # Check if health_data has the stored metric columns (bmi, bmr)
+        if 'health_data' in tables:
+            try:
+                columns = [col['name'] for col in inspector.get_columns('health_data')]
+                for column in ('bmi', 'bmr'):
+                    if column not in columns:
+                        with db.engine.begin() as conn:
+                            conn.execute(text(f'ALTER TABLE health_data ADD COLUMN {column} FLOAT'))
+                        logger.info("Added '%s' column to health_data, run recompute_health_metrics.py to backfill it", column)
+            except Exception as e:
+                logger.info("Could not check/add health_data metric columns: %s", e)
+        
+        # Index health_data.user_id (per-user history, chunked purges) and make
+        # user deletes cascade to health_data and nutrition_rollup
+        if 'health_data' in tables:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_health_data_user_id ON health_data (user_id)'))
+            except Exception as e:
+                logger.info("Could not create health_data.user_id index: %s", e)
+        if 'sqlite' not in app.config['SQLALCHEMY_DATABASE_URI']:
+            # SQLite cannot alter constraints in place; purge.py deletes the
+            # child rows explicitly, so existing SQLite files keep working
+            for table in ('health_data', 'nutrition_rollup'):
+                if table not in tables:
+                    continue
+                try:
+                    for fk in inspector.get_foreign_keys(table):
+                        if fk['referred_table'] != 'user' or fk.get('options', {}).get('ondelete', '').upper() == 'CASCADE':
+                            continue
+                        name = fk['name']
+                        logger.info("Adding ON DELETE CASCADE to %s.%s", table, name)
+                        with db.engine.begin() as conn:
+                            # NOT VALID + VALIDATE avoids holding an exclusive lock while existing rows are checked
+                            conn.execute(text(
+                                f'ALTER TABLE {table} DROP CONSTRAINT {name}, '
+                                f'ADD CONSTRAINT {name} FOREIGN KEY (user_id) REFERENCES "user"(id) ON DELETE CASCADE NOT VALID'
+                            ))
+                        with db.engine.begin() as conn:
+                            conn.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}'))
+                except Exception as e:
+                    logger.info("Could not add ON DELETE CASCADE to %s: %s", table, e)
         
         # Check if email_verification table needs migration (token -> otp)
         if 'email_verification' in tables:
             try:
                 columns = [col['name'] for col in inspector.get_columns('email_verification')]
                 if 'token' in columns and 'otp' not in columns:
-                    print("Migrating email_verification table: token -> otp...")
+                    logger.info("Migrating email_verification table: token -> otp")
                     # For SQLite, we need to recreate the table
                     if 'sqlite' in app.config['SQLALCHEMY_DATABASE_URI']:
                         # SQLite doesn't support DROP COLUMN, so we'll recreate the table
@@ -1393,28 +1648,24 @@ def migrate_database():
                             # Copy data (if any) - we'll just drop old tokens
                             conn.execute(text('DROP TABLE email_verification'))
                             conn.execute(text('ALTER TABLE email_verification_new RENAME TO email_verification'))
-                        print("✓ email_verification table migrated to use OTP.")
                     else:
                         # For PostgreSQL, we can add the column and migrate data
                         with db.engine.begin() as conn:
                             conn.execute(text('ALTER TABLE email_verification ADD COLUMN IF NOT EXISTS otp VARCHAR(6)'))
                             # Drop old token column (if safe)
                             # Note: We'll keep both columns for safety, old data will be ignored
-                        print("✓ email_verification table updated (otp column added).")
             except Exception as e:
-                print(f"Note: Could not migrate email_verification table: {e}")
-                print("This is okay if the table is already using OTP.")
+                logger.info("Could not migrate email_verification table (okay if it already uses OTP): %s", e)
         
-        print("✓ Database schema is up to date.")
+        logger.info("Database schema is up to date")
             
     except Exception as e:
         # If inspector fails, try a different approach
         if "no such table" in str(e).lower():
-            print("Tables don't exist. Creating all tables...")
+            logger.info("Tables don't exist, creating all tables")
             db.create_all()
-            print("✓ All tables created.")
         else:
-            print(f"Database check error: {e}")
+            logger.error("Database check error: %s", e)
 
 # Initialize database tables when app starts (works for both development and production)
 # This ensures tables are created on Render when gunicorn starts the app
@@ -1422,10 +1673,9 @@ def init_database():
     """Initialize database tables - called when app starts"""
     with app.app_context():
         try:
-            print("="*60)
-            print("Initializing database...")
-            print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI'][:50]}...")
-            print("="*60)
+            logger.info("Initializing database", extra={
+                'database': structured_logging.redact_url(app.config['SQLALCHEMY_DATABASE_URI'])
+            })
             
             # Try to create all tables (idempotent - won't recreate if they exist)
             db.create_all()
@@ -1434,38 +1684,30 @@ def init_database():
             try:
                 inspector = db.inspect(db.engine)
                 tables = inspector.get_table_names()
-                required_tables = ['user', 'health_data', 'password_reset', 'email_verification']
+                required_tables = ['user', 'health_data', 'password_reset', 'email_verification', 'nutrition_rollup']
                 
                 missing_tables = [t for t in required_tables if t not in tables]
                 if missing_tables:
-                    print(f"⚠️  Missing tables: {missing_tables}. Creating...")
+                    logger.warning("Missing tables, creating them", extra={'tables': missing_tables})
                     db.create_all()
-                    print("✓ All tables created.")
                 else:
-                    print(f"✓ Database tables verified: {tables}")
+                    logger.info("Database tables verified", extra={'tables': tables})
                 
                 # Run migration if needed
                 migrate_database()
-                print("="*60)
                 
             except Exception as inspect_error:
-                print(f"⚠️  Could not inspect tables: {inspect_error}")
-                print("Creating all tables...")
+                logger.warning("Could not inspect tables, creating all tables: %s", inspect_error)
                 db.create_all()
-                print("✓ Tables created.")
             
         except Exception as e:
-            print(f"⚠️  Database initialization error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Database initialization error: %s", e)
             # Try to create tables anyway
             try:
                 db.create_all()
-                print("✓ Tables created after error recovery.")
+                logger.info("Tables created after error recovery")
             except Exception as e2:
-                print(f"❌ Critical database error: {e2}")
-                print("Please check DATABASE_URL in environment variables.")
-                print("="*60)
+                logger.critical("Critical database error: %s (check DATABASE_URL)", e2)
 
 # Initialize database when module is imported
 init_database()
@@ -0,0 +1,61 @@
+"""
+Script to move old HealthData rows into compressed archive files.
+
+Rows older than the given number of days, Gemini analysis text included,
+are appended to archive/health_data-<timestamp>.jsonl.gz and deleted from
+the database in batches; their food images move to archive/uploads. Each
+user's most recent row is always kept. Nutrition rollups are not touched,
+so do not run rebuild_rollups.py afterwards.
+
+Usage:
+    python archive_health_data.py <days>            # archive rows older than <days>
+    python archive_health_data.py <days> --dry-run  # only count them
+"""
+
+from datetime import datetime, timedelta
+import os
+
+from app import app, db, HealthData
+import data_export
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+
+
+def archive_health_data(days, dry_run=False):
+    """Archive HealthData rows older than `days` days"""
+    with app.app_context():
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            print("="*60)
+            print(f"ARCHIVING HEALTH DATA OLDER THAN {cutoff:%Y-%m-%d}" + (" (DRY RUN)" if dry_run else ""))
+            print("="*60)
+
+            result = data_export.archive(
+                db.session, HealthData, cutoff, ARCHIVE_DIR,
+                upload_folder=app.config['UPLOAD_FOLDER'],
+                dry_run=dry_run,
+                progress=lambda count: print(f"  ✓ Archived {count} health data records")
+            )
+
+            if dry_run:
+                print(f"\n✓ {result['rows']} records would be archived")
+            elif result['rows']:
+                print(f"\n✓ Archived {result['rows']} records to {result['path']}")
+            else:
+                print("\n✓ Nothing to archive.")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error archiving health data: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    archive_health_data(int(sys.argv[1]), dry_run='--dry-run' in sys.argv[2:])
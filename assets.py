@@ -0,0 +1,173 @@
+"""
+Fingerprinted static assets.
+
+Stylesheets and scripts live in static/css and static/js. build() minifies
+each one into static/dist/<dir>/<name>.<hash>.<ext> and records the mapping
+in static/dist/manifest.json; templates link them with
+
+    <link rel="stylesheet" href="{{ asset_url('css/login.css') }}">
+
+Because the file name changes whenever the content does, dist files are
+served with a one-year immutable Cache-Control and browsers only download
+a stylesheet again after it was edited.
+
+build_assets.py runs the build (and the one-off template extraction);
+init_app() also builds at startup when the manifest is missing or older
+than a source, so deploys work without a separate build step. In debug
+mode asset_url() points at the unminified sources.
+"""
+
+# Standard library imports
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+
+# Third-party imports
+from flask import request, url_for, current_app
+
+# Local imports
+import structured_logging
+
+SOURCE_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Superseded dist files are kept this long for pages rendered before a deploy
+STALE_SECONDS = 7 * 24 * 3600
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+logger = structured_logging.get_logger('assets')
+
+_manifest = {}
+
+
+# Minifiers (conservative: whitespace and comments only)
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Lines are kept separate (automatic semicolon insertion); only
+    # indentation, blank lines and whole-line // comments are dropped
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# Build
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _sources(static_folder):
+    for directory in SOURCE_DIRS:
+        source_dir = os.path.join(static_folder, directory)
+        if not os.path.isdir(source_dir):
+            continue
+        for name in sorted(os.listdir(source_dir)):
+            if os.path.splitext(name)[1] in MINIFIERS:
+                yield f'{directory}/{name}', os.path.join(source_dir, name)
+
+
+def build(static_folder):
+    """
+    Minify and fingerprint every source asset.
+
+    Returns:
+        dict: manifest, source path (e.g. 'css/login.css') -> dist path
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for logical, source in _sources(static_folder):
+        stem, extension = os.path.splitext(logical)
+        with open(source, encoding='utf-8') as source_file:
+            content = MINIFIERS[extension](source_file.read()).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        target = f'{DIST_DIR}/{stem}.{digest}{extension}'
+        path = os.path.join(static_folder, target)
+        if not os.path.exists(path):
+            _write_atomic(path, content)
+        manifest[logical] = target
+
+    _write_atomic(os.path.join(dist_folder, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    # Prune old fingerprints once nothing can still reference them
+    current = {os.path.normpath(os.path.join(static_folder, target)) for target in manifest.values()}
+    cutoff = time.time() - STALE_SECONDS
+    for root, _, files in os.walk(dist_folder):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if name != MANIFEST_NAME and path not in current and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    return manifest
+
+
+def _needs_build(static_folder):
+    manifest_path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return True
+    built_at = os.path.getmtime(manifest_path)
+    return any(os.path.getmtime(source) > built_at for _, source in _sources(static_folder))
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+# Flask hooks
+
+def asset_url(path):
+    """URL of a static asset: its fingerprinted build, or the source in debug mode"""
+    if not current_app.debug and path in _manifest:
+        return url_for('static', filename=_manifest[path])
+    return url_for('static', filename=path)
+
+
+def _cache_headers(response):
+    if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith(DIST_DIR + '/'):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Build assets if stale, load the manifest and register asset_url()"""
+    static_folder = app.static_folder
+    if _needs_build(static_folder):
+        try:
+            build(static_folder)
+            logger.info("Built static assets")
+        except OSError as e:
+            # Read-only deploy: fall back to the unminified sources
+            logger.warning("Could not build static assets: %s", e)
+    _manifest.clear()
+    _manifest.update(load_manifest(static_folder))
+    app.add_template_global(asset_url)
+    app.after_request(_cache_headers)
@@ -0,0 +1,363 @@
+"""
+End-to-end endpoint benchmark and load test.
+
+Runs the app on a local threaded server against the fake Gemini and Resend
+servers from fake_services.py, with a throwaway SQLite database seeded to
+each requested size, and measures throughput and p50/p90/p99 latency for:
+
+    login            POST /login (regular user)
+    register         POST /register (new account, sends the OTP email)
+    captcha          GET  /captcha
+    dashboard        POST /dashboard (image upload + analysis, 303 to the result)
+    admin_dashboard  GET  /admin/dashboard
+
+Usage:
+    python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --db-sizes 0,1000,10000 --requests 200 --concurrency 8
+    python benchmarks/bench_endpoints.py --gemini-latency 1.5 --gemini-error-rate 0.05
+    python benchmarks/bench_endpoints.py --compare benchmarks/results/<previous>.json
+
+To replay recorded Gemini/Resend traffic instead of the fake services'
+synthetic answers (see cassettes.py):
+
+    CASSETTE_MODE=replay CASSETTE_PATH=cassettes/gemini.jsonl.gz CASSETTE_MATCH=url \
+        python benchmarks/bench_endpoints.py --scenarios dashboard
+
+Results are written to benchmarks/results/ as JSON (tagged with the git
+commit) so runs can be compared between commits with --compare, which
+exits non-zero when a scenario regresses by more than --threshold.
+"""
+
+# Standard library imports
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Third-party imports
+import requests
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_services  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+BENCH_EMAIL = 'bench.user@example.com'
+BENCH_PASSWORD = 'bench-password'
+
+# HealthData rows seeded per user
+MEALS_PER_USER = 5
+
+SCENARIOS = ('login', 'register', 'captcha', 'dashboard', 'admin_dashboard')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def make_jpeg(size=(640, 480), seed=0):
+    """A noisy JPEG so the upload and base64 cost resemble a real photo"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', size)
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                   for _ in range(size[0] * size[1])])
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def load_app(tmp_dir, gemini_base, resend_url):
+    """Import the app against a throwaway database and the fake services"""
+    os.environ.update({
+        'DATABASE_URL': 'sqlite:///' + os.path.join(tmp_dir, 'bench.db'),
+        'GEMINI_API_KEY': 'bench-key',
+        'GEMINI_API_BASE': gemini_base,
+        'RESEND_API_KEY': 'bench-key',
+        'RESEND_API_URL': resend_url,
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+        'METRICS_DIR': os.path.join(tmp_dir, 'metrics'),
+        # Query budget violations and N+1 patterns fail the request (counted as errors)
+        'QUERY_GUARD': os.getenv('QUERY_GUARD', 'raise'),
+        # All workers log in from 127.0.0.1; the login limiter would answer 429
+        'RATE_LIMIT_BACKEND': 'off',
+    })
+    # Uploads are written relative to the working directory
+    os.chdir(tmp_dir)
+    import app as app_module
+    return app_module
+
+
+def seed_users(app_module, target, password_hash):
+    """Grow the user table to `target` users, each with MEALS_PER_USER meals"""
+    A = app_module
+    with A.app.app_context():
+        current = A.User.query.count()
+        if current >= target:
+            return current
+        now = datetime.utcnow()
+        batch = 1000
+        for start in range(current, target, batch):
+            users = [
+                {'email': f'seed{i}@example.com', 'number': '9999999999', 'name': f'Seed {i}',
+                 'gender': 'Female' if i % 2 else 'Male', 'password': password_hash, 'verified': True}
+                for i in range(start, min(start + batch, target))
+            ]
+            A.db.session.execute(A.db.insert(A.User), users)
+            ids = [row[0] for row in A.db.session.execute(
+                A.db.select(A.User.id).where(A.User.email.in_([u['email'] for u in users]))
+            )]
+            meals = [
+                {'user_id': user_id, 'timestamp': now - timedelta(days=day), 'age': 30, 'height': 170.0,
+                 'weight': 70.0, 'food_name': 'Chicken Biryani', 'nutrition_info': '<ul><li>Calories: 450</li></ul>',
+                 'assessment': 'ok', 'diet_plan': 'plan', 'recommendation': 'rec', 'bmi': 24.2, 'bmr': 1520.0}
+                for user_id in ids for day in range(MEALS_PER_USER)
+            ]
+            A.db.session.execute(A.db.insert(A.HealthData), meals)
+            A.db.session.commit()
+        return A.User.query.count()
+
+
+class Client:
+    """One benchmark worker: an HTTP session plus the state its scenarios need"""
+
+    def __init__(self, base_url, app_module, image_bytes):
+        self.base_url = base_url
+        self.app_module = app_module
+        self.image_bytes = image_bytes
+        self.http = requests.Session()
+
+    def _session_data(self):
+        cookie = self.http.cookies.get('session')
+        serializer = self.app_module.app.session_interface.get_signing_serializer(self.app_module.app)
+        return serializer.loads(cookie) if cookie else {}
+
+    def login_user(self):
+        self.http.post(f'{self.base_url}/login', data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD},
+                       allow_redirects=False)
+
+    def login_admin(self):
+        self.http.post(f'{self.base_url}/login', allow_redirects=False, data={
+            'email': self.app_module.ADMIN_USERNAME, 'password': self.app_module.ADMIN_PASSWORD,
+        })
+
+    # Each scenario does its setup, then returns (timed request callable, expected status)
+
+    def login(self):
+        return lambda: self.http.post(f'{self.base_url}/login', allow_redirects=False,
+                                      data={'email': BENCH_EMAIL, 'password': BENCH_PASSWORD}), 302
+
+    def register(self):
+        self.http.cookies.clear()
+        self.http.get(f'{self.base_url}/register')
+        captcha = self._session_data().get('register_captcha_code', '')
+        form = {'email': f'reg-{uuid.uuid4().hex[:12]}@example.com', 'number': '9999999999',
+                'name': 'Bench Register', 'gender': 'Female', 'password': 'register-pass', 'captcha': captcha}
+        return lambda: self.http.post(f'{self.base_url}/register', data=form, allow_redirects=False), 302
+
+    def captcha(self):
+        return lambda: self.http.get(f'{self.base_url}/captcha'), 200
+
+    def dashboard(self):
+        def upload():
+            return self.http.post(f'{self.base_url}/dashboard', allow_redirects=False,
+                                  data={'age': '30', 'height': '170', 'weight': '70'},
+                                  files={'food_image': ('meal.jpg', self.image_bytes, 'image/jpeg')})
+        # The analysis is stored and the browser redirected to /result/<id>
+        return upload, 303
+
+    def admin_dashboard(self):
+        return lambda: self.http.get(f'{self.base_url}/admin/dashboard', allow_redirects=False), 200
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(name, clients, total_requests):
+    """Run `total_requests` requests spread over the clients; returns the stats dict"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_client = [total_requests // len(clients) + (i < total_requests % len(clients)) for i in range(len(clients))]
+
+    def work(client, count):
+        nonlocal errors
+        local, failed = [], 0
+        for _ in range(count):
+            send, expected = getattr(client, name)()
+            start = time.perf_counter()
+            try:
+                ok = send().status_code == expected
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        list(pool.map(work, clients, per_client))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'p50_ms': round(1000 * percentile(latencies, 50), 2),
+        'p90_ms': round(1000 * percentile(latencies, 90), 2),
+        'p99_ms': round(1000 * percentile(latencies, 99), 2),
+    }
+
+
+def compare(current, previous_path, threshold):
+    """Print per-scenario changes against a previous results file; returns the regressions"""
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)
+    baseline = {(r['db_size'], r['scenario']): r for r in previous['results']}
+    regressions = []
+    print(f"\nCompared with {previous['meta']['commit']} ({os.path.basename(previous_path)}):")
+    print(f"  {'db_size':>8} {'scenario':<16} {'p50':>9} {'p99':>9} {'rps':>9}")
+    for result in current['results']:
+        old = baseline.get((result['db_size'], result['scenario']))
+        if not old:
+            continue
+        changes = {}
+        for key in ('p50_ms', 'p99_ms', 'throughput_rps'):
+            changes[key] = (result[key] - old[key]) / old[key] if old[key] else 0.0
+        print(f"  {result['db_size']:>8} {result['scenario']:<16} "
+              f"{changes['p50_ms']:>+8.1%} {changes['p99_ms']:>+8.1%} {changes['throughput_rps']:>+8.1%}")
+        if changes['p50_ms'] > threshold or changes['throughput_rps'] < -threshold:
+            regressions.append((result['db_size'], result['scenario']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db-sizes', default='0,1000', help='comma-separated user counts to seed')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario and DB size')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--gemini-latency', type=float, default=0.3)
+    parser.add_argument('--gemini-jitter', type=float, default=0.05)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-payload', type=int, default=2000)
+    parser.add_argument('--resend-latency', type=float, default=0.1)
+    parser.add_argument('--resend-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/endpoints-<time>-<commit>.json)')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='regression threshold for --compare')
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    db_sizes = sorted(int(size) for size in args.db_sizes.split(','))
+    # The app runs from a temporary working directory
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    commit = git_commit()
+
+    gemini_base, resend_url, _ = fake_services.start_all(
+        fake_services.ServiceConfig(args.gemini_latency, args.gemini_jitter, args.gemini_error_rate,
+                                    args.gemini_payload, seed=args.seed),
+        fake_services.ServiceConfig(args.resend_latency, 0.0, args.resend_error_rate, seed=args.seed),
+    )
+
+    tmp_dir = tempfile.mkdtemp(prefix='food_insight_bench_')
+    A = load_app(tmp_dir, gemini_base, resend_url)
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    # Hashed with PASSWORD_HASH_METHOD, so logins measure verification without a rehash
+    password_hash = A.passwords.hash_password(BENCH_PASSWORD)
+    with A.app.app_context():
+        A.db.session.add(A.User(email=BENCH_EMAIL, number='9999999999', name='Bench User',
+                                gender='Female', password=password_hash, verified=True))
+        A.db.session.commit()
+
+    server = make_server('127.0.0.1', 0, A.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    image_bytes = make_jpeg(seed=args.seed)
+    print(f"Benchmarking commit {commit}: {args.requests} requests x {args.concurrency} workers per scenario")
+    print(f"Fake Gemini: {args.gemini_latency}s ± {args.gemini_jitter}s, error rate {args.gemini_error_rate}; "
+          f"image {len(image_bytes) // 1024} KB")
+
+    results = []
+    for size in db_sizes:
+        users = seed_users(A, size, password_hash)
+        print(f"\nDB size: {users} users ({users * MEALS_PER_USER} meals)")
+        print(f"  {'scenario':<16} {'req':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+        for name in scenarios:
+            clients = [Client(base_url, A, image_bytes) for _ in range(args.concurrency)]
+            for client in clients:
+                if name == 'dashboard':
+                    client.login_user()
+                elif name == 'admin_dashboard':
+                    client.login_admin()
+            result = run_scenario(name, clients, args.requests)
+            result['db_size'] = size
+            results.append(result)
+            print(f"  {name:<16} {result['requests']:>5} {result['errors']:>4} {result['throughput_rps']:>8.1f} "
+                  f"{result['p50_ms']:>9.1f} {result['p90_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+    server.shutdown()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"endpoints-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} scenario(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Tail latency of Gemini calls with and without hedged requests.
+
+Starts the fake Gemini server from fake_services.py with a slow tail
+(--tail-rate of calls take --tail-latency seconds) and a separate latency
+for the hedge model, then sends --requests generateContent calls through
+gemini_client.py with --concurrency callers, once per mode:
+
+    plain     primary model only
+    hedged    GEMINI_HEDGE=1: a second call to the hedge model once the
+              primary exceeds its observed p95
+
+and reports p50/p95/p99/max latency, the fraction of extra calls made and
+the estimated cost per 1000 requests. The hedge budget is learned from
+warm-up calls that are not measured.
+
+Usage:
+    python benchmarks/bench_gemini_hedging.py
+    python benchmarks/bench_gemini_hedging.py --latency 0.8 --jitter 0.2 --tail-rate 0.03 --tail-latency 6
+"""
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_services  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+PAYLOAD = {'contents': [{'parts': [{'text': 'Analyze this food image'}]}]}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_mode(gemini_client, config, hedged, args):
+    gemini_client.HEDGE_ENABLED = hedged
+    gemini_client._stats.clear()
+
+    def call(_):
+        start = time.perf_counter()
+        response, model = gemini_client.generate_content(PAYLOAD, 'bench-key')
+        return time.perf_counter() - start, response.status_code, model
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(call, range(args.warmup)))
+        calls_before = config.calls
+        cost_before = sum(entry.cost_usd for entry in gemini_client._stats.values())
+        results = list(executor.map(call, range(args.requests)))
+    # Let hedged-away calls finish so their cost is counted
+    time.sleep(args.tail_latency + 0.5)
+
+    latencies = [seconds for seconds, status, _ in results if status == 200]
+    cost = sum(entry.cost_usd for entry in gemini_client._stats.values()) - cost_before
+    return {
+        'mode': 'hedged' if hedged else 'plain',
+        'requests': len(results),
+        'errors': len(results) - len(latencies),
+        'p50_s': round(percentile(latencies, 0.50), 3),
+        'p95_s': round(percentile(latencies, 0.95), 3),
+        'p99_s': round(percentile(latencies, 0.99), 3),
+        'max_s': round(max(latencies), 3),
+        'extra_calls': round((config.calls - calls_before) / len(results) - 1, 3),
+        'answered_by': {model: sum(1 for *_, m in results if m == model) for model in {m for *_, m in results}},
+        'hedge_after_s': round(gemini_client.hedge_after(), 3),
+        'cost_per_1000_usd': round(cost / len(results) * 1000, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.3, help='mean seconds of the primary model')
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--tail-rate', type=float, default=0.03)
+    parser.add_argument('--tail-latency', type=float, default=2.0)
+    parser.add_argument('--hedge-latency', type=float, default=0.2, help='mean seconds of the hedge model')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/gemini-hedging-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    config = fake_services.ServiceConfig(args.latency, args.jitter, 0.0, seed=1,
+                                         tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    server = fake_services.start('gemini', config)
+    os.environ['GEMINI_API_BASE'] = f'http://127.0.0.1:{server.server_port}'
+    # Sub-second fake latencies: let the learned p95 set the budget
+    os.environ.setdefault('GEMINI_HEDGE_MIN_AFTER', '0.05')
+    import gemini_client
+    config.model_latency = {gemini_client.HEDGE_MODEL: args.hedge_latency}
+    print(f"primary {gemini_client.PRIMARY_MODEL} ~{args.latency}s ({args.tail_rate:.0%} take {args.tail_latency}s), "
+          f"hedge {gemini_client.HEDGE_MODEL} ~{args.hedge_latency}s")
+
+    results = []
+    print(f"\n  {'mode':<8} {'p50_s':>7} {'p95_s':>7} {'p99_s':>7} {'max_s':>7} {'extra':>7} {'$/1000':>8}")
+    for hedged in (False, True):
+        result = run_mode(gemini_client, config, hedged, args)
+        results.append(result)
+        print(f"  {result['mode']:<8} {result['p50_s']:>7} {result['p95_s']:>7} {result['p99_s']:>7} "
+              f"{result['max_s']:>7} {result['extra_calls']:>7} {result['cost_per_1000_usd']:>8}")
+    server.shutdown()
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"gemini-hedging-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Fuzz and benchmark suite for gemini_parser over recorded Gemini responses.
+
+Usage:
+    python benchmarks/bench_gemini_parser.py              # check + benchmark
+    python benchmarks/bench_gemini_parser.py --fuzz 5000  # also fuzz with mutated responses
+
+The check pass verifies every recorded response parses to the expected shape.
+The fuzz pass mutates responses (truncation, noise, fences, brace injection)
+and asserts the parser never raises and always returns valid output. The
+benchmark compares against the previous greedy-regex implementation.
+"""
+
+# Standard library imports
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gemini_parser  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures', 'gemini_responses.jsonl')
+
+
+def load_fixtures(path=FIXTURES):
+    with open(path, encoding='utf-8') as fixture_file:
+        return [json.loads(line) for line in fixture_file if line.strip()]
+
+
+def legacy_parse(text_response):
+    """The parser analyze_food_with_gemini() used before gemini_parser"""
+    try:
+        json_match = re.search(r'({.*})', text_response, re.DOTALL)
+        if json_match:
+            result = json.loads(json_match.group(1))
+            for key in gemini_parser.REQUIRED_KEYS:
+                if key not in result:
+                    result[key] = "Information not available"
+            return result
+    except json.JSONDecodeError:
+        patterns = {
+            'food_name': r'food_name"?\s*:\s*"([^"]+)"',
+            'nutrition': r'nutrition"?\s*:\s*"(.*?)"(?=,\s*"good_for_user"|,\s*"diet_plan"|,\s*"recommendation"|}})',
+            'good_for_user': r'good_for_user"?\s*:\s*"([^"]+)"',
+            'diet_plan': r'diet_plan"?\s*:\s*"([^"]+)"',
+            'recommendation': r'recommendation"?\s*:\s*"([^"]+)"'
+        }
+        result = {}
+        for key, pattern in patterns.items():
+            match = re.search(pattern, text_response, re.DOTALL)
+            result[key] = match.group(1) if match else "Information not available"
+        return result
+    return None
+
+
+def check_result(result):
+    if result is None:
+        return
+    assert set(result) == set(gemini_parser.REQUIRED_KEYS), result.keys()
+    for key, value in result.items():
+        assert isinstance(value, str) and value, (key, value)
+    assert result['nutrition'] == gemini_parser.MISSING_VALUE or '<ul>' in result['nutrition']
+
+
+def run_checks(fixtures):
+    print("Recorded responses:")
+    for fixture in fixtures:
+        result = gemini_parser.parse_response(fixture['text'])
+        check_result(result)
+        try:
+            legacy_result = legacy_parse(fixture['text'])
+            legacy = legacy_result['food_name'][:30] if legacy_result else 'no result'
+        except Exception as e:
+            legacy = f'raised {type(e).__name__}'
+        status = result['food_name'] if result else 'no result'
+        print(f"  {fixture['kind']:<22} -> {status[:40]:<40} (legacy: {legacy})")
+
+
+def mutate(text, rng):
+    choice = rng.randrange(6)
+    if choice == 0 and text:
+        return text[:rng.randrange(len(text))]
+    if choice == 1:
+        pos = rng.randrange(len(text) + 1)
+        noise = ''.join(rng.choice('{}[]",:\\ \n`abc') for _ in range(rng.randrange(1, 8)))
+        return text[:pos] + noise + text[pos:]
+    if choice == 2:
+        return f"```json\n{text}\n```"
+    if choice == 3:
+        return "Sure! {not json} " + text + " {also: not json}"
+    if choice == 4 and text:
+        pos = rng.randrange(len(text))
+        return text[:pos] + text[pos + 1:]
+    return text * 2
+
+
+def run_fuzz(fixtures, iterations, seed):
+    rng = random.Random(seed)
+    for _ in range(iterations):
+        text = rng.choice(fixtures)['text']
+        for _ in range(rng.randrange(1, 4)):
+            text = mutate(text, rng)
+        try:
+            check_result(gemini_parser.parse_response(text))
+        except Exception:
+            print("❌ Fuzz failure on input:")
+            print(repr(text[:500]))
+            raise
+    print(f"\n✓ Fuzzed {iterations} mutated responses without errors")
+
+
+def run_benchmark(fixtures, rounds):
+    def timed(parser):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for fixture in fixtures:
+                try:
+                    parser(fixture['text'])
+                except Exception:
+                    pass
+        return (time.perf_counter() - start) / (rounds * len(fixtures)) * 1e6
+
+    print(f"\nBenchmark ({rounds} rounds over {len(fixtures)} responses):")
+    new_us = timed(gemini_parser.parse_response)
+    old_us = timed(legacy_parse)
+    print(f"  gemini_parser: {new_us:8.1f} us/response")
+    print(f"  legacy regex:  {old_us:8.1f} us/response")
+
+    long_text = max(fixtures, key=lambda f: len(f['text']))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        gemini_parser.parse_response(long_text['text'])
+    per_call = (time.perf_counter() - start) / rounds * 1e6
+    print(f"  longest response ({len(long_text['text'])} chars): {per_call:.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fuzz', type=int, default=0, help='number of fuzz iterations')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--rounds', type=int, default=200, help='benchmark rounds')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    run_checks(fixtures)
+    if args.fuzz:
+        run_fuzz(fixtures, args.fuzz, args.seed)
+    run_benchmark(fixtures, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
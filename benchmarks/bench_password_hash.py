@@ -0,0 +1,157 @@
+"""
+Password verification throughput per core.
+
+For each hash method, runs --verifies password checks through the
+passwords.py pool with 1, 2, 4... concurrent callers (up to --max-callers)
+and reports:
+
+    verify_ms      mean time of one check with a single caller
+    per_sec        checks completed per second
+    per_core_sec   per_sec divided by the CPU cores used (min(callers, pool
+                   workers, cores)), i.e. logins per second per core
+    p99_ms         99th percentile wait + verify time seen by a caller
+
+Methods default to the configured PASSWORD_HASH_METHOD, Werkzeug's scrypt
+and pbkdf2 defaults and, with --target-ms, the scrypt/pbkdf2 costs that
+passwords.calibrate() picks for that time on this machine.
+
+For end-to-end login latency, run bench_endpoints.py with the same
+PASSWORD_HASH_METHOD.
+
+Usage:
+    python benchmarks/bench_password_hash.py
+    python benchmarks/bench_password_hash.py --target-ms 100 --verifies 200
+    PASSWORD_HASH_WORKERS=8 python benchmarks/bench_password_hash.py --max-callers 16
+"""
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import passwords  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+PASSWORD = 'bench-password'
+
+DEFAULT_METHODS = ('scrypt:32768:8:1', 'pbkdf2:sha256:600000')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_method(method, verifies, callers_list):
+    stored = passwords.hash_password(PASSWORD, method)
+    cores = os.cpu_count() or 1
+    results = []
+    for callers in callers_list:
+        def check(_):
+            start = time.perf_counter()
+            try:
+                ok, _new_hash = passwords.verify(stored, PASSWORD)
+            except passwords.HashingBusy:
+                return None
+            assert ok
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            timings = list(executor.map(check, range(verifies)))
+        elapsed = time.perf_counter() - start
+        completed = [timing for timing in timings if timing is not None]
+        per_sec = len(completed) / elapsed
+        used_cores = min(callers, passwords.WORKERS, cores)
+        results.append({
+            'method': method,
+            'callers': callers,
+            'verify_ms': None,
+            'per_sec': round(per_sec, 2),
+            'per_core_sec': round(per_sec / used_cores, 2),
+            'p99_ms': round(percentile(completed, 0.99) * 1000, 1) if completed else None,
+            'rejected': len(timings) - len(completed),
+        })
+    single = [result for result in results if result['callers'] == 1]
+    if single:
+        single[0]['verify_ms'] = round(1000 / single[0]['per_sec'], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verifies', type=int, default=60, help='checks per method and caller count')
+    parser.add_argument('--max-callers', type=int, default=8)
+    parser.add_argument('--methods', help='comma-separated method strings (default: configured + Werkzeug defaults)')
+    parser.add_argument('--target-ms', type=float, help='also benchmark the calibrated scrypt/pbkdf2 cost for this time')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/password-hash-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    if args.methods:
+        methods = args.methods.split(',')
+    else:
+        methods = list(dict.fromkeys((passwords.METHOD,) + DEFAULT_METHODS))
+    if args.target_ms:
+        for algorithm in ('scrypt', 'pbkdf2'):
+            method = passwords.calibrate(algorithm, args.target_ms / 1000)
+            print(f"Calibrated {algorithm} for {args.target_ms:g} ms: {method}")
+            if method not in methods:
+                methods.append(method)
+
+    callers_list = []
+    callers = 1
+    while callers <= args.max_callers:
+        callers_list.append(callers)
+        callers *= 2
+
+    print(f"{os.cpu_count()} cores, pool: {passwords.WORKERS} {passwords.POOL_KIND} workers, "
+          f"queue limit {passwords.QUEUE_LIMIT}")
+    print(f"\n  {'method':<24} {'callers':>7} {'verify_ms':>9} {'per_sec':>8} {'per_core':>8} {'p99_ms':>8} {'rejected':>8}")
+    results = []
+    for method in methods:
+        for result in run_method(method, args.verifies, callers_list):
+            results.append(result)
+            print(f"  {method:<24} {result['callers']:>7} {result['verify_ms'] or '':>9} {result['per_sec']:>8} "
+                  f"{result['per_core_sec']:>8} {result['p99_ms']:>8} {result['rejected']:>8}")
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pool': {'kind': passwords.POOL_KIND, 'workers': passwords.WORKERS, 'queue_limit': passwords.QUEUE_LIMIT},
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"password-hash-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+SQLite write throughput: default settings vs. the db_sqlite.py production mode.
+
+Starts --processes worker processes (like gunicorn workers), each with
+--threads threads, all inserting HealthData-like rows (a few KB of
+analysis text) into one SQLite file and bumping a per-user rollup counter
+in the same transaction, as the dashboard upload does. Modes:
+
+    default      pysqlite defaults (rollback journal, synchronous=FULL),
+                 one transaction per insert
+    tuned        db_sqlite.configure_engine(): WAL, synchronous=NORMAL,
+                 mmap, busy_timeout; one transaction per insert
+    tuned+queue  tuned, with inserts sent through db_sqlite.WriteQueue
+                 (one writer thread per process on a writer_engine(),
+                 BEGIN IMMEDIATE, batched commits)
+
+Reports inserts per second, p50/p99 latency per insert and the number of
+"database is locked" (or other) failures.
+
+Usage:
+    python benchmarks/bench_sqlite_writes.py
+    python benchmarks/bench_sqlite_writes.py --processes 8 --threads 8 --inserts 200
+"""
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Third-party imports
+from sqlalchemy import create_engine, insert, update, Column, Integer, String, Text, DateTime, MetaData, Table
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db_sqlite  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+MODES = ('default', 'tuned', 'tuned+queue')
+USERS = 50
+
+metadata = MetaData()
+health_data = Table(
+    'health_data', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, index=True),
+    Column('food_name', String(200)),
+    Column('nutrition_info', Text),
+    Column('diet_plan', Text),
+    Column('timestamp', DateTime),
+)
+rollup = Table(
+    'rollup', metadata,
+    Column('user_id', Integer, primary_key=True),
+    Column('meals', Integer, nullable=False),
+)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def store(session, rng):
+    user_id = rng.randrange(USERS)
+    session.execute(insert(health_data).values(
+        user_id=user_id, food_name='Chicken Biryani', nutrition_info='<li>x</li>' * 300,
+        diet_plan='Keep portions moderate. ' * 60, timestamp=datetime.utcnow()))
+    session.execute(update(rollup).where(rollup.c.user_id == user_id).values(meals=rollup.c.meals + 1))
+
+
+def worker(path, mode, threads, inserts, seed, results):
+    engine = create_engine(f'sqlite:///{path}')
+    if mode != 'default':
+        db_sqlite.configure_engine(engine)
+    write_queue = None
+    if mode == 'tuned+queue':
+        writer = db_sqlite.writer_engine(f'sqlite:///{path}')
+        write_queue = db_sqlite.WriteQueue(lambda: db_sqlite.write_session(writer))
+
+    def run_thread(index):
+        rng = random.Random(seed * 1000 + index)
+        latencies, errors = [], 0
+        for _ in range(inserts):
+            start = time.perf_counter()
+            try:
+                if write_queue is not None:
+                    write_queue.submit(lambda session: store(session, rng)).result()
+                else:
+                    with Session(engine) as session:
+                        store(session, rng)
+                        session.commit()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+        return latencies, errors
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outcomes = list(executor.map(run_thread, range(threads)))
+    results.put(([seconds for latencies, _ in outcomes for seconds in latencies],
+                 sum(errors for _, errors in outcomes)))
+
+
+def run_mode(mode, args, tmp_dir):
+    path = os.path.join(tmp_dir, f"{mode.replace('+', '_')}.db")
+    engine = create_engine(f'sqlite:///{path}')
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(rollup), [{'user_id': user_id, 'meals': 0} for user_id in range(USERS)])
+    engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(path, mode, args.threads, args.inserts, seed, results))
+                 for seed in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    latencies = [seconds for worker_latencies, _ in collected for seconds in worker_latencies]
+    return {
+        'mode': mode,
+        'inserts': len(latencies),
+        'errors': sum(errors for _, errors in collected),
+        'elapsed_s': round(elapsed, 3),
+        'inserts_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--inserts', type=int, default=100, help='inserts per thread')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--output', help='results file (default: benchmarks/results/sqlite-writes-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads x {args.inserts} inserts")
+    print(f"\n  {'mode':<12} {'inserts/s':>10} {'p50_ms':>8} {'p99_ms':>8} {'errors':>7}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in args.modes.split(','):
+            result = run_mode(mode, args, tmp_dir)
+            results.append(result)
+            print(f"  {mode:<12} {result['inserts_per_sec']:>10} {result['p50_ms']:>8} "
+                  f"{result['p99_ms']:>8} {result['errors']:>7}")
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"sqlite-writes-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
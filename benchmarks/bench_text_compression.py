@@ -0,0 +1,205 @@
+"""
+Storage and read-latency benchmark for CompressedText.
+
+Builds HealthData-like rows from the recorded Gemini responses (several
+responses joined per field, --scale, to reach realistic multi-KB text),
+stores them in a throwaway SQLite database with each codec and measures:
+
+    stored_mb      characters stored in the four analysis columns
+    file_mb        database file size after VACUUM
+    write_s        compress + insert every row
+    list_s         load every row without the deferred analysis columns
+    read_s         load every row with all four fields (decompressing them)
+
+Codecs: plain (no compression), zlib, and zstd / zstd+dict when the
+zstandard package is installed.
+
+Usage:
+    python benchmarks/bench_text_compression.py
+    python benchmarks/bench_text_compression.py --rows 20000 --scale 6
+"""
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Third-party imports
+from sqlalchemy import create_engine, select, insert, Column, Integer, String, Text, MetaData, Table
+from sqlalchemy.orm import Session, DeclarativeBase, deferred, undefer_group
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gemini_parser  # noqa: E402
+import compressed_text  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures', 'gemini_responses.jsonl')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Model field -> gemini_parser key
+FIELDS = {
+    'nutrition_info': 'nutrition',
+    'assessment': 'good_for_user',
+    'diet_plan': 'diet_plan',
+    'recommendation': 'recommendation',
+}
+
+CODECS = {'zlib': compressed_text.ZLIB, 'zstd': compressed_text.ZSTD, 'zstd+dict': compressed_text.ZSTD_DICT}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def load_samples():
+    """Parsed analysis fields of every recorded Gemini response"""
+    samples = {field: [] for field in FIELDS}
+    with open(FIXTURES, encoding='utf-8') as fixture_file:
+        for line in fixture_file:
+            if not line.strip():
+                continue
+            result = gemini_parser.parse_response(json.loads(line)['text'])
+            if result is None:
+                continue
+            for field, key in FIELDS.items():
+                if result.get(key):
+                    samples[field].append(result[key])
+    return samples
+
+
+def make_rows(samples, count, scale, seed=0):
+    rng = random.Random(seed)
+    return [
+        {field: ' '.join(rng.choice(values) for _ in range(rng.randint(1, scale)))
+         for field, values in samples.items()}
+        for _ in range(count)
+    ]
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Row(Base):
+    """The HealthData columns that matter here"""
+    __tablename__ = 'health_data'
+    id = Column(Integer, primary_key=True)
+    food_name = Column(String(100))
+    nutrition_info = deferred(Column(compressed_text.CompressedText), group='analysis')
+    assessment = deferred(Column(compressed_text.CompressedText), group='analysis')
+    diet_plan = deferred(Column(compressed_text.CompressedText), group='analysis')
+    recommendation = deferred(Column(compressed_text.CompressedText), group='analysis')
+
+
+def run_codec(codec, rows, tmp_dir):
+    path = os.path.join(tmp_dir, f'{codec}.db')
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    # Same table with plain Text columns, to insert pre-encoded values
+    raw = Table('health_data', MetaData(), Column('id', Integer, primary_key=True), Column('food_name', String(100)),
+                *(Column(field, Text) for field in FIELDS))
+
+    start = time.perf_counter()
+    if codec == 'plain':
+        encoded = rows
+    else:
+        encoded = [{field: compressed_text.compress(value, codec=CODECS[codec]) for field, value in row.items()}
+                   for row in rows]
+    with engine.begin() as conn:
+        conn.execute(insert(raw), [{'food_name': 'Sample meal', **row} for row in encoded])
+    write_s = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql(
+            'SELECT SUM(' + ' + '.join(f'COALESCE(LENGTH({field}), 0)' for field in FIELDS) + ') FROM health_data'
+        ).scalar()
+        conn.exec_driver_sql('VACUUM')
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        listed = session.execute(select(Row)).scalars().all()
+        list_s = time.perf_counter() - start
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        loaded = session.execute(select(Row).options(undefer_group('analysis'))).scalars().all()
+        for row in loaded:
+            row.nutrition_info, row.assessment, row.diet_plan, row.recommendation
+        read_s = time.perf_counter() - start
+        assert loaded[0].nutrition_info == rows[0]['nutrition_info']
+
+    engine.dispose()
+    return {
+        'codec': codec,
+        'rows': len(listed),
+        'stored_mb': round(stored / 1024 / 1024, 3),
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 3),
+        'write_s': round(write_s, 4),
+        'list_s': round(list_s, 4),
+        'read_s': round(read_s, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--scale', type=int, default=3, help='max responses joined per field')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/text-compression-<time>-<commit>.json)')
+    args = parser.parse_args()
+
+    samples = load_samples()
+    rows = make_rows(samples, args.rows, args.scale)
+    average = sum(len(value.encode('utf-8')) for row in rows for value in row.values()) / len(rows)
+    print(f"{len(rows)} rows, {average / 1024:.1f} KB of analysis text per row")
+
+    codecs = ['plain', 'zlib']
+    if compressed_text.zstandard is not None:
+        codecs.append('zstd')
+        compressed_text.set_dictionary(compressed_text.train_dictionary(
+            [value for row in rows[:1000] for value in row.values()]))
+        codecs.append('zstd+dict')
+    else:
+        print("zstandard not installed: skipping zstd codecs")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"\n  {'codec':<10} {'stored_mb':>10} {'file_mb':>9} {'write_s':>9} {'list_s':>8} {'read_s':>8}")
+        for codec in codecs:
+            result = run_codec(codec, rows, tmp_dir)
+            results.append(result)
+            print(f"  {codec:<10} {result['stored_mb']:>10} {result['file_mb']:>9} "
+                  f"{result['write_s']:>9} {result['list_s']:>8} {result['read_s']:>8}")
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"text-compression-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Local fake Gemini and Resend servers for benchmarks.
+
+Point the app at them with:
+    GEMINI_API_BASE=http://127.0.0.1:8091 RESEND_API_URL=http://127.0.0.1:8092/emails
+
+Usage:
+    python benchmarks/fake_services.py --gemini-latency 0.8 --gemini-error-rate 0.02
+    python benchmarks/fake_services.py --gemini-tail-rate 0.05 --gemini-tail-latency 6 \
+        --gemini-model-latency gemini-2.0-flash-lite=0.4
+
+Each server has a configurable latency (mean and jitter, in seconds) and
+error rate. A fraction of calls (--gemini-tail-rate) can take
+--gemini-tail-latency instead, to model a slow tail, and Gemini models
+can be given their own mean latency (the model is read from the URL). The fake Gemini server answers with a JSON analysis whose
+nutrition text is padded to --gemini-payload bytes; errors alternate
+between HTTP 500 and 429 (quota).
+"""
+
+# Standard library imports
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_FOODS = ('Chicken Biryani', 'Paneer Butter Masala', 'Masala Dosa', 'Caesar Salad', 'Margherita Pizza')
+
+
+class ServiceConfig:
+    """Latency and failure behaviour of one fake service"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, payload_bytes=2000, seed=None,
+                 tail_rate=0.0, tail_latency=0.0, model_latency=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload_bytes = payload_bytes
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.model_latency = model_latency or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def next_call(self, model=None):
+        """Return (delay in seconds, fail?) for the next request"""
+        with self.lock:
+            self.calls += 1
+            latency = self.model_latency.get(model, self.latency)
+            delay = max(0.0, self.rng.gauss(latency, self.jitter)) if self.jitter else latency
+            if self.tail_rate and self.rng.random() < self.tail_rate:
+                delay = self.tail_latency
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return delay, fail
+
+
+def gemini_analysis(payload_bytes, rng):
+    """A response body shaped like a real Gemini generateContent answer"""
+    food = rng.choice(GEMINI_FOODS)
+    items = ['Calories: 450 kcal', 'Protein: 22 g', 'Carbohydrates: 48 g', 'Fat: 18 g', 'Fiber: 4 g']
+    nutrition = ''.join(f'<li>{item}</li>' for item in items)
+    padding = max(0, payload_bytes - len(nutrition) - 200)
+    if padding:
+        nutrition += f"<li>Notes: {'x' * padding}</li>"
+    analysis = {
+        'food_name': food,
+        'nutrition': f'<ul>{nutrition}</ul>',
+        'good_for_user': f'{food} is fine in moderation for this profile.',
+        'diet_plan': 'Pair with vegetables and keep portions moderate.',
+        'recommendation': 'Add a side salad for fiber.',
+    }
+    text = json.dumps(analysis)
+    # Image (258 tokens) plus the prompt; output at roughly 4 characters per token
+    usage = {'promptTokenCount': 520, 'candidatesTokenCount': len(text) // 4}
+    return {'candidates': [{'content': {'parts': [{'text': text}]}}], 'usageMetadata': usage}
+
+
+def _make_handler(kind, config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            # Read the whole request (the Gemini request carries the base64 image)
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            model = self.path.split('?', 1)[0].rsplit('/', 1)[-1].split(':', 1)[0] if kind == 'gemini' else None
+            delay, fail = config.next_call(model)
+            if delay:
+                time.sleep(delay)
+
+            if kind == 'gemini':
+                if not self.path.split('?', 1)[0].endswith(':generateContent'):
+                    return self._send(404, {'error': {'message': 'Not found'}})
+                if fail:
+                    if config.errors % 2:
+                        return self._send(500, {'error': {'message': 'Internal error'}})
+                    return self._send(429, {'error': {'message': 'Resource has been exhausted (e.g. check quota).'}})
+                with config.lock:
+                    body = gemini_analysis(config.payload_bytes, config.rng)
+                return self._send(200, body)
+
+            if fail:
+                return self._send(500, {'message': 'Internal server error'})
+            return self._send(200, {'id': str(uuid.uuid4())})
+
+    return Handler
+
+
+def start(kind, config, port=0, host='127.0.0.1'):
+    """Start a fake service on a background thread; returns the server (server.server_port)"""
+    server = ThreadingHTTPServer((host, port), _make_handler(kind, config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'fake-{kind}', daemon=True).start()
+    return server
+
+
+def start_all(gemini_config=None, resend_config=None, gemini_port=0, resend_port=0):
+    """
+    Start both fake services.
+
+    Returns:
+        tuple: (GEMINI_API_BASE, RESEND_API_URL, [servers])
+    """
+    gemini = start('gemini', gemini_config or ServiceConfig(), gemini_port)
+    resend = start('resend', resend_config or ServiceConfig(), resend_port)
+    return (
+        f'http://127.0.0.1:{gemini.server_port}',
+        f'http://127.0.0.1:{resend.server_port}/emails',
+        [gemini, resend],
+    )
+
+
+def parse_model_latency(values):
+    """['gemini-2.0-flash-lite=0.4', ...] -> {'gemini-2.0-flash-lite': 0.4}"""
+    return {model: float(seconds) for model, seconds in (value.split('=', 1) for value in values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--gemini-port', type=int, default=8091)
+    parser.add_argument('--resend-port', type=int, default=8092)
+    parser.add_argument('--gemini-latency', type=float, default=0.8, help='mean seconds per Gemini call')
+    parser.add_argument('--gemini-jitter', type=float, default=0.2)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-payload', type=int, default=2000, help='approximate response size in bytes')
+    parser.add_argument('--gemini-tail-rate', type=float, default=0.0, help='fraction of calls taking --gemini-tail-latency')
+    parser.add_argument('--gemini-tail-latency', type=float, default=0.0)
+    parser.add_argument('--gemini-model-latency', action='append', default=[], metavar='MODEL=SECONDS',
+                        help='mean latency of one model (repeatable)')
+    parser.add_argument('--resend-latency', type=float, default=0.15)
+    parser.add_argument('--resend-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    gemini_base, resend_url, _ = start_all(
+        ServiceConfig(args.gemini_latency, args.gemini_jitter, args.gemini_error_rate, args.gemini_payload,
+                      tail_rate=args.gemini_tail_rate, tail_latency=args.gemini_tail_latency,
+                      model_latency=parse_model_latency(args.gemini_model_latency)),
+        ServiceConfig(args.resend_latency, 0.0, args.resend_error_rate),
+        args.gemini_port, args.resend_port,
+    )
+    print(f"GEMINI_API_BASE={gemini_base}")
+    print(f"RESEND_API_URL={resend_url}")
+    print("Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Static asset pipeline.
+
+Steps:
+- meta:    make sure every template has the Google site verification meta tag
+           (replaces the old update_meta_tags.py)
+- build:   minify and fingerprint static/css and static/js into static/dist
+           and write the manifest used by asset_url() (see assets.py)
+- extract: move inline <style>/<script> blocks out of the templates into
+           static/css/<template>.css and static/js/<template>.js, with the
+           rules shared by a SHARED_CSS group in one common file, and link
+           them through asset_url(). Blocks containing Jinja stay inline.
+
+Usage:
+    python build_assets.py            # meta + build
+    python build_assets.py --extract  # extract + meta + build
+"""
+
+import os
+import re
+import textwrap
+
+import assets
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(ROOT, 'templates')
+STATIC_DIR = os.path.join(ROOT, 'static')
+
+VERIFICATION_META = '<meta name="google-site-verification" content="w2tVvd9upM2GXkKphEKtZG5DmJg7UMNSsO7fvCDwHow" />'
+
+# Pages that share one stylesheet for the rules they all contain
+SHARED_CSS = {
+    'auth': ('login', 'register', 'forgot_password', 'reset_password', 'resend_otp', 'verify_otp'),
+}
+
+STYLE_BLOCK = re.compile(r'^([ \t]*)<style>\n(.*?)^[ \t]*</style>[ \t]*\n', re.S | re.M)
+SCRIPT_BLOCK = re.compile(r'^([ \t]*)<script>\n(.*?)^[ \t]*</script>[ \t]*\n', re.S | re.M)
+
+
+def template_files():
+    for name in sorted(os.listdir(TEMPLATES_DIR)):
+        if name.endswith('.html'):
+            yield os.path.join(TEMPLATES_DIR, name)
+
+
+# meta
+
+def add_meta_tag(file_path):
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+
+    # Check if meta tag already exists
+    if 'google-site-verification' in content:
+        return False
+
+    # Add meta tag after the first <head> tag
+    new_content = content.replace('<head>', '<head>\n    ' + VERIFICATION_META, 1)
+
+    if content != new_content:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(new_content)
+        print(f"  ✓ Added verification meta tag to {os.path.basename(file_path)}")
+        return True
+    return False
+
+
+# extract
+
+def split_rules(css):
+    """Top-level CSS rules (an @media block counts as one rule)"""
+    rules, depth, start = [], 0, 0
+    for index, char in enumerate(css):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:index + 1].strip())
+                start = index + 1
+    return [rule for rule in rules if rule]
+
+
+def _normalize(rule):
+    return ' '.join(rule.split())
+
+
+def _selector(rule):
+    return _normalize(rule.split('{', 1)[0])
+
+
+def _write_source(relative_path, content):
+    path = os.path.join(STATIC_DIR, relative_path)
+    if os.path.exists(path):
+        raise FileExistsError(f'{relative_path} already exists; move it away before extracting again')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as source_file:
+        source_file.write(content.rstrip() + '\n')
+    print(f"  ✓ Wrote static/{relative_path}")
+
+
+def extract():
+    """Move inline styles and scripts into static/ and link them from the templates"""
+    pages = {}
+    for path in template_files():
+        with open(path, encoding='utf-8') as template_file:
+            pages[os.path.splitext(os.path.basename(path))[0]] = template_file.read()
+
+    page_rules = {}
+    for page, html in pages.items():
+        match = STYLE_BLOCK.search(html)
+        if match and '{{' not in match.group(2) and '{%' not in match.group(2):
+            page_rules[page] = split_rules(textwrap.dedent(match.group(2)))
+
+    # Rules every page of a group has, unless a page also styles the same selector itself
+    shared_for = {}
+    for group, members in SHARED_CSS.items():
+        members = [page for page in members if page in page_rules]
+        if len(members) < 2:
+            continue
+        common = set.intersection(*({_normalize(rule) for rule in page_rules[page]} for page in members))
+        for page in members:
+            own = {_selector(rule) for rule in page_rules[page] if _normalize(rule) not in common}
+            common = {rule for rule in common if _selector(rule) not in own}
+        shared = [rule for rule in page_rules[members[0]] if _normalize(rule) in common]
+        if shared:
+            _write_source(f'css/{group}.css', '\n\n'.join(shared))
+            for page in members:
+                shared_for[page] = (group, common)
+
+    for page, html in pages.items():
+        original = html
+
+        if page in page_rules:
+            indent = STYLE_BLOCK.search(html).group(1)
+            links = []
+            group, common = shared_for.get(page, (None, set()))
+            if group:
+                links.append(f"{indent}<link rel=\"stylesheet\" href=\"{{{{ asset_url('css/{group}.css') }}}}\">\n")
+            own = [rule for rule in page_rules[page] if _normalize(rule) not in common]
+            if own:
+                _write_source(f'css/{page}.css', '\n\n'.join(own))
+                links.append(f"{indent}<link rel=\"stylesheet\" href=\"{{{{ asset_url('css/{page}.css') }}}}\">\n")
+            html = STYLE_BLOCK.sub(lambda match: ''.join(links), html, count=1)
+
+        scripts = [match for match in SCRIPT_BLOCK.finditer(html)
+                   if '{{' not in match.group(2) and '{%' not in match.group(2)]
+        for number, match in enumerate(reversed(scripts)):
+            name = page if len(scripts) == 1 else f'{page}-{len(scripts) - number}'
+            _write_source(f'js/{name}.js', textwrap.dedent(match.group(2)))
+            tag = f"{match.group(1)}<script src=\"{{{{ asset_url('js/{name}.js') }}}}\"></script>\n"
+            html = html[:match.start()] + tag + html[match.end():]
+
+        if html != original:
+            with open(os.path.join(TEMPLATES_DIR, f'{page}.html'), 'w', encoding='utf-8') as template_file:
+                template_file.write(html)
+            print(f"  ✓ Updated templates/{page}.html")
+
+
+def main():
+    import sys
+
+    print("="*60)
+    print("BUILDING STATIC ASSETS")
+    print("="*60)
+
+    if '--extract' in sys.argv[1:]:
+        print("\nExtracting inline styles and scripts...")
+        extract()
+
+    print("\nChecking verification meta tags...")
+    updated = [path for path in template_files() if add_meta_tag(path)]
+    if not updated:
+        print("  ✓ All templates have the meta tag")
+
+    print("\nMinifying and fingerprinting...")
+    manifest = assets.build(STATIC_DIR)
+    for source, target in sorted(manifest.items()):
+        source_size = os.path.getsize(os.path.join(STATIC_DIR, source))
+        target_size = os.path.getsize(os.path.join(STATIC_DIR, target))
+        print(f"  ✓ {source} -> {target} ({source_size} -> {target_size} bytes)")
+
+    print(f"\n✓ Built {len(manifest)} assets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Record/replay of outbound HTTP traffic (Gemini and Resend).
+
+Enabled by configuration only; the calls in analyze_food_with_gemini()
+and send_verification_email() are unchanged:
+
+    CASSETTE_MODE=record CASSETTE_PATH=cassettes/gemini.jsonl.gz python app.py
+    CASSETTE_MODE=replay CASSETTE_PATH=cassettes/gemini.jsonl.gz python app.py
+
+Like vcrpy, the recorder hooks the transport: install() wraps
+requests' HTTPAdapter.send, so both gemini_client's shared session and
+plain requests.post() calls go through it. Only requests to
+CASSETTE_HOSTS are touched (by default the hosts of GEMINI_API_BASE and
+RESEND_API_URL); other traffic is sent as usual.
+
+Cassettes are gzip'd JSON lines, one interaction per line: method, URL
+and a SHA-256 of the request body (the base64 image is not stored),
+status, Content-Type, response body and elapsed time. API keys are
+removed from URLs and no request headers are kept.
+
+Replay:
+- CASSETTE_MATCH=body (default) answers a request with the recorded
+  response of the same method, URL path and body; =url ignores the body and
+  serves a URL's responses in recorded order (for benchmarks that upload
+  different images). Repeated requests get the next recorded response,
+  and the last one once they run out.
+- CASSETTE_TIMING=original sleeps for each recorded elapsed time;
+  =fast answers immediately.
+- unmatched requests raise requests.ConnectionError, so a replayed run
+  never reaches the network.
+
+Record with a single worker process; every worker appends to the same file.
+"""
+
+# Standard library imports
+import os
+import io
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Third-party imports
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Local imports
+import structured_logging
+
+MODE = os.getenv('CASSETTE_MODE', 'off').lower()
+PATH = os.getenv('CASSETTE_PATH', os.path.join('cassettes', 'outbound.jsonl.gz'))
+MATCH = os.getenv('CASSETTE_MATCH', 'body').lower()
+TIMING = os.getenv('CASSETTE_TIMING', 'original').lower()
+# Comma-separated host[:port] list; default: the Gemini and Resend hosts
+HOSTS = [host.strip() for host in os.getenv('CASSETTE_HOSTS', '').split(',') if host.strip()]
+
+# Query parameters never written to a cassette
+REDACTED_PARAMS = ('key', 'api_key', 'apikey', 'access_token')
+
+logger = structured_logging.get_logger('cassettes')
+
+_original_send = HTTPAdapter.send
+_recorder = None
+
+
+def default_hosts():
+    hosts = set()
+    for name, default in (('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com'),
+                          ('RESEND_API_URL', 'https://api.resend.com/emails')):
+        hosts.add(urlsplit(os.getenv(name, default)).netloc)
+    return hosts
+
+
+def redact_url(url):
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name.lower() not in REDACTED_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def body_digest(body):
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+def _key(method, url, digest):
+    # Host and port are left out, so a cassette recorded against one
+    # address (e.g. a fake server on a random port) replays on another
+    parts = urlsplit(url)
+    target = f'{parts.path}?{parts.query}' if parts.query else parts.path
+    if MATCH == 'url':
+        return method, target
+    return method, target, digest
+
+
+class Cassette:
+    """Interactions of one cassette file, for recording or replay"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.replies = defaultdict(deque)
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+            for line in cassette_file:
+                interaction = json.loads(line)
+                request = interaction['request']
+                self.replies[_key(request['method'], request['url'], request['body_sha256'])].append(
+                    interaction['response'])
+        return self
+
+    def next_reply(self, key):
+        with self.lock:
+            replies = self.replies.get(key)
+            if not replies:
+                return None
+            return replies.popleft() if len(replies) > 1 else replies[0]
+
+    def append(self, interaction):
+        line = (json.dumps(interaction, separators=(',', ':')) + '\n').encode('utf-8')
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as member:
+            member.write(line)
+        # One gzip member per interaction; readers decode concatenated members
+        with self.lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'ab') as cassette_file:
+                cassette_file.write(buffer.getvalue())
+
+
+class Recorder:
+    """Wraps HTTPAdapter.send for the configured hosts"""
+
+    def __init__(self, cassette, mode, hosts):
+        self.cassette = cassette
+        self.mode = mode
+        self.hosts = set(hosts)
+
+    def send(self, adapter, request, **kwargs):
+        if urlsplit(request.url).netloc not in self.hosts:
+            return _original_send(adapter, request, **kwargs)
+        url = redact_url(request.url)
+        digest = body_digest(request.body)
+        if self.mode == 'replay':
+            return self._replay(request, url, digest)
+        start = time.perf_counter()
+        response = _original_send(adapter, request, **kwargs)
+        # Time to the response headers, like requests' Response.elapsed (which
+        # Session.send only fills in after the adapter returns)
+        elapsed = time.perf_counter() - start
+        self.cassette.append({
+            'request': {'method': request.method, 'url': url, 'body_sha256': digest},
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'content_type': response.headers.get('Content-Type'),
+                'body': response.text,
+                'elapsed': round(elapsed, 4),
+            },
+        })
+        return response
+
+    def _replay(self, request, url, digest):
+        reply = self.cassette.next_reply(_key(request.method, url, digest))
+        if reply is None:
+            raise requests.ConnectionError(f"No recorded interaction for {request.method} {url}", request=request)
+        if TIMING == 'original':
+            time.sleep(reply['elapsed'])
+        response = requests.Response()
+        response.status_code = reply['status']
+        response.reason = reply['reason']
+        response.headers = CaseInsensitiveDict({'Content-Type': reply['content_type']} if reply['content_type'] else {})
+        response._content = reply['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=reply['elapsed'])
+        return response
+
+
+def install(mode, path, hosts=None):
+    """Start recording to or replaying from a cassette"""
+    global _recorder
+    cassette = Cassette(path)
+    if mode == 'replay':
+        cassette.load()
+    _recorder = Recorder(cassette, mode, hosts or default_hosts())
+
+    def send(adapter, request, **kwargs):
+        return _recorder.send(adapter, request, **kwargs)
+
+    HTTPAdapter.send = send
+    return _recorder
+
+
+def uninstall():
+    global _recorder
+    HTTPAdapter.send = _original_send
+    _recorder = None
+
+
+def init_app(app):
+    """Install the recorder when CASSETTE_MODE is record or replay"""
+    if MODE not in ('record', 'replay'):
+        return
+    recorder = install(MODE, PATH, HOSTS or None)
+    logger.warning("Outbound HTTP %s via cassette", 'replayed' if MODE == 'replay' else 'recorded',
+                   extra={'path': PATH, 'hosts': sorted(recorder.hosts), 'match': MATCH, 'timing': TIMING})
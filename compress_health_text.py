@@ -0,0 +1,189 @@
+"""
+Script to compress (or decompress) the Gemini analysis text of existing
+HealthData rows.
+
+New rows are compressed automatically by the CompressedText column type;
+this migrates rows written before it, in batches. Plain and compressed
+values can coexist, so the app keeps running while it works and the
+script can be stopped and rerun at any time.
+
+Usage:
+    python compress_health_text.py                    # compress plain values
+    python compress_health_text.py --stats            # stored sizes and dictionaries in use
+    python compress_health_text.py --decompress       # back to plain text (before a rollback)
+    python compress_health_text.py --train-dict <path>  # train a zstd dictionary from stored text
+    python compress_health_text.py --recompress       # move values to the current dictionary
+
+Switching to a new dictionary: train it into a new file, set
+TEXT_COMPRESSION_DICT to it and TEXT_COMPRESSION_OLD_DICTS to the old one,
+run --recompress, then drop the old file once --stats no longer lists it.
+The script refuses to run while stored values reference a dictionary that
+is not configured, and refuses to overwrite a dictionary file still in use.
+
+After compressing, run VACUUM (SQLite) or VACUUM / pg_repack (PostgreSQL)
+to give the freed space back.
+"""
+
+import os
+
+from sqlalchemy import select, update, bindparam, func, case, type_coerce, Text
+
+from app import app, db, HealthData
+import compressed_text
+
+COLUMNS = ('nutrition_info', 'assessment', 'diet_plan', 'recommendation')
+
+BATCH_SIZE = 500
+
+
+def _raw(name):
+    # The stored value, bypassing CompressedText
+    return type_coerce(HealthData.__table__.c[name], Text)
+
+
+def stored_size():
+    """Total stored characters of the compressed columns"""
+    total = sum(func.coalesce(func.length(_raw(name)), 0) for name in COLUMNS)
+    return db.session.execute(select(func.coalesce(func.sum(total), 0))).scalar()
+
+
+def dictionary_usage():
+    """Stored values per zstd dictionary id ('' for values written before ids were recorded)"""
+    usage = {}
+    prefix = compressed_text.MARKER + compressed_text.ZSTD_DICT
+    for name in COLUMNS:
+        raw = _raw(name)
+        dict_id = case((func.substr(raw, 3, 1) == ':', ''),
+                       else_=func.substr(raw, 3, compressed_text.DICT_ID_LENGTH))
+        rows = db.session.execute(
+            select(dict_id, func.count()).where(func.substr(raw, 1, 2) == prefix).group_by(dict_id)
+        ).all()
+        for value, count in rows:
+            usage[value] = usage.get(value, 0) + count
+    return usage
+
+
+def missing_dictionaries(usage):
+    """Dictionary ids referenced by stored values that are not configured"""
+    configured = set(compressed_text._dictionaries())
+    current = compressed_text.current_dictionary_id()
+    return sorted(dict_id for dict_id in usage if (dict_id or current) not in configured)
+
+
+def recompress(value):
+    """A value compressed with another dictionary, compressed again with the current one"""
+    dict_id = compressed_text.dictionary_of(value)
+    if dict_id is None or (dict_id and dict_id == compressed_text.current_dictionary_id()):
+        return value
+    return compressed_text.compress(compressed_text.decompress(value))
+
+
+def convert(transform):
+    """Rewrite every row's values with transform(); returns the number of rows changed"""
+    table = HealthData.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam('row_id'))
+        .values({name: type_coerce(bindparam(f'new_{name}'), Text) for name in COLUMNS})
+    )
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, *(_raw(name).label(name) for name in COLUMNS))
+            .where(table.c.id > last_id).order_by(table.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return changed
+        params = []
+        for row in rows:
+            values = {f'new_{name}': transform(getattr(row, name)) for name in COLUMNS}
+            if any(values[f'new_{name}'] != getattr(row, name) for name in COLUMNS):
+                params.append({'row_id': row.id, **values})
+        if params:
+            db.session.execute(statement, params)
+        db.session.commit()
+        changed += len(params)
+        last_id = rows[-1].id
+        print(f"  ✓ Scanned up to id {last_id}, {changed} rows rewritten")
+
+
+def compress_health_text(mode='compress', dict_path=None):
+    """Compress, decompress, report sizes or train a dictionary"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print(f"HEALTH DATA TEXT COMPRESSION: {mode.upper()}")
+            print("="*60)
+
+            usage = dictionary_usage()
+            if mode == 'train-dict':
+                if os.path.exists(dict_path):
+                    with open(dict_path, 'rb') as dict_file:
+                        old_id = compressed_text.dictionary_id(dict_file.read())
+                    in_use = usage.get(old_id, 0)
+                    if compressed_text.DICT_PATH and os.path.abspath(dict_path) == os.path.abspath(compressed_text.DICT_PATH):
+                        in_use += usage.get('', 0)
+                    if in_use:
+                        print(f"\n❌ {dict_path} holds dictionary {old_id}, still used by {in_use} stored values.")
+                        print("   Train into a new file instead; overwriting it would make them unreadable.")
+                        raise SystemExit(1)
+                samples = db.session.execute(
+                    select(*(HealthData.__table__.c[name] for name in COLUMNS)).limit(5000)
+                ).all()
+                texts = [value for row in samples for value in row if value]
+                with open(dict_path, 'wb') as dict_file:
+                    dict_file.write(compressed_text.train_dictionary(texts))
+                print(f"\n✓ Trained a dictionary from {len(texts)} values: {dict_path}")
+                print(f"  Set TEXT_COMPRESSION_DICT={dict_path} for the app and rerun this script")
+                return
+
+            before = stored_size()
+            print(f"\nStored text: {before / 1024 / 1024:.2f} MB (codec for new values: {compressed_text.default_codec()})")
+            current = compressed_text.current_dictionary_id()
+            for dict_id, count in sorted(usage.items()):
+                label = dict_id or f'unlabelled ({current or "TEXT_COMPRESSION_DICT"})'
+                print(f"  Dictionary {label}: {count} values" + (" (current)" if dict_id and dict_id == current else ""))
+            missing = missing_dictionaries(usage)
+            if missing:
+                print(f"\n❌ Stored values use dictionaries that are not configured: {', '.join(m or 'unlabelled' for m in missing)}")
+                print("   Add the old dictionary to TEXT_COMPRESSION_OLD_DICTS (or restore TEXT_COMPRESSION_DICT)")
+                print("   before compressing; those rows cannot be read until then.")
+                if mode != 'stats':
+                    raise SystemExit(1)
+            if mode == 'stats':
+                return
+
+            transform = {'compress': compressed_text.compress, 'decompress': compressed_text.decompress,
+                         'recompress': recompress}[mode]
+            changed = convert(transform)
+            after = stored_size()
+            print(f"\n✓ Rewrote {changed} rows")
+            print(f"✓ Stored text: {before / 1024 / 1024:.2f} MB -> {after / 1024 / 1024:.2f} MB")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error converting health data text: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    import sys
+
+    args = sys.argv[1:]
+    if '--train-dict' in args:
+        index = args.index('--train-dict')
+        if index + 1 >= len(args):
+            print(__doc__)
+            sys.exit(1)
+        compress_health_text('train-dict', args[index + 1])
+    elif '--stats' in args:
+        compress_health_text('stats')
+    elif '--decompress' in args:
+        compress_health_text('decompress')
+    elif '--recompress' in args:
+        compress_health_text('recompress')
+    else:
+        compress_health_text()
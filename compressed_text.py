@@ -0,0 +1,200 @@
+"""
+Transparent compression for large Text columns.
+
+CompressedText is a SQLAlchemy TypeDecorator over Text: values are
+compressed on write and decompressed when the row is loaded, so models and
+templates keep working with plain strings. Combined with deferred()
+columns, the decompression only happens when a field is actually read.
+
+Stored format: short values (below MIN_SIZE bytes, or ones that do not
+shrink) are kept as plain text. Compressed values are a marker followed
+by base64, which keeps the column a Text column and lets plain and
+compressed rows coexist, so existing tables migrate in place
+(compress_health_text.py):
+
+    \\x01z:<base64>        zlib
+    \\x01s:<base64>        zstd
+    \\x01d<id>:<base64>    zstd with the trained dictionary <id>
+
+zstd is used when the optional zstandard package is installed (zlib
+otherwise). TEXT_COMPRESSION_DICT points at a dictionary trained with
+`python compress_health_text.py --train-dict <path>`; dictionaries help
+most with short, similar values such as Gemini's HTML snippets. Reading
+zstd values requires zstandard.
+
+<id> is the first 8 hex digits of the dictionary's SHA-256, so a value
+is always read with the dictionary that wrote it. After retraining, list
+the previous dictionaries in TEXT_COMPRESSION_OLD_DICTS until
+`compress_health_text.py --recompress` has moved every row to the new one.
+(Values written before ids were recorded, \\x01d:<base64>, are read with
+TEXT_COMPRESSION_DICT.)
+"""
+
+# Standard library imports
+import os
+import zlib
+import base64
+import hashlib
+
+# Third-party imports
+from sqlalchemy.types import TypeDecorator, Text
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MARKER = '\x01'
+ZLIB, ZSTD, ZSTD_DICT = 'z', 's', 'd'
+
+# Values shorter than this (in bytes) are stored uncompressed
+MIN_SIZE = int(os.getenv('TEXT_COMPRESSION_MIN_SIZE', '200'))
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+DICT_PATH = os.getenv('TEXT_COMPRESSION_DICT')
+# Earlier dictionaries, only read from (comma-separated paths)
+OLD_DICT_PATHS = [path.strip() for path in os.getenv('TEXT_COMPRESSION_OLD_DICTS', '').split(',') if path.strip()]
+
+# Hex digits of the SHA-256 identifying a dictionary in the marker
+DICT_ID_LENGTH = 8
+
+_codecs = {}
+
+
+def dictionary_id(data):
+    """Id recorded in the marker of values compressed with a dictionary (bytes)"""
+    return hashlib.sha256(data).hexdigest()[:DICT_ID_LENGTH]
+
+
+def _dictionaries():
+    # id -> ZstdCompressionDict, plus the id of the current one under 'current'
+    if 'dicts' not in _codecs:
+        _codecs['dicts'], _codecs['current'] = {}, None
+        if zstandard is not None:
+            for path in OLD_DICT_PATHS + ([DICT_PATH] if DICT_PATH else []):
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as dict_file:
+                    data = dict_file.read()
+                _codecs['dicts'][dictionary_id(data)] = zstandard.ZstdCompressionDict(data)
+                if path == DICT_PATH:
+                    _codecs['current'] = dictionary_id(data)
+    return _codecs['dicts']
+
+
+def current_dictionary_id():
+    """Id of the dictionary new values are compressed with, or None"""
+    _dictionaries()
+    return _codecs['current']
+
+
+def set_dictionary(data):
+    """Use a trained zstd dictionary (bytes) instead of TEXT_COMPRESSION_DICT; None disables it"""
+    dictionaries = _dictionaries()
+    if data is None:
+        _codecs['current'] = None
+        return
+    _codecs['current'] = dictionary_id(data)
+    dictionaries[_codecs['current']] = zstandard.ZstdCompressionDict(data)
+
+
+def _zstd(kind, codec, dict_id=None):
+    # zstandard (de)compressors are not thread-safe: one per call is cheap enough
+    dictionary = None
+    if codec == ZSTD_DICT:
+        # Unlabelled values predate dictionary ids and used TEXT_COMPRESSION_DICT
+        dict_id = dict_id or current_dictionary_id()
+        dictionary = _dictionaries().get(dict_id)
+        if dictionary is None:
+            raise ValueError(f'value was compressed with zstd dictionary {dict_id or "(unknown)"}; '
+                             'add it to TEXT_COMPRESSION_DICT or TEXT_COMPRESSION_OLD_DICTS')
+    if kind == 'compress':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+    return zstandard.ZstdDecompressor(dict_data=dictionary)
+
+
+def default_codec():
+    """The codec used for new values"""
+    if zstandard is None:
+        return ZLIB
+    return ZSTD_DICT if current_dictionary_id() is not None else ZSTD
+
+
+def _header(value):
+    """(codec, dictionary id or '', start of the base64) of a compressed value, else None"""
+    if not (isinstance(value, str) and value.startswith(MARKER)):
+        return None
+    end = value.find(':', 2, 3 + DICT_ID_LENGTH)
+    if end < 0:
+        return None
+    return value[1], value[2:end], end + 1
+
+
+def is_compressed(value):
+    return _header(value) is not None
+
+
+def dictionary_of(value):
+    """Dictionary id of a dictionary-compressed value ('' if unlabelled), else None"""
+    header = _header(value)
+    if header is None or header[0] != ZSTD_DICT:
+        return None
+    return header[1]
+
+
+def compress(value, codec=None):
+    """Compressed representation of a string (or the string itself if not worth it)"""
+    if value is None or is_compressed(value):
+        return value
+    raw = value.encode('utf-8')
+    if len(raw) < MIN_SIZE:
+        return value
+    codec = codec or default_codec()
+    if codec == ZLIB:
+        packed = zlib.compress(raw, ZLIB_LEVEL)
+    else:
+        packed = _zstd('compress', codec).compress(raw)
+    dict_id = current_dictionary_id() if codec == ZSTD_DICT else ''
+    prefix = f'{MARKER}{codec}{dict_id}:'
+    encoded = base64.b64encode(packed).decode('ascii')
+    if len(prefix) + len(encoded) >= len(raw):
+        return value
+    return prefix + encoded
+
+
+def decompress(value):
+    """Original string of a stored value (plain values pass through)"""
+    header = _header(value)
+    if header is None:
+        return value
+    codec, dict_id, start = header
+    packed = base64.b64decode(value[start:])
+    if codec == ZLIB:
+        return zlib.decompress(packed).decode('utf-8')
+    if codec in (ZSTD, ZSTD_DICT):
+        if zstandard is None:
+            raise ValueError('value is zstd-compressed; install zstandard to read it')
+        return _zstd('decompress', codec, dict_id).decompress(packed).decode('utf-8')
+    raise ValueError(f'unknown compression marker {codec!r}')
+
+
+def train_dictionary(samples, size=32 * 1024):
+    """Train a zstd dictionary from sample strings (needs zstandard)"""
+    if zstandard is None:
+        raise RuntimeError('training a dictionary needs zstandard (pip install zstandard)')
+    return zstandard.train_dictionary(size, [sample.encode('utf-8') for sample in samples]).as_bytes()
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored compressed; reads and writes plain strings"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress(value)
@@ -0,0 +1,307 @@
+"""
+Response compression and HTML minification.
+
+CompressionMiddleware wraps the WSGI app:
+
+- negotiation: brotli when the client accepts it and the optional brotli
+  package is installed, else gzip, else the response is left alone
+- threshold: bodies under COMPRESS_MIN_SIZE bytes are sent as-is
+- streaming: bodies up to COMPRESS_BUFFER_LIMIT are compressed in one go
+  (with a Content-Length); larger or streamed bodies (e.g. the CSV/JSONL
+  exports) are compressed chunk by chunk, flushing after each chunk so
+  the client keeps receiving data
+- static files: compressed variants are written once to
+  COMPRESS_CACHE_DIR (at the highest level) and reused until the source
+  file changes, so repeat requests cost no CPU
+
+Only text-like content types are compressed; responses that already have a
+Content-Encoding, partial content and `Cache-Control: no-transform` are
+passed through. ETags of compressed responses are made weak.
+
+With HTML_MINIFY=1, rendered HTML pages also have their indentation and
+blank lines removed (<pre>, <textarea> and <script> are left untouched).
+"""
+
+# Standard library imports
+import os
+import re
+import zlib
+import tempfile
+
+# Third-party imports
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+
+# Local imports
+import structured_logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.getenv('COMPRESSION', '1').lower() in ('1', 'true', 'yes')
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+BUFFER_LIMIT = int(os.getenv('COMPRESS_BUFFER_LIMIT', str(256 * 1024)))
+GZIP_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+CACHE_DIR = os.getenv('COMPRESS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'food_insight_compressed'))
+MINIFY_HTML = os.getenv('HTML_MINIFY', '0').lower() in ('1', 'true', 'yes')
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml',
+)
+
+logger = structured_logging.get_logger('compression')
+
+
+def negotiate(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header"""
+    accepted = parse_accept_header(accept_encoding or '')
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor"""
+
+    def __init__(self, encoding, best=False):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=11 if best else BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(9 if best else GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush=False):
+        if self.encoding == 'br':
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+    def whole(self, data):
+        return self.compress(data) + self.finish()
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers, *names):
+    names = {name.lower() for name in names}
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+def _compressible(status, headers):
+    code = int(status.split(' ', 1)[0])
+    if code < 200 or code in (204, 206, 304) or _header(headers, 'Content-Encoding'):
+        return False
+    content_type = (_header(headers, 'Content-Type') or '').lower()
+    if not content_type.startswith(COMPRESSIBLE_TYPES):
+        return False
+    return not parse_cache_control_header(_header(headers, 'Cache-Control')).no_transform
+
+
+def _weak_etag(headers):
+    etag = _header(headers, 'ETag')
+    if etag and not etag.startswith('W/'):
+        headers = _without(headers, 'ETag') + [('ETag', 'W/' + etag)]
+    return headers
+
+
+def _vary(headers):
+    vary = _header(headers, 'Vary')
+    if not vary:
+        return headers + [('Vary', 'Accept-Encoding')]
+    if 'accept-encoding' not in vary.lower():
+        return _without(headers, 'Vary') + [('Vary', f'{vary}, Accept-Encoding')]
+    return headers
+
+
+class CompressionMiddleware:
+    """WSGI middleware compressing responses for clients that accept it"""
+
+    def __init__(self, app, static_url_path=None, static_folder=None):
+        self.app = app
+        self.static_url_path = (static_url_path or '').rstrip('/') + '/' if static_url_path else None
+        self.static_folder = static_folder
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            encoding = None
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, list(headers)
+            if exc_info:
+                captured['exc_info'] = exc_info
+            return captured.setdefault('body', []).append
+
+        app_iter = self.app(environ, capture)
+        status, headers = captured['status'], captured['headers']
+
+        if not _compressible(status, headers):
+            return self._passthrough(app_iter, captured, start_response)
+        headers = _vary(headers)
+        if encoding is None:
+            captured['headers'] = headers
+            return self._passthrough(app_iter, captured, start_response)
+
+        static_file = self._static_file(environ)
+        if static_file and status.startswith('200'):
+            return self._cached_static(static_file, encoding, app_iter, status, headers, start_response)
+
+        length = _header(headers, 'Content-Length')
+        if length is not None and int(length) < MIN_SIZE:
+            captured['headers'] = headers
+            return self._passthrough(app_iter, captured, start_response)
+
+        return self._compress(app_iter, captured.get('body', []), encoding, status, headers, start_response)
+
+    # Passthrough
+
+    @staticmethod
+    def _passthrough(app_iter, captured, start_response):
+        write = start_response(captured['status'], captured['headers'], captured.get('exc_info'))
+        for chunk in captured.get('body', []):
+            write(chunk)
+        return app_iter
+
+    # Dynamic responses
+
+    def _compress(self, app_iter, written, encoding, status, headers, start_response):
+        chunks = iter(app_iter)
+        buffered, size = list(written), sum(len(chunk) for chunk in written)
+        exhausted = False
+        try:
+            while size <= BUFFER_LIMIT:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                buffered.append(chunk)
+                size += len(chunk)
+        except BaseException:
+            self._close(app_iter)
+            raise
+
+        if exhausted:
+            self._close(app_iter)
+            body = b''.join(buffered)
+            if len(body) < MIN_SIZE:
+                start_response(status, headers)
+                return [body]
+            compressed = _Compressor(encoding).whole(body)
+            headers = _weak_etag(_without(headers, 'Content-Length'))
+            start_response(status, headers + [('Content-Encoding', encoding), ('Content-Length', str(len(compressed)))])
+            return [compressed]
+
+        headers = _weak_etag(_without(headers, 'Content-Length'))
+        start_response(status, headers + [('Content-Encoding', encoding)])
+        return self._stream(app_iter, chunks, buffered, _Compressor(encoding))
+
+    def _stream(self, app_iter, chunks, buffered, compressor):
+        try:
+            yield compressor.compress(b''.join(buffered), flush=True)
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk, flush=True)
+            yield compressor.finish()
+        finally:
+            self._close(app_iter)
+
+    @staticmethod
+    def _close(app_iter):
+        close = getattr(app_iter, 'close', None)
+        if close:
+            close()
+
+    # Static files
+
+    def _static_file(self, environ):
+        if not self.static_url_path or not self.static_folder:
+            return None
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.static_url_path):
+            return None
+        root = os.path.realpath(self.static_folder)
+        candidate = os.path.realpath(os.path.join(root, path[len(self.static_url_path):]))
+        if not candidate.startswith(root + os.sep) or not os.path.isfile(candidate):
+            return None
+        return candidate
+
+    def _cached_static(self, source, encoding, app_iter, status, headers, start_response):
+        self._close(app_iter)
+        try:
+            data = self._cached_variant(source, encoding)
+        except OSError as e:
+            logger.warning("Could not cache compressed %s: %s", source, e)
+            with open(source, 'rb') as source_file:
+                data = _Compressor(encoding, best=True).whole(source_file.read())
+        headers = _weak_etag(_without(headers, 'Content-Length'))
+        start_response(status, headers + [('Content-Encoding', encoding), ('Content-Length', str(len(data)))])
+        return [data]
+
+    def _cached_variant(self, source, encoding):
+        relative = os.path.relpath(source, os.path.realpath(self.static_folder))
+        cached = os.path.join(CACHE_DIR, f'{relative}.{encoding}')
+        source_mtime = os.path.getmtime(source)
+        try:
+            if os.path.getmtime(cached) >= source_mtime:
+                with open(cached, 'rb') as cached_file:
+                    return cached_file.read()
+        except OSError:
+            pass
+        with open(source, 'rb') as source_file:
+            data = _Compressor(encoding, best=True).whole(source_file.read())
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, cached)
+        return data
+
+
+# HTML minification
+
+_PROTECTED = re.compile(r'(<(pre|textarea|script)\b.*?</\2>)', re.S | re.I)
+
+
+def minify_html(html):
+    """Drop indentation and blank lines outside <pre>, <textarea> and <script>"""
+    parts = _PROTECTED.split(html)
+    # split() yields text, protected block, tag name, text, ...
+    out = []
+    for index in range(0, len(parts), 3):
+        out.append(re.sub(r'\n\s+', '\n', parts[index]))
+        if index + 1 < len(parts):
+            out.append(parts[index + 1])
+    return ''.join(out).strip()
+
+
+def _minify_response(response):
+    if response.mimetype == 'text/html' and not response.is_streamed and not response.direct_passthrough:
+        response.set_data(minify_html(response.get_data(as_text=True)))
+    return response
+
+
+def init_app(app):
+    """Wrap app.wsgi_app with CompressionMiddleware (COMPRESSION=0 disables) and optional HTML minification"""
+    if MINIFY_HTML:
+        app.after_request(_minify_response)
+    if ENABLED:
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.static_url_path, app.static_folder)
@@ -0,0 +1,222 @@
+"""
+Streaming HealthData export and cold archival.
+
+Exports read rows through a streaming cursor (yield_per + stream_results,
+a server-side cursor on PostgreSQL) and emit output batch by batch, so
+memory stays flat whatever the table size:
+
+- stream(): CSV, JSONL or Parquet chunks for one user or the whole table,
+  used by the /export endpoints and export_data.py
+- archive(): moves HealthData rows older than a cutoff, Gemini analysis
+  text included, into gzip-compressed JSONL files and deletes them from
+  the hot table; used by archive_health_data.py
+
+Parquet needs the optional pyarrow package (pip install pyarrow); CSV and
+JSONL only use the standard library.
+"""
+
+# Standard library imports
+import io
+import os
+import csv
+import gzip
+import json
+import shutil
+import importlib.util
+from datetime import datetime
+
+# Third-party imports
+from sqlalchemy import select, delete, func
+
+# Local imports
+import uploads
+
+# Rows fetched per round trip and written per output chunk
+BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+FIELDS = ('id', 'user_id', 'timestamp', 'age', 'height', 'weight', 'bmi', 'bmr', 'food_name', 'food_image',
+          'nutrition_info', 'assessment', 'diet_plan', 'recommendation')
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _query(HealthData, user_id=None, before=None):
+    stmt = select(*(getattr(HealthData, field) for field in FIELDS))
+    if user_id is not None:
+        stmt = stmt.where(HealthData.user_id == user_id)
+    if before is not None:
+        stmt = stmt.where(HealthData.timestamp < before)
+    return stmt.order_by(HealthData.id)
+
+
+def iter_batches(session, HealthData, user_id=None, before=None, batch_size=BATCH_SIZE):
+    """Yield lists of row dicts from a streaming cursor"""
+    result = session.execute(
+        _query(HealthData, user_id, before).execution_options(yield_per=batch_size, stream_results=True)
+    )
+    for partition in result.partitions():
+        yield [row._asdict() for row in partition]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+# Writers: each turns row batches into chunks of bytes
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _jsonl_chunks(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(row, default=_json_default) + '\n' for row in batch).encode('utf-8')
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that hands its bytes out as they arrive (Parquet needs tell())"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_chunks(batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('user_id', pa.int64()), ('timestamp', pa.timestamp('us')),
+        ('age', pa.int32()), ('height', pa.float64()), ('weight', pa.float64()),
+        ('bmi', pa.float64()), ('bmr', pa.float64()),
+        ('food_name', pa.string()), ('food_image', pa.string()),
+        ('nutrition_info', pa.string()), ('assessment', pa.string()),
+        ('diet_plan', pa.string()), ('recommendation', pa.string()),
+    ])
+    sink = _StreamSink()
+    # One row group per batch, emitted as soon as it is written
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+_WRITERS = {'csv': _csv_chunks, 'jsonl': _jsonl_chunks, 'parquet': _parquet_chunks}
+
+
+def stream(session, HealthData, fmt, user_id=None, batch_size=BATCH_SIZE):
+    """
+    Export HealthData as a generator of byte chunks.
+
+    Args:
+        fmt (str): 'csv', 'jsonl' or 'parquet'
+        user_id (int): One user's rows, or None for the whole table
+
+    Raises:
+        ValueError: unknown format
+        RuntimeError: parquet requested but pyarrow is not installed
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f'format must be one of {", ".join(FORMATS)}')
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+    return _WRITERS[fmt](iter_batches(session, HealthData, user_id, batch_size=batch_size))
+
+
+# Cold archive
+
+def archive(session, HealthData, before, archive_dir, upload_folder=None, batch_size=BATCH_SIZE,
+            dry_run=False, progress=None):
+    """
+    Move HealthData rows older than `before` into a gzip JSONL archive.
+
+    Each user's most recent row always stays in the hot table (the meal
+    plan and health metrics read it). Rows are written and fsynced before
+    each batch is deleted, one transaction per batch; their food images
+    are moved to <archive_dir>/uploads (sharded like the upload folder,
+    see uploads.py). Nutrition rollups are kept, so
+    rebuild_rollups.py must not be run after archiving (it would drop the
+    archived history from the totals).
+
+    Returns:
+        dict: 'rows' archived (or eligible, with dry_run) and 'path' of the archive file
+    """
+    latest_per_user = select(func.max(HealthData.id)).group_by(HealthData.user_id)
+    eligible = (HealthData.timestamp < before) & HealthData.id.not_in(latest_per_user)
+
+    if dry_run:
+        count = session.execute(select(func.count()).select_from(HealthData).where(eligible)).scalar()
+        return {'rows': count, 'path': None}
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"health_data-{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz")
+    image_dir = os.path.join(archive_dir, 'uploads')
+    columns = [getattr(HealthData, field) for field in FIELDS]
+    archived = 0
+    last_id = 0
+
+    with gzip.open(path, 'wt', encoding='utf-8') as out:
+        while True:
+            rows = session.execute(
+                select(*columns).where(eligible, HealthData.id > last_id).order_by(HealthData.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                out.write(json.dumps(row._asdict(), default=_json_default) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+
+            session.execute(delete(HealthData).where(HealthData.id.in_([row.id for row in rows])))
+            session.commit()
+
+            if upload_folder:
+                for row in rows:
+                    source = uploads.locate(upload_folder, row.food_image)
+                    if source:
+                        destination = uploads.path(image_dir, row.food_image)
+                        os.makedirs(os.path.dirname(destination), exist_ok=True)
+                        shutil.move(source, destination)
+
+            archived += len(rows)
+            last_id = rows[-1].id
+            if progress:
+                progress(archived)
+
+    if not archived:
+        os.remove(path)
+        path = None
+    return {'rows': archived, 'path': path}
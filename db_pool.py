@@ -0,0 +1,131 @@
+"""
+Database connection pool configuration and health.
+
+engine_options() builds SQLALCHEMY_ENGINE_OPTIONS from the environment:
+
+    DB_POOL_SIZE             connections kept open per worker (default 5)
+    DB_MAX_OVERFLOW          extra connections allowed under load (default 5)
+    DB_POOL_TIMEOUT          seconds to wait for a free connection (default 10)
+    DB_POOL_RECYCLE          seconds before a connection is replaced (default 1800)
+    DB_STATEMENT_TIMEOUT_MS  server-side statement timeout, 0 to disable (default 30000)
+    DB_CONNECT_TIMEOUT       seconds to wait when opening a connection (default 10)
+    DB_PGBOUNCER             1 when DATABASE_URL points at PgBouncer in transaction mode
+
+Every checkout is validated with pool_pre_ping, so dead connections (server
+restarts, idle timeouts) are replaced transparently instead of failing the
+request. Each worker can open up to DB_POOL_SIZE + DB_MAX_OVERFLOW
+connections, so gunicorn workers x that must stay below the server's
+max_connections (or PgBouncer's default_pool_size).
+
+Pool usage is exported through metrics.py: connections checked out,
+capacity, checkout wait time, checkout timeouts, new connections and
+invalidated connections. The two gauges are summed over running workers
+only; a worker that exits also zeroes them in its last snapshot.
+"""
+
+# Standard library imports
+import os
+import time
+import atexit
+
+# Third-party imports
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Local imports
+import metrics
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+PGBOUNCER = os.getenv('DB_PGBOUNCER', '0').lower() in ('1', 'true', 'yes')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.inc('db_pool_timeouts_total')
+            raise
+        finally:
+            metrics.observe('db_pool_checkout_wait_seconds', time.perf_counter() - start)
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URL"""
+    if database_url.startswith('sqlite'):
+        if ':memory:' in database_url or database_url.rstrip('/') == 'sqlite:':
+            return {}
+        # File databases already use a QueuePool; only add the instrumentation
+        return {'poolclass': InstrumentedQueuePool}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': POOL_SIZE,
+        'max_overflow': MAX_OVERFLOW,
+        'pool_timeout': POOL_TIMEOUT,
+        'pool_recycle': POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': {'connect_timeout': CONNECT_TIMEOUT},
+    }
+    if STATEMENT_TIMEOUT_MS and not PGBOUNCER:
+        # Set once per connection as a startup parameter (no extra round trip)
+        options['connect_args']['options'] = f'-c statement_timeout={STATEMENT_TIMEOUT_MS}'
+    if PGBOUNCER:
+        # Transaction pooling hands each transaction a different server
+        # connection: session state (startup options, SET) does not stick,
+        # so the timeout is applied per transaction in init_app() instead.
+        # Connections to PgBouncer are cheap, so keep them short-lived.
+        options['pool_recycle'] = min(POOL_RECYCLE, 300)
+    return options
+
+
+def _set_local_statement_timeout(conn):
+    conn.exec_driver_sql(f'SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}')
+
+
+def init_app(app, db):
+    """Attach pool gauges/counters (and the PgBouncer statement timeout) to the app's engine"""
+    with app.app_context():
+        engine = db.engine
+    pool = engine.pool
+    capacity = pool.size() + max(pool._max_overflow, 0) if isinstance(pool, QueuePool) else 1
+    metrics.set_gauge('db_pool_capacity', capacity)
+    metrics.set_gauge('db_pool_checked_out', 0)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.set_gauge('db_pool_checked_out', pool.checkedout())
+
+    def on_checkin(dbapi_connection, connection_record):
+        # The returning connection is still counted while this event runs
+        metrics.set_gauge('db_pool_checked_out', max(pool.checkedout() - 1, 0))
+
+    def on_connect(dbapi_connection, connection_record):
+        metrics.inc('db_pool_connects_total')
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.inc('db_pool_invalidations_total')
+
+    def release_gauges():
+        # An exited worker holds no connections; its last snapshot must say so
+        metrics.set_gauge('db_pool_checked_out', 0)
+        metrics.set_gauge('db_pool_capacity', 0)
+        metrics.flush_at_exit()
+
+    atexit.register(release_gauges)
+
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'checkin', on_checkin)
+    event.listen(pool, 'connect', on_connect)
+    event.listen(pool, 'invalidate', on_invalidate)
+
+    if PGBOUNCER and STATEMENT_TIMEOUT_MS and engine.dialect.name == 'postgresql':
+        event.listen(engine, 'begin', _set_local_statement_timeout)
@@ -0,0 +1,204 @@
+"""
+Read-replica routing for read-only views.
+
+Set DATABASE_REPLICA_URL to a replica of DATABASE_URL. SELECTs issued by
+views decorated with @db_routing.read_only (or inside a use_replica()
+block) are sent to the replica; everything else, and any read in a session
+with pending or flushed writes, goes to the primary.
+
+- read-your-writes: after a request writes, the browser session is pinned
+  to the primary for REPLICA_STICKY_SECONDS, so e.g. the meal plan opened
+  right after a dashboard upload sees the new row despite replication lag
+- fallback: the replica is health-checked at most every
+  REPLICA_CHECK_INTERVAL seconds; while it is down reads go to the
+  primary. A read that fails on the replica with an OperationalError
+  (disconnect, locked or missing file, timeout) marks it down and is
+  retried once on the primary instead of failing the request
+
+Testing locally with two SQLite files:
+    cp instance/users.db /tmp/replica.db
+    DATABASE_REPLICA_URL=sqlite:////tmp/replica.db python app.py
+Rows written after the copy are then only visible on the primary, which
+makes routing and stickiness easy to observe (metric db_routed_reads_total).
+"""
+
+# Standard library imports
+import os
+import time
+import functools
+import threading
+from contextlib import contextmanager
+
+# Third-party imports
+from flask import g, session as browser_session, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+import db_pool
+import metrics
+import structured_logging
+
+REPLICA_BIND = 'replica'
+
+# Seconds a browser session keeps reading from the primary after it wrote
+STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+# Seconds between replica health checks (and before retrying a failed replica)
+CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '30'))
+
+_STICKY_KEY = '_db_primary_until'
+
+logger = structured_logging.get_logger('db_routing')
+
+_health_lock = threading.Lock()
+_health = {'checked_at': 0.0, 'healthy': True}
+
+
+def replica_url():
+    """The replica URL from the environment (postgres:// normalized), or None"""
+    url = os.getenv('DATABASE_REPLICA_URL')
+    if url and url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url or None
+
+
+def read_only(view):
+    """Route the SELECTs of a view to the replica"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g._db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def use_replica():
+    """Route the SELECTs inside this block to the replica"""
+    previous = g.get('_db_read_only', False)
+    g._db_read_only = True
+    try:
+        yield
+    finally:
+        g._db_read_only = previous
+
+
+def _mark_replica(healthy, reason=None):
+    with _health_lock:
+        if _health['healthy'] and not healthy:
+            logger.warning("Replica unavailable, reading from primary: %s", reason)
+        _health['healthy'] = healthy
+        _health['checked_at'] = time.monotonic()
+
+
+def _replica_healthy(engine):
+    now = time.monotonic()
+    if now - _health['checked_at'] < CHECK_INTERVAL:
+        return _health['healthy']
+    if not _health_lock.acquire(blocking=False):
+        # Another thread is checking; use the last known state
+        return _health['healthy']
+    try:
+        _health['checked_at'] = now
+    finally:
+        _health_lock.release()
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+        _mark_replica(True)
+    except Exception as e:
+        _mark_replica(False, e)
+    return _health['healthy']
+
+
+def _pinned_to_primary(session):
+    if session._flushing or session.new or session.dirty or session.deleted:
+        return True
+    if g.get('_db_wrote'):
+        return True
+    return browser_session.get(_STICKY_KEY, 0) > time.time()
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends read-only SELECTs to the replica"""
+
+    # Whether the statement being executed was sent to the replica
+    _routed_to_replica = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and getattr(clause, 'is_select', False)
+                and has_request_context() and g.get('_db_read_only')):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                if not _pinned_to_primary(self) and _replica_healthy(engine):
+                    metrics.inc('db_routed_reads_total', 'replica')
+                    self._routed_to_replica = True
+                    return engine
+                metrics.inc('db_routed_reads_total', 'primary')
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _with_fallback(self, method, statement, *args, **kwargs):
+        self._routed_to_replica = False
+        try:
+            return method(statement, *args, **kwargs)
+        except OperationalError as e:
+            if not self._routed_to_replica:
+                raise
+            # Marked down, so the retry is routed to the primary
+            _mark_replica(False, e)
+            self._routed_to_replica = False
+            return method(statement, *args, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._with_fallback(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        return self._with_fallback(super().scalar, statement, *args, **kwargs)
+
+    def scalars(self, statement, *args, **kwargs):
+        return self._with_fallback(super().scalars, statement, *args, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(session, flush_context):
+    if has_request_context():
+        g._db_wrote = True
+
+
+def _pin_after_write(response):
+    if g.pop('_db_wrote', False):
+        browser_session[_STICKY_KEY] = time.time() + STICKY_SECONDS
+    return response
+
+
+def _on_replica_error(context):
+    # Any operational error (not only disconnects): locked or missing
+    # files, timeouts; bad SQL (ProgrammingError) does not count
+    if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+        _mark_replica(False, context.original_exception)
+
+
+def configure(app):
+    """
+    Register the replica bind (if DATABASE_REPLICA_URL is set) and the
+    stickiness hook. Call before creating SQLAlchemy(app, session_options=
+    {'class_': RoutingSession}).
+    """
+    url = replica_url()
+    if not url:
+        return
+    app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = {'url': url, **db_pool.engine_options(url)}
+    app.after_request(_pin_after_write)
+    logger.info("Read replica configured", extra={'replica': structured_logging.redact_url(url)})
+
+
+def init_app(app, db):
+    """Watch the replica engine for errors (after SQLAlchemy(app))"""
+    if not replica_url():
+        return
+    # No models live on the replica: keep db.create_all()/drop_all() from
+    # touching it (a read-only or unreachable replica would make them fail)
+    db.metadatas.pop(REPLICA_BIND, None)
+    with app.app_context():
+        event.listen(db.engines[REPLICA_BIND], 'handle_error', _on_replica_error)
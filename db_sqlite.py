@@ -0,0 +1,253 @@
+"""
+SQLite production mode.
+
+Used when DATABASE_URL is not set (or points at a SQLite file), as in
+small self-hosted deployments running several gunicorn workers on one
+database file.
+
+Connection settings, applied to every new connection (SQLITE_TUNING=0
+disables them):
+
+    SQLITE_JOURNAL_MODE      WAL: readers never block the writer and vice versa
+    SQLITE_SYNCHRONOUS       NORMAL: fsync at checkpoints, not every commit
+                             (safe in WAL mode; a power loss may drop the
+                             last commits but never corrupts the file)
+    SQLITE_MMAP_SIZE         bytes of the file read through mmap (default 256 MB)
+    SQLITE_BUSY_TIMEOUT_MS   how long a writer waits for the lock (default 5000)
+                             before "database is locked"
+    SQLITE_CACHE_SIZE_KB     page cache per connection (default 16 MB)
+    foreign_keys=ON          so ON DELETE CASCADE works as on PostgreSQL
+
+Request sessions keep the pysqlite driver's transaction handling: BEGIN is
+sent right before the first write, so the transaction asks for the write
+lock from the unlocked state and waits for it through busy_timeout. (A
+transaction begun at its first SELECT would hold a read snapshot, and the
+upgrade to a write lock fails with "database is locked" at once, without
+waiting.) The write queue's own engine, from writer_engine(), begins
+explicitly with BEGIN IMMEDIATE, taking the write lock up front, which
+also makes its SAVEPOINTs reliable.
+
+Write queue (opt-in, SQLITE_WRITE_QUEUE=1): write(job) runs job(session)
+on one writer thread per worker process. The thread commits up to
+SQLITE_WRITE_BATCH queued jobs in one transaction (each in its own
+SAVEPOINT, so a failing job does not affect the others), which turns many
+small concurrent commits into a few larger ones and keeps the threads of
+a worker from contending for the lock. Workers still serialize on the
+database lock through busy_timeout. Batching pays off when commits are
+expensive (SQLITE_SYNCHRONOUS=FULL, slow disks): in
+benchmarks/bench_sqlite_writes.py it added ~20% throughput with FULL but
+nothing with NORMAL, where WAL commits do not fsync, while adding a few
+ms of hand-off latency per insert. Without the queue, or on other
+databases, write() runs the job on the request's session and commits.
+"""
+
+# Standard library imports
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# Third-party imports
+from flask import g, has_request_context
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Local imports
+import metrics
+import structured_logging
+
+TUNING_ENABLED = os.getenv('SQLITE_TUNING', '1').lower() in ('1', 'true', 'yes')
+JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(16 * 1024)))
+
+WRITE_QUEUE_ENABLED = os.getenv('SQLITE_WRITE_QUEUE', '0').lower() in ('1', 'true', 'yes')
+# Jobs committed together, queued jobs before write() blocks, seconds to wait for a result
+WRITE_BATCH = int(os.getenv('SQLITE_WRITE_BATCH', '32'))
+WRITE_QUEUE_SIZE = int(os.getenv('SQLITE_WRITE_QUEUE_SIZE', '1000'))
+WRITE_TIMEOUT = float(os.getenv('SQLITE_WRITE_TIMEOUT', '30'))
+# Attempts of a batch that failed with "database is locked"
+WRITE_ATTEMPTS = 3
+
+logger = structured_logging.get_logger('db_sqlite')
+
+_queue = None
+
+
+def is_sqlite_file(database_url):
+    return database_url.startswith('sqlite') and ':memory:' not in database_url and database_url.rstrip('/') != 'sqlite:'
+
+
+# Connection settings
+
+def _on_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA journal_mode = {JOURNAL_MODE}')
+        cursor.execute(f'PRAGMA synchronous = {SYNCHRONOUS}')
+        cursor.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        cursor.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+        cursor.execute('PRAGMA foreign_keys = ON')
+    finally:
+        cursor.close()
+
+
+def _on_connect_explicit(dbapi_connection, connection_record):
+    # Let SQLAlchemy emit BEGIN itself (see _on_begin_immediate)
+    dbapi_connection.isolation_level = None
+
+
+def _on_begin_immediate(conn):
+    # Sent on the driver connection, so BEGIN is not counted as a query by
+    # metrics.py / query_guard.py
+    conn.connection.driver_connection.execute('BEGIN IMMEDIATE')
+
+
+def configure_engine(engine, immediate=False):
+    """
+    Apply the connection settings to an engine (before it opens connections).
+
+    immediate=True also makes every transaction start with BEGIN IMMEDIATE;
+    only for engines that write in every transaction (see writer_engine()).
+    """
+    event.listen(engine, 'connect', _on_connect)
+    if immediate:
+        event.listen(engine, 'connect', _on_connect_explicit)
+        event.listen(engine, 'begin', _on_begin_immediate)
+    # Connections opened before the listeners were attached lack the settings
+    engine.dispose()
+
+
+def writer_engine(url):
+    """A separate engine for the write queue whose transactions take the write lock immediately"""
+    engine = create_engine(url)
+    configure_engine(engine, immediate=True)
+    return engine
+
+
+def write_session(engine):
+    """A session on a writer_engine() for one batch of queued writes"""
+    return Session(engine, expire_on_commit=False)
+
+
+# Write queue
+
+class WriteQueue:
+    """Single writer thread committing queued jobs in batches"""
+
+    def __init__(self, session_factory, batch_size=WRITE_BATCH, maxsize=WRITE_QUEUE_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._jobs = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # Started lazily, and again in each forked worker
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._jobs = queue.Queue(maxsize=self._jobs.maxsize)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, job):
+        """Queue job(session); returns a Future with its result"""
+        self._ensure_thread()
+        future = Future()
+        self._jobs.put((job, future), timeout=WRITE_TIMEOUT)
+        return future
+
+    def _run(self):
+        jobs = self._jobs
+        while True:
+            batch = [jobs.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            outcomes = []
+            session = self.session_factory()
+            try:
+                for job, future in batch:
+                    try:
+                        with session.begin_nested():
+                            outcomes.append((future, job(session), None))
+                    except OperationalError:
+                        raise
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+                session.commit()
+            except OperationalError as e:
+                session.rollback()
+                if 'locked' in str(e).lower() and attempt < WRITE_ATTEMPTS:
+                    logger.warning("Write batch hit a locked database, retrying", extra={'attempt': attempt})
+                    continue
+                outcomes = [(future, None, e) for _, future in batch]
+            except Exception as e:
+                session.rollback()
+                outcomes = [(future, None, e) for _, future in batch]
+            finally:
+                session.close()
+            break
+        metrics.observe('db_write_batch_seconds', time.perf_counter() - start)
+        metrics.observe('db_write_batch_size', len(batch))
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def write(session, job):
+    """
+    Run job(session) in a committed write transaction and return its result.
+
+    With the SQLite write queue the job runs on the writer thread with that
+    thread's session (return plain values such as ids, not ORM objects);
+    otherwise it runs on the given session, which is committed.
+    """
+    if _queue is None:
+        try:
+            result = job(session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return result
+    result = _queue.submit(job).result(timeout=WRITE_TIMEOUT)
+    if has_request_context():
+        # Keep read-replica routing sticky to the primary, as for direct writes
+        g._db_wrote = True
+    return result
+
+
+def init_app(app, db):
+    """Tune the SQLite engine and start the write queue (no-op on other databases)"""
+    global _queue
+    if not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    with app.app_context():
+        engine = db.engine
+    if TUNING_ENABLED:
+        configure_engine(engine)
+    if WRITE_QUEUE_ENABLED:
+        writer = writer_engine(engine.url)
+        _queue = WriteQueue(lambda: write_session(writer))
+    logger.info("SQLite production mode", extra={
+        'tuning': TUNING_ENABLED, 'journal_mode': JOURNAL_MODE, 'synchronous': SYNCHRONOUS,
+        'write_queue': WRITE_QUEUE_ENABLED,
+    })
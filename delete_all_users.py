@@ -2,76 +2,81 @@
 Script to delete all user data from the database.
 This will delete:
 - All users
-- All health data
+- All health data and nutrition rollups
 - All password reset tokens
 - All email verification OTPs
+- The uploaded food images of the deleted records
+
+Rows are deleted in batches (PURGE_BATCH_SIZE, default 500), each in its
+own transaction, so the app keeps serving while a large purge runs. If the
+script is interrupted, run it again: it picks up where it stopped.
+
+Usage:
+    python delete_all_users.py              # asks for confirmation
+    python delete_all_users.py --force      # no confirmation
+    python delete_all_users.py --dry-run    # estimated counts only, deletes nothing
+    python delete_all_users.py --orphans    # only delete upload files no record references
 """
 
-from app import app, db, User, HealthData, PasswordReset, EmailVerification
+from app import app, db, User, HealthData, PURGE_MODELS
 from dotenv import load_dotenv
+import purge
 
 # Load environment variables
 load_dotenv()
 
-def delete_all_user_data():
-    """Delete all user data from all tables"""
+def print_progress(table, count):
+    print(f"\r  ... {table}: {count}", end='', flush=True)
+
+def delete_all_user_data(dry_run=False):
+    """Delete all user data from all tables in chunks"""
     with app.app_context():
         try:
             print("="*60)
-            print("DELETING ALL USER DATA")
+            print("DELETING ALL USER DATA" if not dry_run else "DRY RUN: NOTHING WILL BE DELETED")
             print("="*60)
-            
-            # Count records before deletion
-            user_count = User.query.count()
-            health_data_count = HealthData.query.count()
-            password_reset_count = PasswordReset.query.count()
-            email_verification_count = EmailVerification.query.count()
-            
-            print(f"\nCurrent data:")
-            print(f"  Users: {user_count}")
-            print(f"  Health Data Records: {health_data_count}")
-            print(f"  Password Reset Tokens: {password_reset_count}")
-            print(f"  Email Verification OTPs: {email_verification_count}")
-            
-            if user_count == 0 and health_data_count == 0:
+
+            # Fast estimates (planner statistics / id ranges, not full counts)
+            estimate = purge.estimate_counts(db.session, PURGE_MODELS)
+            print(f"\nCurrent data (estimated):")
+            print(f"  Users: ~{estimate['user']}")
+            print(f"  Health Data Records: ~{estimate['health_data']}")
+            print(f"  Nutrition Rollups: ~{estimate['nutrition_rollup']}")
+            print(f"  Password Reset Tokens: ~{estimate['password_reset']}")
+            print(f"  Email Verification OTPs: ~{estimate['email_verification']}")
+
+            if dry_run:
+                print("\n✓ Dry run finished. No data was deleted.")
+                return
+
+            if not any(estimate[model.__tablename__] for model in PURGE_MODELS):
                 print("\n✓ Database is already empty. Nothing to delete.")
                 return
-            
-            # Delete in order (respecting foreign key constraints)
-            print("\nDeleting data...")
-            
-            # Delete health data first (has foreign key to user)
-            deleted_health = HealthData.query.delete()
-            print(f"  ✓ Deleted {deleted_health} health data records")
-            
-            # Delete password reset tokens
-            deleted_reset = PasswordReset.query.delete()
-            print(f"  ✓ Deleted {deleted_reset} password reset tokens")
-            
-            # Delete email verification OTPs
-            deleted_otp = EmailVerification.query.delete()
-            print(f"  ✓ Deleted {deleted_otp} email verification OTPs")
-            
-            # Delete users last
-            deleted_users = User.query.delete()
-            print(f"  ✓ Deleted {deleted_users} users")
-            
-            # Commit the changes
-            db.session.commit()
-            
+
+            print(f"\nDeleting data in batches of {purge.BATCH_SIZE}...")
+            deleted = purge.purge_users(db.session, PURGE_MODELS, upload_folder=app.config['UPLOAD_FOLDER'],
+                                        progress=print_progress)
+            print()
+            print(f"  ✓ Deleted {deleted['health_data']} health data records")
+            print(f"  ✓ Deleted {deleted['nutrition_rollup']} nutrition rollups")
+            print(f"  ✓ Deleted {deleted['password_reset']} password reset tokens")
+            print(f"  ✓ Deleted {deleted['email_verification']} email verification OTPs")
+            print(f"  ✓ Deleted {deleted['user']} users")
+            print(f"  ✓ Deleted {deleted['files']} uploaded images ({deleted['bytes'] / 1024 / 1024:.1f} MB)")
+
             print("\n" + "="*60)
             print("✓ ALL USER DATA DELETED SUCCESSFULLY")
             print("="*60)
-            
+
             # Verify deletion
             remaining_users = User.query.count()
             remaining_health = HealthData.query.count()
-            
+
             if remaining_users == 0 and remaining_health == 0:
                 print("\n✓ Verification: Database is now empty.")
             else:
                 print(f"\n⚠️  Warning: Some data may remain (Users: {remaining_users}, Health Data: {remaining_health})")
-                
+
         except Exception as e:
             db.session.rollback()
             print(f"\n❌ Error deleting user data: {e}")
@@ -79,27 +84,53 @@ def delete_all_user_data():
             traceback.print_exc()
             raise
 
+def delete_orphan_uploads(dry_run=False):
+    """Delete uploaded images that no health data record references"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print("CLEANING ORPHANED UPLOADS" + (" (DRY RUN)" if dry_run else ""))
+            print("="*60)
+
+            found = purge.delete_orphan_uploads(db.session, HealthData, app.config['UPLOAD_FOLDER'],
+                                                dry_run=dry_run, progress=print_progress)
+            print()
+            action = "Found" if dry_run else "Deleted"
+            print(f"  ✓ {action} {found['files']} orphaned files ({found['bytes'] / 1024 / 1024:.1f} MB)")
+            print(f"  (files newer than {purge.ORPHAN_GRACE_SECONDS}s are skipped)")
+
+        except Exception as e:
+            print(f"\n❌ Error cleaning uploads: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
 if __name__ == '__main__':
     import sys
-    
-    # Check if --force flag is provided
-    if len(sys.argv) > 1 and sys.argv[1] == '--force':
+
+    args = sys.argv[1:]
+    dry_run = '--dry-run' in args
+
+    if '--orphans' in args:
+        delete_orphan_uploads(dry_run=dry_run)
+    elif dry_run or '--force' in args:
         # Auto-confirm deletion
-        delete_all_user_data()
+        delete_all_user_data(dry_run=dry_run)
     else:
         # Confirm before deletion
         print("\n⚠️  WARNING: This will delete ALL user data!")
         print("   - All users")
-        print("   - All health data")
+        print("   - All health data and nutrition rollups")
         print("   - All password reset tokens")
         print("   - All email verification OTPs")
+        print("   - All uploaded food images of those records")
         print("\nThis action cannot be undone!")
-        print("\nTo skip confirmation, run: python delete_all_users.py --force")
-        
+        print("\nTo preview, run: python delete_all_users.py --dry-run")
+        print("To skip confirmation, run: python delete_all_users.py --force")
+
         response = input("\nType 'DELETE ALL' to confirm: ")
-        
+
         if response == 'DELETE ALL':
             delete_all_user_data()
         else:
             print("\n❌ Deletion cancelled. No data was deleted.")
-
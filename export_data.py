@@ -0,0 +1,45 @@
+"""
+Script to export HealthData to a file.
+
+Rows are streamed from the database in batches (EXPORT_BATCH_SIZE, default
+1000), so memory use does not grow with the table. Parquet needs pyarrow.
+
+Usage:
+    python export_data.py <csv|jsonl|parquet> <output_file>            # all users
+    python export_data.py <csv|jsonl|parquet> <output_file> <user_id>  # one user
+"""
+
+from app import app, db, HealthData
+import data_export
+
+
+def export_data(fmt, output_file, user_id=None):
+    """Write the export chunk by chunk"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print(f"EXPORTING HEALTH DATA AS {fmt.upper()} ({'user ' + str(user_id) if user_id else 'all users'})")
+            print("="*60)
+
+            written = 0
+            with open(output_file, 'wb') as out:
+                for chunk in data_export.stream(db.session, HealthData, fmt, user_id=user_id):
+                    out.write(chunk)
+                    written += len(chunk)
+
+            print(f"\n✓ Wrote {written / 1024 / 1024:.1f} MB to {output_file}")
+
+        except Exception as e:
+            print(f"\n❌ Error exporting data: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3 or sys.argv[1] not in data_export.FORMATS:
+        print(__doc__)
+        sys.exit(1)
+    export_data(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
@@ -0,0 +1,271 @@
+"""
+Gemini generateContent calls with model routing and hedged requests.
+
+- routing: calls go to GEMINI_MODEL; when it fails (network error, 429 or
+  5xx) the same request is retried once on GEMINI_FALLBACK_MODEL. A model
+  whose recent calls mostly failed (GEMINI_FAILOVER_ERROR_RATE over the
+  last STATS_WINDOW calls) is skipped for GEMINI_FAILOVER_SECONDS.
+- hedging (GEMINI_HEDGE=1): if the primary call has not answered within
+  its latency budget, a second call is sent to GEMINI_HEDGE_MODEL (a
+  faster/lighter model, the fallback by default) and the first successful
+  answer wins. The budget is the primary model's observed p95 latency
+  (GEMINI_HEDGE_AFTER until STATS_MIN_SAMPLES calls were seen), so only
+  about 5% of requests are hedged. At most GEMINI_HEDGE_MAX_INFLIGHT
+  hedges run at once, so a slow API is not sent twice the traffic.
+- tracking: latency, errors, tokens and estimated cost per model (PRICES,
+  from the usageMetadata of each answer) feed the routing above, the
+  /metrics endpoint and stats().
+
+All calls share one requests.Session (keep-alive connections to the API).
+Against benchmarks/fake_services.py, --gemini-model-latency injects a
+latency per model.
+"""
+
+# Standard library imports
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Third-party imports
+import requests
+from requests.adapters import HTTPAdapter
+
+# Local imports
+import metrics
+import structured_logging
+
+API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com').rstrip('/')
+
+PRIMARY_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+FALLBACK_MODEL = os.getenv('GEMINI_FALLBACK_MODEL', 'gemini-2.0-flash-lite')
+HEDGE_MODEL = os.getenv('GEMINI_HEDGE_MODEL', FALLBACK_MODEL)
+
+HEDGE_ENABLED = os.getenv('GEMINI_HEDGE', '0').lower() in ('1', 'true', 'yes')
+# Hedge budget (seconds) until enough latencies were recorded, and its floor
+HEDGE_AFTER = float(os.getenv('GEMINI_HEDGE_AFTER', '8.0'))
+HEDGE_MIN_AFTER = float(os.getenv('GEMINI_HEDGE_MIN_AFTER', '1.0'))
+HEDGE_MAX_INFLIGHT = int(os.getenv('GEMINI_HEDGE_MAX_INFLIGHT', '4'))
+
+TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))
+
+FAILOVER_ERROR_RATE = float(os.getenv('GEMINI_FAILOVER_ERROR_RATE', '0.5'))
+FAILOVER_SECONDS = float(os.getenv('GEMINI_FAILOVER_SECONDS', '60'))
+
+# Recent calls kept per model for p95 and error rate
+STATS_WINDOW = 200
+STATS_MIN_SAMPLES = 20
+
+# Generation settings sent with every request; GEMINI_GENERATION_CONFIG
+# (a JSON object) overrides individual keys
+GENERATION_CONFIG = {
+    'temperature': 0.4,
+    'top_p': 0.95,
+    'top_k': 40,
+}
+GENERATION_CONFIG.update(json.loads(os.getenv('GEMINI_GENERATION_CONFIG') or '{}'))
+
+# USD per million (input, output) tokens
+PRICES = {
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-2.0-flash-lite': (0.075, 0.30),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+}
+
+# Status codes worth retrying on another model
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+logger = structured_logging.get_logger('gemini_client')
+
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# Primary calls run here so the caller can wait for them with a timeout
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='gemini')
+_hedges = threading.BoundedSemaphore(HEDGE_MAX_INFLIGHT)
+
+
+class ModelStats:
+    """Recent latencies/outcomes and running totals of one model"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.skip_until = 0.0
+
+    def record(self, seconds, ok, usage=None, price=None):
+        with self.lock:
+            self.calls += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+            else:
+                self.errors += 1
+                if (len(self.outcomes) >= STATS_MIN_SAMPLES
+                        and self.outcomes.count(False) / len(self.outcomes) > FAILOVER_ERROR_RATE):
+                    self.skip_until = time.monotonic() + FAILOVER_SECONDS
+                    self.outcomes.clear()
+            if usage:
+                prompt, output = usage.get('promptTokenCount', 0), usage.get('candidatesTokenCount', 0)
+                self.input_tokens += prompt
+                self.output_tokens += output
+                if price:
+                    cost = (prompt * price[0] + output * price[1]) / 1e6
+                    self.cost_usd += cost
+                    return cost
+        return 0.0
+
+    def p95(self):
+        with self.lock:
+            if len(self.latencies) < STATS_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95)]
+
+    def available(self):
+        return time.monotonic() >= self.skip_until
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'cost_usd': round(self.cost_usd, 6),
+                'skipped': not self.available(),
+            }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def model_stats(model):
+    with _stats_lock:
+        if model not in _stats:
+            _stats[model] = ModelStats()
+        return _stats[model]
+
+
+def stats():
+    """Per-model call counts, errors, tokens, cost and p95 latency"""
+    with _stats_lock:
+        models = dict(_stats)
+    return {model: dict(entry.snapshot(), p95_s=entry.p95()) for model, entry in models.items()}
+
+
+def hedge_after():
+    """Seconds to wait for the primary model before sending a hedge"""
+    p95 = model_stats(PRIMARY_MODEL).p95()
+    return HEDGE_AFTER if p95 is None else max(HEDGE_MIN_AFTER, p95)
+
+
+def _call(model, payload, api_key):
+    """One generateContent request; records latency, outcome and cost"""
+    body = dict(payload, generation_config=dict(GENERATION_CONFIG, **payload.get('generation_config', {})))
+    start = time.perf_counter()
+    try:
+        response = session.post(
+            f"{API_BASE}/v1beta/models/{model}:generateContent",
+            params={'key': api_key},
+            headers={'Content-Type': 'application/json'},
+            json=body,
+            timeout=TIMEOUT,
+        )
+    except requests.exceptions.RequestException:
+        model_stats(model).record(time.perf_counter() - start, False)
+        metrics.inc('gemini_model_calls_total', model, 'network_error')
+        raise
+    seconds = time.perf_counter() - start
+    ok = response.status_code == 200
+    usage = None
+    if ok:
+        try:
+            usage = response.json().get('usageMetadata')
+        except ValueError:
+            pass
+    cost = model_stats(model).record(seconds, ok, usage, PRICES.get(model))
+    metrics.inc('gemini_model_calls_total', model, 'ok' if ok else f'http_{response.status_code}')
+    metrics.observe('gemini_model_latency_seconds', seconds, model)
+    if cost:
+        metrics.inc('gemini_cost_usd_total', model, amount=cost)
+    return response
+
+
+def _failed(future):
+    """Whether a finished call failed in a way another model might not"""
+    if future.exception() is not None:
+        return True
+    return future.result().status_code in RETRYABLE_STATUS
+
+
+def _route():
+    """(first model, model to retry on) for the next request"""
+    if not model_stats(PRIMARY_MODEL).available() and model_stats(FALLBACK_MODEL).available():
+        return FALLBACK_MODEL, None
+    return PRIMARY_MODEL, (FALLBACK_MODEL if FALLBACK_MODEL != PRIMARY_MODEL else None)
+
+
+def _hedged(model, payload, api_key):
+    primary = _executor.submit(_call, model, payload, api_key)
+    done, _ = wait([primary], timeout=hedge_after())
+    if done or HEDGE_MODEL == model or not _hedges.acquire(blocking=False):
+        return primary.result(), model
+
+    hedge = _executor.submit(_call, HEDGE_MODEL, payload, api_key)
+    hedge.add_done_callback(lambda _: _hedges.release())
+    pending = {primary: model, hedge: HEDGE_MODEL}
+    last = None
+    while pending:
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            winner = pending.pop(future)
+            last = (future, winner)
+            if not _failed(future):
+                metrics.inc('gemini_hedged_total', 'hedge' if winner == HEDGE_MODEL else 'primary')
+                logger.info("Hedged Gemini request", extra={'winner': winner})
+                # The slower call finishes in the background (its latency is still recorded)
+                return future.result(), winner
+    metrics.inc('gemini_hedged_total', 'failed')
+    return last[0].result(), last[1]
+
+
+def generate_content(payload, api_key):
+    """
+    Send a generateContent request, with failover and optional hedging.
+
+    Args:
+        payload: request body (contents and request-specific generation_config,
+            merged over GENERATION_CONFIG)
+
+    Returns:
+        tuple: (requests.Response, model that answered); network errors of
+        the last model tried are raised
+    """
+    model, fallback = _route()
+    try:
+        if HEDGE_ENABLED:
+            response, model = _hedged(model, payload, api_key)
+        else:
+            response = _call(model, payload, api_key)
+        if response.status_code not in RETRYABLE_STATUS or fallback is None or model == fallback:
+            return response, model
+        logger.warning("Gemini model failed, retrying on fallback",
+                       extra={'model': model, 'status': response.status_code, 'fallback': fallback})
+    except requests.exceptions.RequestException as e:
+        if fallback is None or model == fallback:
+            raise
+        logger.warning("Gemini model unreachable, retrying on fallback",
+                       extra={'model': model, 'error': type(e).__name__, 'fallback': fallback})
+    return _call(fallback, payload, api_key), fallback
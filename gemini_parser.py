@@ -0,0 +1,188 @@
+"""
+Structured-output parsing for Gemini food analysis responses.
+
+The request asks Gemini for JSON (response_mime_type + RESPONSE_SCHEMA), but
+responses can still arrive wrapped in markdown fences, surrounded by prose,
+with trailing commas or cut off mid-object. parse_response() decodes straight
+from the first brace (fences and prose around the object are never
+rewritten), then retries without trailing commas, then scans for balanced
+JSON objects. It validates the result against the schema and only falls
+back to a precompiled key/value pattern when no object can be decoded.
+"""
+
+# Standard library imports
+import re
+import json
+
+REQUIRED_KEYS = ('food_name', 'nutrition', 'good_for_user', 'diet_plan', 'recommendation')
+
+MISSING_VALUE = "Information not available"
+
+# Schema sent as generation_config.response_schema (OpenAPI subset used by Gemini)
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "food_name": {"type": "STRING", "description": "Name of food"},
+        "nutrition": {"type": "STRING", "description": "Detailed HTML formatted nutritional breakdown with <ul> and <li> tags"},
+        "good_for_user": {"type": "STRING", "description": "Assessment of suitability for this user"},
+        "diet_plan": {"type": "STRING", "description": "Personalized diet plan"},
+        "recommendation": {"type": "STRING", "description": "Specific recommendation"},
+    },
+    "required": list(REQUIRED_KEYS),
+}
+
+# Precompiled patterns
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+_STRUCTURE_RE = re.compile(r'[{}"]')
+# Start of the string value following a key name; matched only at positions
+# found with str.find, the value itself is skipped with _string_end()
+_KEY_VALUE_RE = re.compile(r'"?\s*:\s*"')
+
+_decoder = json.JSONDecoder()
+
+
+def _string_end(text, pos):
+    """Index just past the quote closing the string whose body starts at pos, or -1"""
+    while True:
+        end = text.find('"', pos)
+        if end == -1:
+            return -1
+        backslashes = 0
+        while text[end - 1 - backslashes] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        pos = end + 1
+
+
+def _object_spans(text, pos=0):
+    """
+    Yield (start, end) spans of balanced top-level {...} blocks from pos on.
+
+    Python only visits braces and the ends of strings (string bodies are
+    skipped with str.find), and braces inside JSON strings are ignored, so
+    nested objects and values such as "{calories}" do not break the scan.
+    """
+    pos = text.find('{', pos)
+    while pos != -1:
+        start = pos
+        depth = 0
+        while True:
+            match = _STRUCTURE_RE.search(text, pos)
+            if match is None:
+                return
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                pos = _string_end(text, pos)
+                if pos == -1:
+                    # String cut off: nothing after it can balance
+                    return
+            elif char == '{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    yield start, pos
+                    break
+        pos = text.find('{', pos)
+
+
+def _decode_at(text, pos):
+    try:
+        value, _ = _decoder.raw_decode(text, pos)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def extract_json(text):
+    """
+    Return the first JSON object in text that decodes to a dict, or None.
+
+    Decodes straight from the first brace when possible (JSON mode, fences,
+    leading prose), then from the first brace with trailing commas removed;
+    otherwise scans for balanced objects and tries each as-is and without
+    trailing commas.
+    """
+    if not text:
+        return None
+    first = text.find('{')
+    if first == -1:
+        return None
+    value = _decode_at(text, first)
+    if value is None:
+        value = _decode_at(_TRAILING_COMMA_RE.sub(r'\1', text[first:]), 0)
+    if value is not None:
+        return value
+
+    for start, end in _object_spans(text, first):
+        candidate = text[start:end]
+        for attempt in (candidate, _TRAILING_COMMA_RE.sub(r'\1', candidate)):
+            try:
+                value = json.loads(attempt)
+            except ValueError:
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def _extract_key_values(text):
+    # Last resort for responses that are not valid JSON (e.g. truncated)
+    result = {}
+    for key in REQUIRED_KEYS:
+        pos = text.find(key)
+        while pos != -1:
+            match = _KEY_VALUE_RE.match(text, pos + len(key))
+            end = _string_end(text, match.end()) if match else -1
+            if end != -1:
+                value = text[match.end():end - 1]
+                try:
+                    result[key] = json.loads(f'"{value}"')
+                except ValueError:
+                    result[key] = value
+                break
+            pos = text.find(key, pos + 1)
+    return result
+
+
+def _as_html_list(text):
+    items = ''.join(f"<li>{line.strip()}</li>" for line in text.split('\n') if line.strip())
+    return f"<ul>{items}</ul>"
+
+
+def validate(result):
+    """
+    Coerce a decoded response to the schema: every required key present as a
+    non-empty string, and nutrition formatted as an HTML list.
+    """
+    validated = {}
+    for key in REQUIRED_KEYS:
+        value = result.get(key)
+        if isinstance(value, (list, tuple)):
+            value = '\n'.join(str(v) for v in value)
+        elif isinstance(value, dict):
+            value = '\n'.join(f"{k}: {v}" for k, v in value.items())
+        elif value is not None:
+            value = str(value)
+        validated[key] = value.strip() if value and value.strip() else MISSING_VALUE
+
+    if '<ul>' not in validated['nutrition'] and validated['nutrition'] != MISSING_VALUE:
+        validated['nutrition'] = _as_html_list(validated['nutrition'])
+    return validated
+
+
+def parse_response(text):
+    """
+    Parse Gemini's text output into the analysis dict.
+
+    Returns:
+        dict: the five required keys, or None if nothing could be extracted
+    """
+    result = extract_json(text)
+    if result is None:
+        result = _extract_key_values(text or '')
+        if not result:
+            return None
+    return validate(result)
@@ -0,0 +1,175 @@
+"""
+Health metrics engine.
+
+BMI, BMR (Mifflin-St Jeor) and TDEE computed over NumPy arrays, so the same
+code serves a single request (scalars) and bulk jobs over every HealthData
+row. SQL expression builders mirror the formulas so aggregates such as
+cohort statistics can run inside the database without pulling rows into
+Python.
+"""
+
+# Third-party imports
+import numpy as np
+from sqlalchemy import select, update, func, case
+
+# Activity multipliers applied to BMR
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+}
+
+# Upper BMI bounds of the WHO categories (the last one is open-ended)
+BMI_CATEGORIES = ('Underweight', 'Normal', 'Overweight', 'Obese')
+BMI_BOUNDS = (18.5, 25.0, 30.0)
+
+# Rows processed per batch by the bulk recompute job
+BATCH_SIZE = 1000
+
+
+def _is_male(gender):
+    # Accepts 'Male'/'Female' strings (any case) or booleans
+    gender = np.asarray(gender)
+    if gender.dtype.kind == 'b':
+        return gender
+    return np.char.startswith(np.char.lower(gender.astype(str)), 'm')
+
+
+def bmi(weight, height):
+    """BMI from weight in kg and height in cm (scalars or arrays)"""
+    height_m = np.asarray(height, dtype=np.float64) / 100.0
+    return np.asarray(weight, dtype=np.float64) / (height_m * height_m)
+
+
+def bmr(weight, height, age, gender):
+    """Basal metabolic rate in kcal/day using the Mifflin-St Jeor equation"""
+    base = (10.0 * np.asarray(weight, dtype=np.float64)
+            + 6.25 * np.asarray(height, dtype=np.float64)
+            - 5.0 * np.asarray(age, dtype=np.float64))
+    return base + np.where(_is_male(gender), 5.0, -161.0)
+
+
+def tdee(bmr_values, activity='light'):
+    """Total daily energy expenditure from BMR and an activity level"""
+    return np.asarray(bmr_values, dtype=np.float64) * ACTIVITY_FACTORS.get(activity, ACTIVITY_FACTORS['light'])
+
+
+def bmi_category(bmi_values):
+    """Map BMI values to WHO category names"""
+    codes = np.digitize(bmi_values, BMI_BOUNDS)
+    return np.asarray(BMI_CATEGORIES)[codes]
+
+
+def compute(weight, height, age, gender, activity='light'):
+    """
+    Compute all metrics at once.
+
+    Returns:
+        dict: 'bmi', 'bmr' and 'tdee' arrays (0-d for scalar input)
+    """
+    bmi_values = bmi(weight, height)
+    bmr_values = bmr(weight, height, age, gender)
+    return {
+        'bmi': bmi_values,
+        'bmr': bmr_values,
+        'tdee': tdee(bmr_values, activity),
+    }
+
+
+# SQL-side equivalents of the formulas above
+
+def bmi_sql(weight, height):
+    """SQL expression for BMI from weight (kg) and height (cm) columns"""
+    return weight / ((height / 100.0) * (height / 100.0))
+
+
+def bmr_sql(weight, height, age, gender):
+    """SQL expression for Mifflin-St Jeor BMR"""
+    offset = case((func.lower(func.substr(gender, 1, 1)) == 'm', 5.0), else_=-161.0)
+    return 10.0 * weight + 6.25 * height - 5.0 * age + offset
+
+
+def cohort_stats(session, HealthData, User):
+    """
+    Aggregate the latest measurement of every user by gender and age band.
+
+    Everything runs in one SQL statement; only the grouped rows come back.
+
+    Returns:
+        list: dicts with gender, age_band, users, avg_bmi, avg_bmr and overweight_pct
+    """
+    latest_ids = (
+        select(func.max(HealthData.id).label('id'))
+        .group_by(HealthData.user_id)
+        .subquery()
+    )
+    bmi_value = bmi_sql(HealthData.weight, HealthData.height)
+    age_band = (HealthData.age // 10) * 10
+    stmt = (
+        select(
+            User.gender,
+            age_band.label('age_band'),
+            func.count().label('users'),
+            func.avg(bmi_value).label('avg_bmi'),
+            func.avg(bmr_sql(HealthData.weight, HealthData.height, HealthData.age, User.gender)).label('avg_bmr'),
+            func.sum(case((bmi_value >= BMI_BOUNDS[1], 1), else_=0)).label('overweight'),
+        )
+        .join(latest_ids, latest_ids.c.id == HealthData.id)
+        .join(User, User.id == HealthData.user_id)
+        .group_by(User.gender, age_band)
+        .order_by(User.gender, age_band)
+    )
+
+    stats = []
+    for row in session.execute(stmt):
+        stats.append({
+            'gender': row.gender,
+            'age_band': f'{int(row.age_band)}-{int(row.age_band) + 9}',
+            'users': row.users,
+            'avg_bmi': round(float(row.avg_bmi), 1),
+            'avg_bmr': round(float(row.avg_bmr)),
+            'overweight_pct': round(100.0 * row.overweight / row.users, 1),
+        })
+    return stats
+
+
+def recompute_health_metrics(session, HealthData, User, batch_size=BATCH_SIZE, progress=None):
+    """
+    Recompute the stored BMI and BMR of every HealthData row.
+
+    Rows are read in id order in batches, computed as arrays and written back
+    with one executemany UPDATE per batch.
+
+    Returns:
+        int: number of rows updated
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(HealthData.id, HealthData.weight, HealthData.height, HealthData.age, User.gender)
+            .join(User, User.id == HealthData.user_id)
+            .where(HealthData.id > last_id)
+            .order_by(HealthData.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        ids, weights, heights, ages, genders = zip(*rows)
+        metrics = compute(weights, heights, ages, genders)
+        session.execute(
+            update(HealthData),
+            [
+                {'id': row_id, 'bmi': round(float(b), 2), 'bmr': round(float(r), 1)}
+                for row_id, b, r in zip(ids, metrics['bmi'], metrics['bmr'])
+            ]
+        )
+        session.commit()
+
+        updated += len(ids)
+        last_id = ids[-1]
+        if progress:
+            progress(updated)
+    return updated
@@ -0,0 +1,216 @@
+"""
+Meal-plan engine over the local nutrient database.
+
+Builds day and week plans that hit calorie and macro targets derived from the
+user's age, gender, height and weight. Each meal slot is solved as a
+vectorized search: every combination of candidate foods for the slot's
+components is scored at once with NumPy, portions are scaled to the slot's
+calorie share, and the combination with the smallest macro error wins.
+Plans are cached per profile bucket so nearby profiles share one solve.
+"""
+
+# Standard library imports
+import zlib
+from functools import lru_cache
+
+# Third-party imports
+import numpy as np
+
+# Local imports
+import nutrition_db
+import health_metrics
+
+ACTIVITY_FACTORS = health_metrics.ACTIVITY_FACTORS
+
+# Share of the daily calories per meal slot, with the slot's meal bit
+MEAL_SLOTS = (
+    ('breakfast', 0.25, nutrition_db.MEAL_BITS['b']),
+    ('lunch', 0.35, nutrition_db.MEAL_BITS['l']),
+    ('snack', 0.10, nutrition_db.MEAL_BITS['s']),
+    ('dinner', 0.30, nutrition_db.MEAL_BITS['d']),
+)
+
+# Components of each slot: each component draws from a set of categories
+SLOT_COMPONENTS = {
+    'breakfast': (('grain', 'dish'), ('protein', 'dairy'), ('fruit',)),
+    'lunch': (('grain', 'dish'), ('protein', 'dish'), ('vegetable',)),
+    'snack': (('fruit', 'snack', 'dairy'),),
+    'dinner': (('grain', 'dish'), ('protein', 'dish'), ('vegetable',)),
+}
+
+# Portions are scaled between these multiples of a typical serving
+MIN_PORTION = 0.5
+MAX_PORTION = 2.0
+
+# Weights of calorie, protein, carb and fat errors in the combination score
+SCORE_WEIGHTS = np.array([2.0, 1.5, 1.0, 1.0], dtype=np.float32)
+
+# Penalty added to a food used within the last RECENT_WINDOW picks (about two days)
+REPEAT_PENALTY = 0.3
+RECENT_WINDOW = 20
+
+# Bucket widths used to share cached plans between similar profiles
+AGE_BUCKET = 5
+HEIGHT_BUCKET = 5
+WEIGHT_BUCKET = 2
+
+_KCAL, _PROTEIN, _CARBS, _FAT = (nutrition_db.NUTRIENT_FIELDS.index(f)
+                                 for f in ('kcal', 'protein_g', 'carbs_g', 'fat_g'))
+
+
+def daily_targets(age, gender, height, weight, activity='light'):
+    """
+    Derive daily calorie and macro targets for a user.
+
+    Uses Mifflin-St Jeor BMR and an activity multiplier, adjusted towards a
+    healthy BMI (surplus when underweight, deficit when overweight).
+
+    Returns:
+        dict: kcal, protein_g, carbs_g and fat_g targets
+    """
+    male = str(gender).lower().startswith('m')
+    metrics = health_metrics.compute(weight, height, age, gender, activity)
+    tdee = float(metrics['tdee'])
+    bmi = float(metrics['bmi'])
+
+    height_m = height / 100
+    if bmi < health_metrics.BMI_BOUNDS[0]:
+        kcal = tdee + 300
+    elif bmi >= health_metrics.BMI_BOUNDS[1]:
+        kcal = max(tdee - 500, 1500 if male else 1200)
+    else:
+        kcal = tdee
+
+    # Protein from the weight at BMI 25 for overweight users, so it stays realistic
+    reference_weight = min(weight, 25 * height_m * height_m)
+    protein = 1.4 * reference_weight
+    fat = kcal * 0.28 / 9
+    carbs = max(kcal - protein * 4 - fat * 9, 0) / 4
+    return {
+        'kcal': round(kcal),
+        'protein_g': round(protein),
+        'carbs_g': round(carbs),
+        'fat_g': round(fat),
+    }
+
+
+def _candidates(table, categories, meal_bit):
+    codes = [nutrition_db.CATEGORIES.index(c) for c in categories]
+    mask = np.isin(table.category_codes, codes) & ((table.meal_mask & meal_bit) != 0)
+    return np.flatnonzero(mask)
+
+
+def _solve_slot(table, components, meal_bit, target, used, rng):
+    """
+    Pick one food per component and scale the portions to the slot target.
+
+    Returns:
+        tuple: (row indexes, grams per row)
+    """
+    pools = [_candidates(table, categories, meal_bit) for categories in components]
+
+    # Every combination of one candidate per component, as an (n_combos, n_components) grid
+    grid = np.stack([axis.ravel() for axis in np.meshgrid(*pools, indexing='ij')], axis=1)
+    if grid.shape[1] > 1:
+        # Drop combinations that pick the same food twice
+        grid = grid[np.all(np.diff(np.sort(grid, axis=1), axis=1) != 0, axis=1)]
+
+    # Macros of one serving of each picked food, summed per combination
+    serving_macros = table.values[:, [_KCAL, _PROTEIN, _CARBS, _FAT]] * (table.serving_g[:, None] / 100.0)
+    combo = serving_macros[grid].sum(axis=1)
+
+    # One portion multiplier per combination that lands on the calorie target
+    scale = np.clip(target[0] / np.maximum(combo[:, 0], 1.0), MIN_PORTION, MAX_PORTION)
+    scaled = combo * scale[:, None]
+
+    error = np.abs(scaled - target) / np.maximum(target, 1.0)
+    score = error @ SCORE_WEIGHTS
+    score += REPEAT_PENALTY * np.isin(grid, used).sum(axis=1)
+    # Small deterministic jitter so each day of the week differs
+    score += rng.random(score.shape[0], dtype=np.float32) * 0.05
+
+    best = int(np.argmin(score))
+    rows = grid[best]
+    grams = np.round(table.serving_g[rows] * scale[best] / 10.0) * 10.0
+    return rows, grams
+
+
+def _build_plan(age, gender, height, weight, activity, days):
+    table = nutrition_db.get_table()
+    targets = daily_targets(age, gender, height, weight, activity)
+    target_vector = np.array(
+        [targets['kcal'], targets['protein_g'], targets['carbs_g'], targets['fat_g']],
+        dtype=np.float32
+    )
+
+    # Seed from the profile so a bucket always gets the same plan
+    seed = zlib.crc32(f'{age}|{gender}|{height}|{weight}|{activity}'.encode())
+    rng = np.random.default_rng(seed)
+
+    used = []
+    plan_days = []
+    for day in range(days):
+        meals = []
+        day_rows, day_grams = [], []
+        for slot, share, meal_bit in MEAL_SLOTS:
+            rows, grams = _solve_slot(
+                table, SLOT_COMPONENTS[slot], meal_bit, target_vector * share,
+                np.array(used[-RECENT_WINDOW:], dtype=np.intp), rng
+            )
+            used.extend(int(r) for r in rows)
+            day_rows.extend(rows)
+            day_grams.extend(grams)
+            meals.append({
+                'slot': slot,
+                'items': [table.nutrients(int(r), float(g)) for r, g in zip(rows, grams)],
+                'totals': table.totals(rows, grams),
+            })
+        plan_days.append({
+            'day': day + 1,
+            'meals': meals,
+            'totals': table.totals(day_rows, day_grams),
+        })
+
+    return {'targets': targets, 'activity': activity, 'days': plan_days}
+
+
+@lru_cache(maxsize=256)
+def _cached_plan(age_bucket, gender, height_bucket, weight_bucket, activity, days):
+    # Solve for the bucket midpoint so every profile in the bucket shares the plan
+    return _build_plan(
+        age_bucket * AGE_BUCKET + AGE_BUCKET // 2,
+        gender,
+        height_bucket * HEIGHT_BUCKET,
+        weight_bucket * WEIGHT_BUCKET,
+        activity,
+        days,
+    )
+
+
+def build_meal_plan(age, gender, height, weight, activity='light', days=7):
+    """
+    Build a meal plan for a user profile.
+
+    Args:
+        age (int): Age in years
+        gender (str): 'Male' or 'Female'
+        height (float): Height in cm
+        weight (float): Weight in kg
+        activity (str): One of ACTIVITY_FACTORS
+        days (int): Number of days to plan (1-7)
+
+    Returns:
+        dict: targets plus a list of days with meals, portions and totals
+    """
+    if activity not in ACTIVITY_FACTORS:
+        activity = 'light'
+    days = min(max(int(days), 1), 7)
+    gender = 'Male' if str(gender).lower().startswith('m') else 'Female'
+    return _cached_plan(
+        int(age) // AGE_BUCKET,
+        gender,
+        int(round(float(height) / HEIGHT_BUCKET)),
+        int(round(float(weight) / WEIGHT_BUCKET)),
+        activity,
+        days,
+    )
@@ -0,0 +1,292 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Collects, per worker process:
+- request latency histograms per Flask endpoint
+- Gemini / Resend call latency and error counters, plus per-model Gemini
+  calls, latency, cost and hedging (see gemini_client.py)
+- DB query count and time per request (SQLAlchemy cursor events)
+- upload size distribution
+- DB connection pool usage and checkout wait time (see db_pool.py)
+
+Each gunicorn worker keeps its own registry and periodically writes a JSON
+snapshot to METRICS_DIR; the /metrics endpoint merges the snapshots of all
+workers so counters and histograms are aggregated across the whole server
+(gauges are summed, e.g. connections checked out by all workers). Counters
+and histograms of exited workers keep counting until their snapshot goes
+stale; gauges are only taken from workers that are still running.
+"""
+
+# Standard library imports
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Third-party imports
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'food_insight_metrics'))
+
+# Seconds between snapshot writes of a worker (also written on every scrape)
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))
+
+# Snapshots not updated for this long are ignored entirely (gauges of
+# workers that exited are dropped right away, see _merged())
+STALE_AFTER = float(os.getenv('METRICS_STALE_AFTER', str(24 * 3600)))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+SIZE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 2e6, 4e6, 8e6, 16e6)
+WRITE_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+GC_BUCKETS = (0.1, 1.0, 10.0, 60.0, 300.0, 900.0, 3600.0)
+
+# name -> (type, help, buckets or None, label names)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint', LATENCY_BUCKETS, ('endpoint', 'method', 'status')),
+    'outbound_request_duration_seconds': ('histogram', 'Latency of calls to external APIs', LATENCY_BUCKETS, ('service',)),
+    'outbound_errors_total': ('counter', 'Failed calls to external APIs', None, ('service', 'reason')),
+    'db_queries_per_request': ('histogram', 'SQL statements executed per request', QUERY_COUNT_BUCKETS, ('endpoint',)),
+    'db_time_per_request_seconds': ('histogram', 'Time spent in SQL per request', LATENCY_BUCKETS, ('endpoint',)),
+    'db_queries_total': ('counter', 'SQL statements executed', None, ()),
+    'upload_size_bytes': ('histogram', 'Size of uploaded food images', SIZE_BUCKETS, ()),
+    'db_pool_checked_out': ('gauge', 'DB connections currently checked out of the pool', None, ()),
+    'db_pool_capacity': ('gauge', 'Maximum DB connections the pool may open (size + overflow)', None, ()),
+    'db_pool_checkout_wait_seconds': ('histogram', 'Time spent waiting for a pooled DB connection', LATENCY_BUCKETS, ()),
+    'db_pool_timeouts_total': ('counter', 'Checkouts that gave up waiting for a DB connection', None, ()),
+    'db_pool_connects_total': ('counter', 'New DB connections opened by the pool', None, ()),
+    'db_pool_invalidations_total': ('counter', 'Pooled DB connections discarded as dead or stale', None, ()),
+    'db_routed_reads_total': ('counter', 'Reads from read-only views by target database', None, ('target',)),
+    'password_hash_seconds': ('histogram', 'Password hash/verify time including queueing', LATENCY_BUCKETS, ()),
+    'password_hash_rejected_total': ('counter', 'Password hashes refused because the hashing queue was full', None, ()),
+    'password_rehash_total': ('counter', 'Stored password hashes upgraded to the configured method at login', None, ()),
+    'rate_limited_total': ('counter', 'Login/OTP attempts rejected by the rate limiter', None, ('rule',)),
+    'gemini_model_calls_total': ('counter', 'Gemini calls by model and outcome', None, ('model', 'outcome')),
+    'gemini_model_latency_seconds': ('histogram', 'Latency of successful Gemini calls by model', LATENCY_BUCKETS, ('model',)),
+    'gemini_cost_usd_total': ('counter', 'Estimated Gemini spend by model (from usageMetadata)', None, ('model',)),
+    'gemini_hedged_total': ('counter', 'Hedged Gemini requests by which call answered first', None, ('winner',)),
+    'db_write_batch_seconds': ('histogram', 'Time to commit one batch of the SQLite write queue', LATENCY_BUCKETS, ()),
+    'db_write_batch_size': ('histogram', 'Jobs committed per SQLite write-queue batch', WRITE_BATCH_BUCKETS, ()),
+    'upload_gc_seconds': ('histogram', 'Duration of one orphaned-upload collection', GC_BUCKETS, ()),
+    'upload_gc_deleted_files_total': ('counter', 'Orphaned upload files deleted by the background collector', None, ()),
+}
+
+_lock = threading.Lock()
+_counters = {}    # name -> {label values tuple: value}
+_histograms = {}  # name -> {label values tuple: [bucket counts..., sum, count]}
+_gauges = {}      # name -> {label values tuple: value}
+_last_flush = 0.0
+
+
+def inc(name, *labels, amount=1):
+    """Increment a counter"""
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+
+def set_gauge(name, value, *labels):
+    """Set a gauge to its current value"""
+    with _lock:
+        _gauges.setdefault(name, {})[labels] = value
+
+
+def observe(name, value, *labels):
+    """Record a histogram observation"""
+    buckets = METRICS[name][2]
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        state = series.get(labels)
+        if state is None:
+            state = series[labels] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                state[i] += 1
+                break
+        state[-2] += value
+        state[-1] += 1
+
+
+@contextmanager
+def outbound_timer(service):
+    """
+    Time a call to an external API.
+
+    Usage:
+        with metrics.outbound_timer('gemini') as call:
+            response = requests.post(...)
+            call['status'] = response.status_code
+    """
+    call = {'status': None}
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        inc('outbound_errors_total', service, type(e).__name__)
+        raise
+    finally:
+        observe('outbound_request_duration_seconds', time.perf_counter() - start, service)
+    if call['status'] is not None and call['status'] >= 400:
+        inc('outbound_errors_total', service, f"http_{call['status']}")
+
+
+# Snapshot files for cross-worker aggregation
+
+def _snapshot():
+    with _lock:
+        return {
+            'counters': {name: [[list(k), v] for k, v in series.items()] for name, series in _counters.items()},
+            'histograms': {name: [[list(k), list(v)] for k, v in series.items()] for name, series in _histograms.items()},
+            'gauges': {name: [[list(k), v] for k, v in series.items()] for name, series in _gauges.items()},
+        }
+
+
+def flush(force=False):
+    """Write this worker's snapshot to METRICS_DIR (rate-limited unless forced)"""
+    global _last_flush
+    now = time.time()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(_snapshot(), snapshot_file)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def flush_at_exit():
+    """Final snapshot of a worker; skipped in processes that never wrote one (CLI scripts)"""
+    if _last_flush:
+        flush(force=True)
+
+
+def _alive(pid):
+    """Whether the worker that wrote a snapshot is still running"""
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # No signal 0 on Windows (and no gunicorn workers): only this process counts
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merged():
+    counters, histograms, gauges = {}, {}, {}
+    snapshots = []
+    try:
+        now = time.time()
+        for entry in os.scandir(METRICS_DIR):
+            if entry.name.endswith('.json') and now - entry.stat().st_mtime < STALE_AFTER:
+                try:
+                    with open(entry.path) as snapshot_file:
+                        snapshot = json.load(snapshot_file)
+                except (OSError, ValueError):
+                    continue
+                pid = entry.name[:-len('.json')]
+                if not (pid.isdigit() and _alive(int(pid))):
+                    # Gauges describe a worker's current state, which ends with it
+                    snapshot['gauges'] = {}
+                snapshots.append(snapshot)
+    except OSError:
+        snapshots = [_snapshot()]
+
+    for snapshot in snapshots:
+        for kind, totals in (('counters', counters), ('gauges', gauges)):
+            for name, series in snapshot.get(kind, {}).items():
+                merged = totals.setdefault(name, {})
+                for labels, value in series:
+                    merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+        for name, series in snapshot['histograms'].items():
+            merged = histograms.setdefault(name, {})
+            for labels, state in series:
+                current = merged.get(tuple(labels))
+                merged[tuple(labels)] = state if current is None else [a + b for a, b in zip(current, state)]
+    return counters, histograms, gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render():
+    """Render all workers' metrics in the Prometheus text exposition format"""
+    flush(force=True)
+    counters, histograms, gauges = _merged()
+    lines = []
+    for name, (kind, help_text, buckets, label_names) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind in ('counter', 'gauge'):
+            values = counters if kind == 'counter' else gauges
+            for labels, value in sorted(values.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(label_names, labels)} {value}')
+            continue
+        for labels, state in sorted(histograms.get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip(buckets, state):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(label_names, labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(label_names, labels, [("le", "+Inf")])} {state[-1]}')
+            lines.append(f'{name}_sum{_format_labels(label_names, labels)} {state[-2]}')
+            lines.append(f'{name}_count{_format_labels(label_names, labels)} {state[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Flask and SQLAlchemy hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    inc('db_queries_total')
+    if has_request_context() and hasattr(g, '_metrics_query_start'):
+        g._metrics_db_queries = g.get('_metrics_db_queries', 0) + 1
+        g._metrics_db_time = g.get('_metrics_db_time', 0.0) + time.perf_counter() - g._metrics_query_start
+
+
+def _start_timer():
+    g._metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    observe('http_request_duration_seconds', time.perf_counter() - start,
+            endpoint, request.method, f'{response.status_code // 100}xx')
+    observe('db_queries_per_request', g.get('_metrics_db_queries', 0), endpoint)
+    observe('db_time_per_request_seconds', g.get('_metrics_db_time', 0.0), endpoint)
+    flush()
+    return response
+
+
+def init_app(app):
+    """Register request timing hooks and SQL statement counting"""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,60 @@
+"""
+Script to move uploaded food images into the sharded upload layout.
+
+Images saved before uploads.py existed sit directly in uploads/; this
+moves each one into its hash-prefix subdirectory (uploads/3f/<name>).
+Run it again after changing UPLOAD_SHARD_LEVELS to re-shard everything.
+Filenames stored in the database do not change.
+
+Moves are atomic renames and the app finds files in either place, so it
+can keep running meanwhile. If the script is interrupted, run it again:
+files already in place are skipped.
+
+Usage:
+    python migrate_uploads.py              # move files into place
+    python migrate_uploads.py --dry-run    # count the files to move, moves nothing
+"""
+
+from app import app
+from dotenv import load_dotenv
+import purge
+import uploads
+
+# Load environment variables
+load_dotenv()
+
+def print_progress(folder, count):
+    print(f"\r  ... {folder}: {count}", end='', flush=True)
+
+def migrate_uploads(dry_run=False):
+    """Move flat (or differently sharded) uploads into the current layout"""
+    with app.app_context():
+        try:
+            upload_folder = app.config['UPLOAD_FOLDER']
+            print("="*60)
+            print("SHARDING UPLOADS" + (" (DRY RUN)" if dry_run else ""))
+            print("="*60)
+            print(f"\nFolder: {upload_folder}  (levels: {uploads.SHARD_LEVELS})")
+
+            result = uploads.migrate(upload_folder, dry_run=dry_run, keep=purge.UPLOAD_KEEP,
+                                     progress=print_progress)
+            print()
+            action = "Would move" if dry_run else "Moved"
+            print(f"  ✓ {action} {result['moved']} files ({result['bytes'] / 1024 / 1024:.1f} MB)")
+            if result['conflicts']:
+                print(f"  ⚠️  {result['conflicts']} files left in place: their sharded path is already taken")
+
+            print("\n" + "="*60)
+            print("✓ DRY RUN FINISHED. NOTHING WAS MOVED." if dry_run else "✓ UPLOADS SHARDED SUCCESSFULLY")
+            print("="*60)
+
+        except Exception as e:
+            print(f"\n❌ Error sharding uploads: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+if __name__ == '__main__':
+    import sys
+
+    migrate_uploads(dry_run='--dry-run' in sys.argv[1:])
@@ -0,0 +1,275 @@
+"""
+Local nutrient reference database.
+
+Loads the bundled data/nutrients.csv (USDA-style values per 100 g) into
+NumPy arrays and builds name indexes over the canonical names and aliases,
+so a food name returned by Gemini can be resolved to macros locally without
+another API call. The same table backs portion scaling and daily totals.
+"""
+
+# Standard library imports
+import os
+import re
+import csv
+import bisect
+import difflib
+from functools import lru_cache
+
+# Third-party imports
+import numpy as np
+
+DATA_PATH = os.getenv(
+    'NUTRIENT_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'nutrients.csv')
+)
+
+# Column order of the value matrix (all values are per 100 g)
+NUTRIENT_FIELDS = ('kcal', 'protein_g', 'carbs_g', 'fat_g', 'fiber_g', 'sugar_g', 'sodium_mg')
+
+CATEGORIES = ('grain', 'protein', 'dairy', 'vegetable', 'fruit', 'fat', 'snack', 'dish', 'beverage')
+
+# Meal slots a food is typically eaten in, stored as a bitmask per row
+MEAL_BITS = {'b': 1, 'l': 2, 'd': 4, 's': 8}
+
+# Minimum score for a token-overlap match to be accepted
+MATCH_CUTOFF = 0.5
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+# Words that describe presentation rather than the food itself
+_STOPWORDS = frozenset({
+    'a', 'an', 'and', 'the', 'with', 'of', 'in', 'on', 'or', 'some', 'served',
+    'plate', 'bowl', 'side', 'piece', 'pieces', 'slice', 'slices', 'cup', 'glass',
+    'fresh', 'homemade', 'style', 'cooked', 'plain', 'indian', 'traditional',
+})
+
+
+def normalize_name(name):
+    """Lowercase a food name and reduce it to its meaningful tokens"""
+    tokens = []
+    for token in _NON_WORD_RE.split(name.lower()):
+        if not token or token in _STOPWORDS:
+            continue
+        tokens.append(_singular(token))
+    return tokens
+
+
+def _singular(token):
+    # Cheap plural folding so "apples" and "apple" share an index entry
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+class NutrientTable:
+    """Array-backed nutrient table with exact, prefix and fuzzy name indexes"""
+
+    def __init__(self, rows):
+        self.names = [row['name'] for row in rows]
+        self.values = np.array(
+            [[float(row[field]) for field in NUTRIENT_FIELDS] for row in rows],
+            dtype=np.float32
+        )
+        self.serving_g = np.array([float(row['serving_g']) for row in rows], dtype=np.float32)
+        self.category_codes = np.array(
+            [CATEGORIES.index(row['category']) for row in rows], dtype=np.int8
+        )
+        self.meal_mask = np.array(
+            [sum(MEAL_BITS[m] for m in row['meals'].split(';') if m) for row in rows],
+            dtype=np.uint8
+        )
+
+        # key (space-joined normalized tokens) -> row index
+        self._exact = {}
+        # token -> list of (alias id, row index, alias token count)
+        self._tokens = {}
+        alias_id = 0
+        for idx, row in enumerate(rows):
+            aliases = [row['name']] + [a for a in row['aliases'].split(';') if a]
+            for alias in aliases:
+                tokens = normalize_name(alias)
+                if not tokens:
+                    continue
+                key = ' '.join(tokens)
+                self._exact.setdefault(key, idx)
+                unique = set(tokens)
+                for token in unique:
+                    self._tokens.setdefault(token, []).append((alias_id, idx, len(unique)))
+                alias_id += 1
+
+        # Sorted keys for prefix search with bisect
+        self._sorted_keys = sorted(self._exact)
+        self._vocabulary = list(self._tokens)
+
+    def __len__(self):
+        return len(self.names)
+
+    def category(self, idx):
+        return CATEGORIES[self.category_codes[idx]]
+
+    def prefix(self, prefix, limit=10):
+        """Return row indexes whose name or alias starts with the given prefix"""
+        key = ' '.join(normalize_name(prefix))
+        if not key:
+            return []
+        results = []
+        start = bisect.bisect_left(self._sorted_keys, key)
+        for candidate in self._sorted_keys[start:]:
+            if not candidate.startswith(key):
+                break
+            idx = self._exact[candidate]
+            if idx not in results:
+                results.append(idx)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def match(self, query):
+        """
+        Resolve a free-text food name to a row index.
+
+        Tries an exact alias match first, then scores rows by token overlap
+        (correcting misspelt tokens against the vocabulary). Query words the
+        table does not know lower the score, and a dish whose last word (its
+        head noun: "apple pie", "chocolate milkshake") is unknown does not
+        match at all rather than resolving to one of its ingredients.
+
+        Returns:
+            tuple: (row index, score between 0 and 1) or None if nothing matched
+        """
+        tokens = normalize_name(query)
+        if not tokens:
+            return None
+        key = ' '.join(tokens)
+        if key in self._exact:
+            return self._exact[key], 1.0
+
+        # token -> position of its first occurrence in the query
+        query_tokens = {}
+        for position, token in enumerate(tokens):
+            if token not in self._tokens:
+                close = difflib.get_close_matches(token, self._vocabulary, n=1, cutoff=0.85)
+                if not close:
+                    if position == len(tokens) - 1:
+                        return None
+                    continue
+                token = close[0]
+            query_tokens.setdefault(token, position)
+        if not query_tokens:
+            return None
+
+        # Count overlapping tokens per alias, remembering the earliest query position
+        overlaps = {}
+        for token, position in query_tokens.items():
+            for entry in self._tokens[token]:
+                count, first = overlaps.get(entry, (0, position))
+                overlaps[entry] = (count + 1, min(first, position))
+
+        best = None
+        for (_, idx, key_len), (overlap, first) in overlaps.items():
+            # Share of the alias covered, damped by how much of the whole query
+            # (unknown words included) is explained
+            score = (overlap / key_len) * (overlap / len(tokens)) ** 0.5
+            # On ties prefer the food named first ("burger with fries" is a burger)
+            candidate = (score, -first, -idx)
+            if best is None or candidate > best:
+                best = candidate
+
+        if best and best[0] >= MATCH_CUTOFF:
+            return -best[2], round(best[0], 3)
+        return None
+
+    def nutrients(self, idx, grams=None):
+        """Return the nutrients of a row scaled to a portion (defaults to one serving)"""
+        if grams is None:
+            grams = float(self.serving_g[idx])
+        scaled = self.values[idx] * (grams / 100.0)
+        result = {
+            'name': self.names[idx],
+            'category': self.category(idx),
+            'grams': round(float(grams), 1),
+        }
+        for field, value in zip(NUTRIENT_FIELDS, scaled):
+            result[field] = round(float(value), 1)
+        return result
+
+    def totals(self, indexes, grams):
+        """Sum nutrients over many portions in one vectorized step"""
+        indexes = np.asarray(indexes, dtype=np.intp)
+        grams = np.asarray(grams, dtype=np.float32)
+        if indexes.size == 0:
+            return dict.fromkeys(NUTRIENT_FIELDS, 0.0)
+        summed = (grams / 100.0) @ self.values[indexes]
+        return {field: round(float(value), 1) for field, value in zip(NUTRIENT_FIELDS, summed)}
+
+
+def load_table(path=DATA_PATH):
+    """Load a nutrient CSV file into a NutrientTable"""
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    return NutrientTable(rows)
+
+
+@lru_cache(maxsize=1)
+def get_table():
+    """Return the process-wide nutrient table, loading it on first use"""
+    return load_table()
+
+
+@lru_cache(maxsize=4096)
+def _match_cached(food_name):
+    return get_table().match(food_name)
+
+
+def lookup(food_name, grams=None):
+    """
+    Look up reference nutrients for a food name.
+
+    Args:
+        food_name (str): Free-text food name (e.g. from Gemini)
+        grams (float): Portion size; defaults to the food's typical serving
+
+    Returns:
+        dict: Scaled nutrients plus the match score, or None if not found
+    """
+    if not food_name:
+        return None
+    match = _match_cached(food_name.strip()[:200])
+    if match is None:
+        return None
+    idx, score = match
+    result = get_table().nutrients(idx, grams)
+    result['match_score'] = score
+    return result
+
+
+def search(prefix, limit=10):
+    """Return canonical food names starting with the given prefix"""
+    table = get_table()
+    return [table.names[idx] for idx in table.prefix(prefix, limit)]
+
+
+def daily_totals(entries):
+    """
+    Total the nutrients of a day's meals.
+
+    Args:
+        entries (iterable): (food_name, grams) pairs; grams may be None for one serving
+
+    Returns:
+        dict: Summed nutrients plus the names that could not be matched
+    """
+    table = get_table()
+    indexes, grams, unmatched = [], [], []
+    for food_name, portion in entries:
+        match = _match_cached(food_name.strip()[:200]) if food_name else None
+        if match is None:
+            unmatched.append(food_name)
+            continue
+        indexes.append(match[0])
+        grams.append(table.serving_g[match[0]] if portion is None else portion)
+    totals = table.totals(indexes, grams)
+    totals['unmatched'] = unmatched
+    return totals
@@ -0,0 +1,190 @@
+"""
+Password hashing service.
+
+- algorithm and cost: PASSWORD_HASH_METHOD, in Werkzeug's method syntax
+  ('scrypt:32768:8:1', 'pbkdf2:sha256:600000', ...); new hashes always
+  use it. calibrate() picks a cost that takes about a given time on this
+  machine (see benchmarks/bench_password_hash.py).
+- rehash on login: verify() also returns a fresh hash when the stored one
+  was made with another method or cost, so raising (or lowering) the cost
+  upgrades each account the next time its owner logs in.
+- bounded queue: at most PASSWORD_HASH_QUEUE hashes may run at once on
+  the host, across all gunicorn workers. Slots are lock files in
+  PASSWORD_HASH_SLOT_DIR (flock, released by the kernel if a worker
+  dies); a request that cannot get one within PASSWORD_HASH_WAIT seconds
+  gets HashingBusy instead of piling more work on a saturated CPU. Without
+  fcntl (Windows) the limit is per process.
+- pool: hashing runs on a pool of PASSWORD_HASH_WORKERS threads or, with
+  PASSWORD_HASH_POOL=process, worker processes. hashlib releases the GIL,
+  so with threaded workers (gunicorn --worker-class gthread) other request
+  threads keep running during a hash. With the default sync workers each
+  process serves one request at a time and the pool only hands the work
+  over; the host-wide queue limit is what bounds hashing there.
+"""
+
+# Standard library imports
+import os
+import time
+import random
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Third-party imports
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Local imports
+import metrics
+import structured_logging
+
+METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', '16'))
+
+POOL_KIND = os.getenv('PASSWORD_HASH_POOL', 'thread').lower()
+WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Hashes running at once, across all workers on the host
+QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE', str((os.cpu_count() or 1) * 2)))
+SLOT_DIR = os.getenv('PASSWORD_HASH_SLOT_DIR', os.path.join(tempfile.gettempdir(), 'food_insight_password_slots'))
+
+# Seconds a request waits for a queue slot before HashingBusy
+WAIT_SECONDS = float(os.getenv('PASSWORD_HASH_WAIT', '2.0'))
+
+# Pause between rounds of trying every slot
+SLOT_POLL_SECONDS = 0.01
+
+logger = structured_logging.get_logger('passwords')
+
+# Per-process fallback when lock files are unavailable
+_local_slots = threading.BoundedSemaphore(QUEUE_LIMIT)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class HashingBusy(RuntimeError):
+    """Too many password hashes in flight; the caller should answer 503"""
+
+
+def _executor():
+    # Created lazily and again after a fork (gunicorn preload), since
+    # pool threads/processes do not survive into the child
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if POOL_KIND == 'process':
+                _pool = ProcessPoolExecutor(max_workers=WORKERS)
+            else:
+                _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hash')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _acquire_slot():
+    """A held queue slot, or None if none freed up within WAIT_SECONDS"""
+    if fcntl is None:
+        return _local_slots if _local_slots.acquire(timeout=WAIT_SECONDS) else None
+    os.makedirs(SLOT_DIR, exist_ok=True)
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        # Start at a random slot so waiting workers do not all probe slot 0 first
+        first = random.randrange(QUEUE_LIMIT)
+        for index in range(QUEUE_LIMIT):
+            slot = open(os.path.join(SLOT_DIR, f'slot-{(first + index) % QUEUE_LIMIT}'), 'a')
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except BlockingIOError:
+                slot.close()
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(SLOT_POLL_SECONDS)
+
+
+def _release_slot(slot):
+    if slot is _local_slots:
+        _local_slots.release()
+    else:
+        # Closing the file drops its lock
+        slot.close()
+
+
+def _run(func, *args):
+    slot = _acquire_slot()
+    if slot is None:
+        metrics.inc('password_hash_rejected_total')
+        logger.warning("Password hashing queue full", extra={'queue_limit': QUEUE_LIMIT})
+        raise HashingBusy("Password hashing queue is full")
+    start = time.perf_counter()
+    try:
+        return _executor().submit(func, *args).result()
+    finally:
+        _release_slot(slot)
+        metrics.observe('password_hash_seconds', time.perf_counter() - start)
+
+
+def hash_password(password, method=None):
+    """Hash a new password with the configured method (raises HashingBusy)"""
+    return _run(generate_password_hash, password, method or METHOD, SALT_LENGTH)
+
+
+def stored_method(password_hash):
+    """Method and cost of a stored hash, e.g. 'scrypt:32768:8:1'"""
+    return (password_hash or '').split('$', 1)[0]
+
+
+def needs_rehash(password_hash, method=None):
+    return stored_method(password_hash) != (method or METHOD)
+
+
+def verify(password_hash, password):
+    """
+    Check a password against a stored hash (raises HashingBusy).
+
+    Returns:
+        tuple: (matches, new_hash); new_hash is set when the password
+        matched and the stored hash should be replaced by one made with
+        the configured method (skipped when the hashing queue is full)
+    """
+    if not password_hash:
+        return False, None
+    if not _run(check_password_hash, password_hash, password):
+        return False, None
+    if needs_rehash(password_hash):
+        try:
+            return True, hash_password(password)
+        except HashingBusy:
+            # The password is correct; the upgrade can wait for a later login
+            return True, None
+    return True, None
+
+
+def calibrate(algorithm='scrypt', target_seconds=0.25, password='calibration-password'):
+    """
+    The cheapest method string of an algorithm whose hash takes at least
+    target_seconds here (scrypt doubles N, pbkdf2 doubles iterations).
+    """
+    if algorithm == 'scrypt':
+        n = 2 ** 12
+        while True:
+            method = f'scrypt:{n}:8:1'
+            start = time.perf_counter()
+            generate_password_hash(password, method)
+            if time.perf_counter() - start >= target_seconds or n >= 2 ** 20:
+                return method
+            n *= 2
+    if algorithm == 'pbkdf2':
+        iterations = 50000
+        while True:
+            method = f'pbkdf2:sha256:{iterations}'
+            start = time.perf_counter()
+            generate_password_hash(password, method)
+            if time.perf_counter() - start >= target_seconds or iterations >= 10 ** 7:
+                return method
+            iterations *= 2
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
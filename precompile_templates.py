@@ -0,0 +1,42 @@
+"""
+Script to compile every template into the shared Jinja bytecode cache.
+
+Run it at deploy (before starting gunicorn) so workers load compiled
+templates instead of compiling them on their first requests:
+
+    python precompile_templates.py && gunicorn app:app
+"""
+
+from app import app
+import template_cache
+
+
+def precompile_templates():
+    """Fill the bytecode cache"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print(f"PRECOMPILING TEMPLATES INTO {template_cache.cache_dir(app)}")
+            print("="*60)
+
+            compiled, failed = template_cache.precompile(app)
+            for name in compiled:
+                print(f"  ✓ {name}")
+            for name in failed:
+                print(f"  ❌ {name}")
+
+            print(f"\n✓ Compiled {len(compiled)} templates" + (f", {len(failed)} failed" if failed else ""))
+            if failed:
+                raise SystemExit(1)
+
+        except SystemExit:
+            raise
+        except Exception as e:
+            print(f"\n❌ Error precompiling templates: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    precompile_templates()
@@ -0,0 +1,242 @@
+"""
+Opt-in request profiling.
+
+Enabled with PROFILE_REQUESTS=1; when disabled, span() returns a shared
+no-op context manager and no hooks or threads are installed.
+
+- span(name): times a phase of a request (file save, Gemini call, DB commit,
+  rendering...). Spans are sent in a Server-Timing header.
+- a single background sampler thread records the call stack of every
+  in-flight request thread every PROFILE_SAMPLE_INTERVAL seconds
+- requests slower than SLOW_REQUEST_THRESHOLD are dumped as JSON (spans plus
+  folded stacks) to PROFILE_DIR; only the newest MAX_DUMPS are kept.
+  The admin panel lists them at /admin/profiles.
+"""
+
+# Standard library imports
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import threading
+from contextlib import nullcontext
+from collections import Counter
+
+# Third-party imports
+from flask import g, request
+
+PROFILING_ENABLED = os.getenv('PROFILE_REQUESTS', '0').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'food_insight_profiles'))
+
+# Requests taking longer than this many seconds are dumped
+SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', '2.0'))
+
+# Seconds between stack samples of in-flight requests
+SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+
+MAX_DUMPS = int(os.getenv('PROFILE_MAX_DUMPS', '50'))
+
+# Frames deeper than this are cut from sampled stacks
+MAX_STACK_DEPTH = 64
+
+_DUMP_NAME_RE = re.compile(r'^[0-9]+-[0-9a-zA-Z_.-]+\.json$')
+_UNSAFE_NAME_RE = re.compile(r'[^0-9a-zA-Z_-]')
+
+_NULL_SPAN = nullcontext()
+
+# thread id -> Counter of folded stacks for requests being sampled
+_active = {}
+_active_lock = threading.Lock()
+_sampler = None
+
+
+class _Span:
+    __slots__ = ('name', 'spans', 'start')
+
+    def __init__(self, name, spans):
+        self.name = name
+        self.spans = spans
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+def span(name):
+    """
+    Time a phase of the current request.
+
+    Usage:
+        with profiling.span('gemini'):
+            response = requests.post(...)
+    """
+    if not PROFILING_ENABLED:
+        return _NULL_SPAN
+    spans = g.get('_profile_spans')
+    if spans is None:
+        return _NULL_SPAN
+    return _Span(name, spans)
+
+
+# Sampling profiler
+
+def _fold(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _sample_loop():
+    while True:
+        time.sleep(SAMPLE_INTERVAL)
+        with _active_lock:
+            if not _active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, stacks in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    stacks[_fold(frame)] += 1
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None or not _sampler.is_alive():
+        _sampler = threading.Thread(target=_sample_loop, name='profile-sampler', daemon=True)
+        _sampler.start()
+
+
+# Dumps
+
+def _prune_dumps():
+    dumps = list_dumps()
+    for dump in dumps[MAX_DUMPS:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, dump['name']))
+        except OSError:
+            pass
+
+
+def _write_dump(profile):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        # The request id can come from a client header: keep it filename-safe
+        request_id = _UNSAFE_NAME_RE.sub('', profile['request_id'])[:64] or 'request'
+        name = f"{int(profile['started'] * 1000)}-{request_id}.json"
+        path = os.path.join(PROFILE_DIR, name)
+        with open(f'{path}.tmp', 'w') as dump_file:
+            json.dump(profile, dump_file)
+        os.replace(f'{path}.tmp', path)
+        _prune_dumps()
+    except OSError:
+        pass
+
+
+def list_dumps():
+    """Saved slow-request profiles, newest first (summary fields only)"""
+    try:
+        names = sorted((n for n in os.listdir(PROFILE_DIR) if _DUMP_NAME_RE.match(n)), reverse=True)
+    except OSError:
+        return []
+    dumps = []
+    for name in names:
+        profile = load_dump(name)
+        if profile:
+            dumps.append({
+                'name': name,
+                'captured': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(profile['started'])),
+                'method': profile['method'],
+                'path': profile['path'],
+                'status': profile['status'],
+                'duration': profile['duration'],
+                'samples': profile['samples'],
+            })
+    return dumps
+
+
+def load_dump(name):
+    """Load one saved profile by file name, or None if it is missing or invalid"""
+    if not _DUMP_NAME_RE.match(name):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, name)) as dump_file:
+            return json.load(dump_file)
+    except (OSError, ValueError):
+        return None
+
+
+def top_frames(profile, limit=25):
+    """Functions by inclusive sample count: [(frame, samples, percent)]"""
+    inclusive = Counter()
+    for stack, count in profile['stacks'].items():
+        for frame in set(stack.split(';')):
+            inclusive[frame] += count
+    total = profile['samples'] or 1
+    return [(frame, count, 100.0 * count / total) for frame, count in inclusive.most_common(limit)]
+
+
+# Flask hooks
+
+def _start_profile():
+    g._profile_start = time.perf_counter()
+    g._profile_started = time.time()
+    g._profile_spans = []
+    stacks = g._profile_stacks = Counter()
+    with _active_lock:
+        _active[threading.get_ident()] = stacks
+
+
+def _finish_profile(response):
+    start = g.pop('_profile_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    with _active_lock:
+        _active.pop(threading.get_ident(), None)
+    spans = g.pop('_profile_spans', [])
+    stacks = g.pop('_profile_stacks', Counter())
+
+    if spans:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' for name, seconds in spans
+        )
+    if duration >= SLOW_REQUEST_THRESHOLD:
+        _write_dump({
+            'started': g.pop('_profile_started', time.time()),
+            'request_id': g.get('request_id', 'unknown'),
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration': duration,
+            'spans': spans,
+            'samples': sum(stacks.values()),
+            'sample_interval': SAMPLE_INTERVAL,
+            'stacks': dict(stacks),
+        })
+    return response
+
+
+def _teardown(exc):
+    # Requests that raised never reach after_request
+    with _active_lock:
+        _active.pop(threading.get_ident(), None)
+
+
+def init_app(app):
+    """Install the profiling hooks if PROFILE_REQUESTS is set"""
+    if not PROFILING_ENABLED:
+        return
+    _ensure_sampler()
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_teardown)
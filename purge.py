@@ -0,0 +1,320 @@
+"""
+Chunked account purge engine.
+
+Deletes users and everything that belongs to them (health data, nutrition
+rollups, OTPs, reset tokens and uploaded images) in small batches, each
+in its own short transaction, so large purges never hold long locks:
+
+- purge_users(): chunked deletes for a list of users, or for everyone
+- estimate_counts(): what a purge would remove; for whole-table purges the
+  counts are planner/rowid estimates, so dry runs stay instant
+- orphan_uploads() / delete_orphan_uploads(): image files in the upload
+  folder (at any shard depth, see uploads.py) that no HealthData row
+  references; also run periodically by the upload collector
+- start_background(): run a purge on a daemon thread so admin requests
+  return immediately (job status in recent_jobs(), per worker process)
+
+Children are deleted explicitly before their users; the ON DELETE CASCADE
+foreign keys in the schema are the safety net for anything missed. Every
+batch is committed, so an interrupted purge can simply be run again.
+"""
+
+# Standard library imports
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+# Third-party imports
+from sqlalchemy import select, delete, func, text
+
+# Local imports
+import uploads
+import structured_logging
+
+# Model classes the purge works on (passed in by the caller)
+PurgeModels = namedtuple('PurgeModels', 'User HealthData NutritionRollup PasswordReset EmailVerification')
+
+# Rows deleted per transaction, and users handled per outer batch
+BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', '500'))
+
+# Admin deletions run on a background thread unless PURGE_BACKGROUND=0
+BACKGROUND = os.getenv('PURGE_BACKGROUND', '1').lower() in ('1', 'true', 'yes')
+
+# Uploads newer than this are never treated as orphans (their row may not be committed yet)
+ORPHAN_GRACE_SECONDS = int(os.getenv('PURGE_ORPHAN_GRACE_SECONDS', '3600'))
+
+# Finished jobs kept for the admin dashboard
+MAX_JOBS = 20
+
+UPLOAD_KEEP = frozenset({'.gitkeep'})
+
+logger = structured_logging.get_logger('purge')
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+# Counting
+
+def _estimate_table(session, model):
+    """Fast row estimate for a whole table"""
+    table = model.__table__
+    dialect = session.get_bind(clause=select(model)).dialect.name
+    if dialect == 'postgresql':
+        estimate = session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)'),
+            {'name': f'"{table.name}"'}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    elif dialect == 'sqlite':
+        # Id range via the primary key index: an upper bound, O(log n)
+        low, high = session.execute(select(func.min(table.c.id), func.max(table.c.id))).one()
+        return 0 if high is None else high - low + 1
+    return session.execute(select(func.count()).select_from(table)).scalar()
+
+
+def estimate_counts(session, models, user_ids=None):
+    """
+    Rows a purge would delete, per table.
+
+    For specific users the counts are exact (indexed lookups); for a
+    full purge they are estimates (see _estimate_table).
+
+    Returns:
+        dict: table name -> row count, plus 'estimated' (bool)
+    """
+    m = models
+    if user_ids is None:
+        counts = {model.__tablename__: _estimate_table(session, model) for model in m}
+        counts['estimated'] = True
+        return counts
+
+    user_ids = list(user_ids)
+    emails = select(m.User.email).where(m.User.id.in_(user_ids)).scalar_subquery()
+
+    def count(model, condition):
+        return session.execute(select(func.count()).select_from(model).where(condition)).scalar()
+
+    return {
+        m.User.__tablename__: count(m.User, m.User.id.in_(user_ids)),
+        m.HealthData.__tablename__: count(m.HealthData, m.HealthData.user_id.in_(user_ids)),
+        m.NutritionRollup.__tablename__: count(m.NutritionRollup, m.NutritionRollup.user_id.in_(user_ids)),
+        m.PasswordReset.__tablename__: count(m.PasswordReset, m.PasswordReset.email.in_(emails)),
+        m.EmailVerification.__tablename__: count(m.EmailVerification, m.EmailVerification.email.in_(emails)),
+        'estimated': False,
+    }
+
+
+# Deleting
+
+def _remove_upload(upload_folder, filename):
+    """Delete one uploaded image; returns its size, or None if nothing was removed"""
+    path = uploads.locate(upload_folder, filename)
+    if path is None:
+        return None
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return None
+
+
+def _delete_in_chunks(session, model, condition, batch_size, on_rows=None):
+    """Delete matching rows batch by batch (one commit per batch); returns rows deleted"""
+    columns = [model.id] + ([model.food_image] if on_rows else [])
+    deleted = 0
+    while True:
+        rows = session.execute(select(*columns).where(condition).order_by(model.id).limit(batch_size)).all()
+        if not rows:
+            return deleted
+        session.execute(delete(model).where(model.id.in_([row.id for row in rows])))
+        session.commit()
+        deleted += len(rows)
+        if on_rows:
+            on_rows(rows)
+
+
+def _user_batches(session, User, user_ids, batch_size):
+    if user_ids is not None:
+        ids = sorted(set(user_ids))
+        for start in range(0, len(ids), batch_size):
+            yield ids[start:start + batch_size]
+        return
+    last_id = 0
+    while True:
+        ids = session.execute(
+            select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def purge_users(session, models, user_ids=None, upload_folder=None, batch_size=BATCH_SIZE,
+                dry_run=False, progress=None):
+    """
+    Delete users and all their data in batches.
+
+    Args:
+        user_ids (list): Users to delete; None deletes every user plus all
+            pending OTPs and reset tokens
+        upload_folder (str): Where food images live; their files are removed
+            after the rows referencing them are committed
+        dry_run (bool): Only return estimate_counts()
+        progress (callable): progress(table_name, rows_deleted_so_far)
+
+    Returns:
+        dict: rows deleted per table, plus 'files' and 'bytes' for uploads
+    """
+    if dry_run:
+        return estimate_counts(session, models, user_ids)
+
+    m = models
+    totals = dict.fromkeys((model.__tablename__ for model in m), 0)
+    totals.update(files=0, bytes=0)
+
+    def report(model, count):
+        totals[model.__tablename__] += count
+        if progress:
+            progress(model.__tablename__, totals[model.__tablename__])
+
+    def remove_files(rows):
+        for row in rows:
+            size = _remove_upload(upload_folder, row.food_image)
+            if size is not None:
+                totals['files'] += 1
+                totals['bytes'] += size
+
+    for batch in _user_batches(session, m.User, user_ids, batch_size):
+        emails = session.execute(select(m.User.email).where(m.User.id.in_(batch))).scalars().all()
+
+        report(m.HealthData, _delete_in_chunks(
+            session, m.HealthData, m.HealthData.user_id.in_(batch), batch_size, on_rows=remove_files))
+        report(m.NutritionRollup, _delete_in_chunks(
+            session, m.NutritionRollup, m.NutritionRollup.user_id.in_(batch), batch_size))
+        report(m.EmailVerification, _delete_in_chunks(
+            session, m.EmailVerification, m.EmailVerification.email.in_(emails), batch_size))
+        report(m.PasswordReset, _delete_in_chunks(
+            session, m.PasswordReset, m.PasswordReset.email.in_(emails), batch_size))
+
+        result = session.execute(delete(m.User).where(m.User.id.in_(batch)))
+        session.commit()
+        report(m.User, result.rowcount)
+
+    if user_ids is None:
+        # Pending registrations and stray tokens not tied to any user
+        report(m.EmailVerification, _delete_in_chunks(session, m.EmailVerification, m.EmailVerification.id > 0, batch_size))
+        report(m.PasswordReset, _delete_in_chunks(session, m.PasswordReset, m.PasswordReset.id > 0, batch_size))
+
+    return totals
+
+
+# Orphaned uploads
+
+def orphan_uploads(session, HealthData, upload_folder, grace_seconds=ORPHAN_GRACE_SECONDS, batch_size=BATCH_SIZE):
+    """
+    Yield (path, size) for files in upload_folder (and its shard
+    directories) that no HealthData row references. Files are streamed
+    with uploads.iter_files() and checked against the database batch by
+    batch, so memory stays bounded by batch_size.
+    """
+    cutoff = time.time() - grace_seconds
+
+    def check(chunk):
+        names = [entry.name for entry in chunk]
+        referenced = set(session.execute(
+            select(HealthData.food_image).where(HealthData.food_image.in_(names))
+        ).scalars())
+        # End the read transaction between batches (long walks must not pin a snapshot)
+        session.rollback()
+        for entry in chunk:
+            if entry.name not in referenced:
+                yield entry.path, entry.stat().st_size
+
+    chunk = []
+    for entry in uploads.iter_files(upload_folder):
+        try:
+            if entry.name in UPLOAD_KEEP or entry.stat().st_mtime > cutoff:
+                continue
+        except OSError:
+            continue
+        chunk.append(entry)
+        if len(chunk) >= batch_size:
+            yield from check(chunk)
+            chunk = []
+    if chunk:
+        yield from check(chunk)
+
+
+def delete_orphan_uploads(session, HealthData, upload_folder, dry_run=False,
+                          grace_seconds=ORPHAN_GRACE_SECONDS, progress=None):
+    """
+    Remove orphaned upload files (or just count them with dry_run).
+
+    Returns:
+        dict: 'files' and 'bytes' found (and deleted unless dry_run)
+    """
+    totals = {'files': 0, 'bytes': 0}
+    for path, size in orphan_uploads(session, HealthData, upload_folder, grace_seconds):
+        if not dry_run:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        totals['files'] += 1
+        totals['bytes'] += size
+        if progress and totals['files'] % 100 == 0:
+            progress('uploads', totals['files'])
+    return totals
+
+
+# Background jobs
+
+def start_background(app, description, purge_func, *args, **kwargs):
+    """
+    Run purge_func(*args, progress=..., **kwargs) on a daemon thread inside
+    an app context and return the job id immediately.
+    """
+    job = {
+        'id': uuid.uuid4().hex[:8],
+        'description': description,
+        'status': 'running',
+        'started': datetime.utcnow(),
+        'finished': None,
+        'progress': {},
+        'result': None,
+        'error': None,
+    }
+
+    def run():
+        with app.app_context():
+            try:
+                job['result'] = purge_func(*args, progress=job['progress'].__setitem__, **kwargs)
+                job['status'] = 'done'
+                logger.info("Background purge finished", extra={'job': job['id'], 'description': description,
+                                                                 'result': job['result']})
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+                logger.exception("Background purge failed: %s", e, extra={'job': job['id']})
+            finally:
+                job['finished'] = datetime.utcnow()
+
+    with _jobs_lock:
+        _jobs[job['id']] = job
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+    threading.Thread(target=run, name=f"purge-{job['id']}", daemon=True).start()
+    return job['id']
+
+
+def recent_jobs():
+    """Background purge jobs of this worker process, newest first"""
+    with _jobs_lock:
+        return list(reversed(_jobs.values()))
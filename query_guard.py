@@ -0,0 +1,179 @@
+"""
+Per-request SQL statement budgets and N+1 detection.
+
+- every statement run during a request is counted; a route that runs more
+  than its budget (set with @query_guard.budget(n), else DEFAULT_BUDGET)
+  is reported
+- the same SQL executed N_PLUS_ONE_THRESHOLD or more times in one request
+  is reported as a likely N+1 pattern
+- relationship or deferred-column loads triggered while a template is
+  rendering are reported with the template and attribute that caused them
+
+QUERY_GUARD=warn (default) logs a warning once the response is ready.
+QUERY_GUARD=raise (for benchmarks and tests) raises QueryBudgetExceeded
+from the statement that crosses a limit, before it runs, so the view is
+aborted and its session rolled back instead of committing and then
+answering 500. QUERY_GUARD=off installs nothing. In warn/raise mode
+responses carry an X-Query-Count header.
+"""
+
+# Standard library imports
+import os
+import functools
+from collections import Counter
+
+# Third-party imports
+from flask import g, request, current_app, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Local imports
+import structured_logging
+
+QUERY_GUARD_MODE = os.getenv('QUERY_GUARD', 'warn').lower()
+
+DEFAULT_BUDGET = int(os.getenv('QUERY_BUDGET', '20'))
+
+# Identical statements per request at which an N+1 pattern is reported
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
+
+logger = structured_logging.get_logger('query_guard')
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A request broke its query budget, repeated a statement or lazy-loaded from a template"""
+
+
+def budget(max_queries):
+    """
+    Set the statement budget of a view.
+
+    Usage:
+        @app.route('/admin/dashboard')
+        @query_guard.budget(6)
+        def admin_dashboard(): ...
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+# SQLAlchemy hooks
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or '_query_guard' not in g:
+        return
+    state = g._query_guard
+    statements = state['statements']
+    statements[statement] += 1
+    state['total'] += 1
+    if QUERY_GUARD_MODE != 'raise':
+        return
+    if state['total'] > state['budget']:
+        _abort(_over_budget(state['total'], state['budget']))
+    if statements[statement] == N_PLUS_ONE_THRESHOLD:
+        _abort(_repeated(statement, N_PLUS_ONE_THRESHOLD))
+
+
+def _check_lazy_load(orm_execute_state):
+    if not has_request_context() or '_query_guard' not in g:
+        return
+    template = g.get('_query_guard_template')
+    if template is None:
+        return
+    if orm_execute_state.is_relationship_load or orm_execute_state.is_column_load:
+        lazy_load = (template, _describe_path(orm_execute_state.loader_strategy_path))
+        if QUERY_GUARD_MODE == 'raise':
+            _abort(_lazy_loaded(*lazy_load))
+        g._query_guard['lazy_loads'].append(lazy_load)
+
+
+def _describe_path(path):
+    # Loader path such as (User mapper, User.health_data) -> 'User.health_data'
+    if path is None or not len(path):
+        return 'unknown attribute'
+    last = path[-1]
+    return str(getattr(last, 'class_attribute', last))
+
+
+# Problem descriptions
+
+def _over_budget(total, limit):
+    return f'{total} queries (budget {limit})'
+
+
+def _repeated(statement, count):
+    return f'possible N+1: {count}x {" ".join(statement.split())[:200]}'
+
+
+def _lazy_loaded(template, attribute):
+    return f'lazy load of {attribute} while rendering {template}'
+
+
+def _abort(problem):
+    raise QueryBudgetExceeded(f"{request.endpoint}: {problem}")
+
+
+# Flask hooks
+
+def _start_request():
+    view = current_app.view_functions.get(request.endpoint)
+    g._query_guard = {
+        'statements': Counter(),
+        'total': 0,
+        'budget': getattr(view, 'query_budget', DEFAULT_BUDGET),
+        'lazy_loads': [],
+    }
+
+
+def _template_started(sender, template, context, **extra):
+    g._query_guard_template = template.name or '<string>'
+
+
+def _template_finished(sender, template, context, **extra):
+    g.pop('_query_guard_template', None)
+
+
+def _check_request(response):
+    state = g.pop('_query_guard', None)
+    if state is None:
+        return response
+    total = state['total']
+    response.headers['X-Query-Count'] = str(total)
+    # In raise mode any problem has already aborted the request
+    if QUERY_GUARD_MODE == 'raise':
+        return response
+
+    limit = state['budget']
+    problems = []
+    if total > limit:
+        problems.append(_over_budget(total, limit))
+    for statement, count in state['statements'].most_common():
+        if count < N_PLUS_ONE_THRESHOLD:
+            break
+        problems.append(_repeated(statement, count))
+    for template, attribute in dict.fromkeys(state['lazy_loads']):
+        problems.append(_lazy_loaded(template, attribute))
+
+    if problems:
+        details = {'endpoint': request.endpoint, 'queries': total, 'budget': limit, 'problems': problems}
+        logger.warning("Query guard: %s", '; '.join(problems), extra=details)
+    return response
+
+
+def init_app(app):
+    """Install statement counting and the per-request checks (unless QUERY_GUARD=off)"""
+    if QUERY_GUARD_MODE == 'off':
+        return
+    app.before_request(_start_request)
+    app.after_request(_check_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+        event.listen(Session, 'do_orm_execute', _check_lazy_load)
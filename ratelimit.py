@@ -0,0 +1,236 @@
+"""
+Sliding-window attempt limiting for the login and OTP views.
+
+    @app.route('/login', methods=['GET', 'POST'])
+    @ratelimit.limit('login')
+    def login(): ...
+
+Every POST to a limited view counts one attempt against the client IP and
+against the submitted email address. Each rule allows LIMIT attempts per
+WINDOW seconds, per key, using a sliding-window counter: the count of the
+current fixed window plus the previous window's count weighted by how much
+of it still overlaps the sliding window. Only one counter per key and
+window is stored, however many attempts are made.
+
+Counters live in a small SQLite database (RATE_LIMIT_DB, WAL mode) that all
+gunicorn workers on the host share, so limits hold across workers.
+RATE_LIMIT_BACKEND=memory keeps them per process instead (single worker,
+development); RATE_LIMIT_BACKEND=off disables limiting.
+
+Rejected attempts get a plain 429 with Retry-After before the view runs, so
+no app database query, password hash or CAPTCHA render is spent on them.
+If the counter store fails, requests are let through (and a warning is
+logged) rather than locking everybody out.
+
+Limits can be overridden per rule and key type, as "<attempts>/<seconds>":
+RATE_LIMIT_LOGIN_IP=50/60, RATE_LIMIT_VERIFY_OTP_EMAIL=5/600, ...
+Behind a reverse proxy, apply Werkzeug's ProxyFix so request.remote_addr
+is the client address.
+"""
+
+# Standard library imports
+import os
+import math
+import time
+import random
+import sqlite3
+import tempfile
+import functools
+import threading
+
+# Third-party imports
+from flask import request, session, Response
+
+# Local imports
+import metrics
+import structured_logging
+
+BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite').lower()
+DB_PATH = os.getenv('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'food_insight_ratelimit.db'))
+
+# Fraction of hits that also delete counters of windows that can no longer matter
+CLEANUP_PROBABILITY = 0.01
+
+# rule -> key type -> (attempts, window seconds)
+DEFAULT_RULES = {
+    'login': {'ip': (30, 60), 'email': (10, 300)},
+    'verify_otp': {'ip': (30, 60), 'email': (5, 600)},
+    'resend_otp': {'ip': (10, 600), 'email': (3, 600)},
+    'forgot_password': {'ip': (10, 600), 'email': (3, 600)},
+}
+
+logger = structured_logging.get_logger('ratelimit')
+
+
+def _parse_limit(value, default):
+    try:
+        attempts, seconds = value.split('/')
+        return int(attempts), int(seconds)
+    except (AttributeError, ValueError):
+        return default
+
+
+def _load_rules():
+    rules = {}
+    for rule, scopes in DEFAULT_RULES.items():
+        rules[rule] = {scope: _parse_limit(os.getenv(f'RATE_LIMIT_{rule.upper()}_{scope.upper()}'), default)
+                       for scope, default in scopes.items()}
+    return rules
+
+
+RULES = _load_rules()
+
+
+# Backends: hit() adds one attempt to a key of a namespace (rule and key
+# type) and returns the (current window, previous window) counts
+
+class MemoryBackend:
+    """Per-process counters"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def hit(self, namespace, key, window, now):
+        current = int(now // window)
+        with self._lock:
+            count = self._counts.get((namespace, key, current), 0) + 1
+            self._counts[(namespace, key, current)] = count
+            previous = self._counts.get((namespace, key, current - 1), 0)
+            if random.random() < CLEANUP_PROBABILITY:
+                for stale in [k for k in self._counts if k[0] == namespace and k[2] < current - 1]:
+                    del self._counts[stale]
+        return count, previous
+
+
+class SQLiteBackend:
+    """Counters shared by every process on the host through one SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Counters are disposable: losing the last writes in a crash is fine
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_counters ('
+                         'namespace TEXT NOT NULL, key TEXT NOT NULL, window INTEGER NOT NULL, '
+                         'count INTEGER NOT NULL, PRIMARY KEY (namespace, key, window)) WITHOUT ROWID')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def hit(self, namespace, key, window, now):
+        current = int(now // window)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(
+                'INSERT INTO rate_counters (namespace, key, window, count) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (namespace, key, window) DO UPDATE SET count = count + 1 RETURNING count',
+                (namespace, key, current)).fetchone()[0]
+            row = conn.execute('SELECT count FROM rate_counters WHERE namespace = ? AND key = ? AND window = ?',
+                               (namespace, key, current - 1)).fetchone()
+            if random.random() < CLEANUP_PROBABILITY:
+                conn.execute('DELETE FROM rate_counters WHERE namespace = ? AND window < ?', (namespace, current - 1))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return count, row[0] if row else 0
+
+
+def _estimate(count, previous, now, window):
+    """Attempts in the sliding window ending now"""
+    return count + previous * (1 - (now % window) / window)
+
+
+def _retry_after(count, previous, now, window, attempts):
+    """Seconds until one more attempt fits within the limit again"""
+    elapsed = (now % window) / window
+    if count < attempts:
+        # Still in this window, once enough of the previous one slid out
+        needed = 1 - (attempts - count - 1) / previous
+        return math.ceil((needed - elapsed) * window)
+    # In the next window, once enough of this one slid out
+    needed = 1 - (attempts - 1) / count if attempts > 1 else 1
+    return math.ceil((1 - elapsed + needed) * window)
+
+
+def _make_backend():
+    if BACKEND == 'off':
+        return None
+    if BACKEND == 'memory':
+        return MemoryBackend()
+    return SQLiteBackend(DB_PATH)
+
+
+_backend = _make_backend()
+
+
+def check(rule, keys_by_scope, now=None):
+    """
+    Count one attempt of a rule for each key.
+
+    Args:
+        keys_by_scope: {'ip': '203.0.113.9', 'email': 'a@b.c'}; empty keys are skipped
+
+    Returns:
+        int or None: seconds to wait if any key is over its limit, else None
+    """
+    if _backend is None:
+        return None
+    now = time.time() if now is None else now
+    retry_after = None
+    for scope, key in keys_by_scope.items():
+        if not key or scope not in RULES[rule]:
+            continue
+        attempts, window = RULES[rule][scope]
+        try:
+            count, previous = _backend.hit(f'{rule}:{scope}', key, window, now)
+        except sqlite3.Error as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            return None
+        if _estimate(count, previous, now, window) > attempts:
+            retry_after = max(retry_after or 0, _retry_after(count, previous, now, window, attempts), 1)
+    return retry_after
+
+
+def _form_email():
+    return request.form.get('email', '')
+
+
+def limit(rule, email=_form_email):
+    """
+    Limit POSTs to a view by client IP and email.
+
+    Args:
+        rule: key of RULES
+        email: callable returning the email the attempt is for
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'POST':
+                retry_after = check(rule, {
+                    'ip': request.remote_addr,
+                    'email': (email() or '').strip().lower(),
+                })
+                if retry_after is not None:
+                    metrics.inc('rate_limited_total', rule)
+                    logger.warning("Rate limited", extra={'rule': rule, 'ip': request.remote_addr})
+                    return Response(f'Too many attempts. Please try again in {retry_after} seconds.\n',
+                                    status=429, mimetype='text/plain',
+                                    headers={'Retry-After': str(retry_after)})
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def session_or_form_email():
+    """Email of a pending verification (session) or the submitted form"""
+    return session.get('verification_email') or request.form.get('email', '')
@@ -0,0 +1,43 @@
+"""
+Script to rebuild the per-user nutrition rollups from HealthData.
+
+Use this to backfill rollups for data recorded before the rollup table
+existed, or after changing the nutrient database.
+
+Usage:
+    python rebuild_rollups.py            # all users
+    python rebuild_rollups.py <user_id>  # one user
+"""
+
+from app import app, db, HealthData, NutritionRollup
+import rollups
+
+
+def rebuild_rollups(user_id=None):
+    """Recompute daily and weekly rollups"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print(f"REBUILDING NUTRITION ROLLUPS ({'user ' + str(user_id) if user_id else 'all users'})")
+            print("="*60)
+
+            written = rollups.rebuild(
+                db.session, HealthData, NutritionRollup,
+                user_id=user_id,
+                progress=lambda count: print(f"  ✓ Scanned {count} health data records")
+            )
+
+            print(f"\n✓ Wrote {written} rollup rows")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error rebuilding rollups: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    import sys
+
+    rebuild_rollups(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,46 @@
+"""
+Script to recompute stored health metrics for every HealthData row.
+
+This backfills the bmi and bmr columns (for rows created before they existed,
+or after a formula change) in batches, and prints the resulting cohort
+statistics.
+"""
+
+from app import app, db, User, HealthData
+import health_metrics
+
+
+def recompute_all(batch_size=health_metrics.BATCH_SIZE):
+    """Recompute BMI and BMR for all health data records"""
+    with app.app_context():
+        try:
+            print("="*60)
+            print("RECOMPUTING HEALTH METRICS")
+            print("="*60)
+
+            updated = health_metrics.recompute_health_metrics(
+                db.session, HealthData, User,
+                batch_size=batch_size,
+                progress=lambda count: print(f"  ✓ {count} records updated")
+            )
+            print(f"\n✓ Recomputed metrics for {updated} health data records")
+
+            print("\nCohort statistics:")
+            for cohort in health_metrics.cohort_stats(db.session, HealthData, User):
+                print(f"  {cohort['gender']:<8} {cohort['age_band']:<6} users={cohort['users']:<5} "
+                      f"avg BMI={cohort['avg_bmi']:<5} avg BMR={cohort['avg_bmr']:<5} "
+                      f"overweight={cohort['overweight_pct']}%")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ Error recomputing health metrics: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+
+if __name__ == '__main__':
+    import sys
+
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else health_metrics.BATCH_SIZE
+    recompute_all(batch_size)
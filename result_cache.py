@@ -0,0 +1,63 @@
+"""
+Cached result permalinks.
+
+/result/<id> renders a stored HealthData analysis. Rows never change after
+they are written, so a page is fully described by the row id, its
+timestamp and the deployed template/assets (VERSION):
+
+- etag() gives the ETag used for conditional requests (304 without
+  loading or rendering anything)
+- get()/put() keep rendered pages per worker, keyed by that ETag, so a
+  revisit costs one indexed lookup of (id, user_id, timestamp)
+
+Pages are sent with `Cache-Control: private` (health data must not be kept
+by shared caches) and a short max-age, RESULT_MAX_AGE seconds.
+"""
+
+# Standard library imports
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Local imports
+import assets
+
+CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '512'))
+MAX_AGE = int(os.getenv('RESULT_MAX_AGE', '600'))
+
+TEMPLATE = 'result.html'
+
+# Template source + asset manifest fingerprint, set by init_app()
+VERSION = ''
+
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+def etag(result_id, timestamp):
+    stamp = timestamp.isoformat() if timestamp else ''
+    return hashlib.sha1(f'{result_id}:{stamp}:{VERSION}'.encode('utf-8')).hexdigest()[:20]
+
+
+def get(key):
+    with _pages_lock:
+        if key in _pages:
+            _pages.move_to_end(key)
+            return _pages[key]
+    return None
+
+
+def put(key, html):
+    with _pages_lock:
+        _pages[key] = html
+        while len(_pages) > CACHE_SIZE:
+            _pages.popitem(last=False)
+
+
+def init_app(app):
+    """Fingerprint the result template and assets (call after assets.init_app)"""
+    global VERSION
+    source = app.jinja_env.loader.get_source(app.jinja_env, TEMPLATE)[0]
+    VERSION = hashlib.sha1((source + json.dumps(assets.load_manifest(app.static_folder), sort_keys=True)).encode('utf-8')).hexdigest()[:12]
@@ -0,0 +1,176 @@
+"""
+Per-user nutrition rollups.
+
+Daily and weekly calorie/macro totals are kept in the NutritionRollup table
+and updated incrementally in the same transaction that inserts a HealthData
+row, so charts read one row per day or week instead of scanning every meal.
+Meal macros come from the local nutrient database (one serving of the
+matched food). Rows whose food is not in the database, including the
+placeholders saved when the analysis failed, are not counted as meals.
+rebuild() recomputes the table from HealthData for backfills.
+"""
+
+# Standard library imports
+from datetime import datetime, timedelta
+
+# Third-party imports
+from sqlalchemy import select, delete, update
+from sqlalchemy.exc import IntegrityError
+
+# Local imports
+import nutrition_db
+
+PERIODS = ('day', 'week')
+
+# Totals kept per rollup row, mapped from nutrient database fields
+ROLLUP_FIELDS = {
+    'calories': 'kcal',
+    'protein_g': 'protein_g',
+    'carbs_g': 'carbs_g',
+    'fat_g': 'fat_g',
+}
+
+# HealthData rows read per batch during a rebuild
+BATCH_SIZE = 1000
+
+
+def period_start(timestamp, period):
+    """First day of the day/week (weeks start on Monday) containing timestamp"""
+    day = timestamp.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def meal_nutrients(food_name):
+    """Reference macros for one serving of a food, None if it is not in the database"""
+    reference = nutrition_db.lookup(food_name)
+    if not reference:
+        return None
+    return {column: reference[field] for column, field in ROLLUP_FIELDS.items()}
+
+
+def record_meal(session, NutritionRollup, health_data):
+    """
+    Add a new HealthData row to its user's day and week rollups.
+
+    Runs inside the caller's transaction; the caller commits. Existing rows are
+    incremented with an atomic UPDATE, and a concurrent insert of the same
+    period is retried as an update.
+
+    Returns:
+        bool: False if the meal was not counted (failed analysis or no food matched)
+    """
+    nutrients = meal_nutrients(health_data.food_name)
+    if nutrients is None:
+        return False
+    timestamp = health_data.timestamp or datetime.utcnow()
+    for period in PERIODS:
+        _increment(session, NutritionRollup, health_data.user_id, period,
+                   period_start(timestamp, period), nutrients)
+    return True
+
+
+def _increment(session, NutritionRollup, user_id, period, start, nutrients):
+    key = (
+        (NutritionRollup.user_id == user_id)
+        & (NutritionRollup.period == period)
+        & (NutritionRollup.period_start == start)
+    )
+    values = {'meals': NutritionRollup.meals + 1, 'updated_at': datetime.utcnow()}
+    for column, amount in nutrients.items():
+        values[column] = getattr(NutritionRollup, column) + amount
+
+    result = session.execute(update(NutritionRollup).where(key).values(**values))
+    if result.rowcount:
+        return
+
+    try:
+        with session.begin_nested():
+            session.add(NutritionRollup(
+                user_id=user_id, period=period, period_start=start, meals=1,
+                updated_at=datetime.utcnow(), **nutrients
+            ))
+    except IntegrityError:
+        # Another worker created the row first; add to it instead
+        session.execute(update(NutritionRollup).where(key).values(**values))
+
+
+def rebuild(session, HealthData, NutritionRollup, user_id=None, batch_size=BATCH_SIZE, progress=None):
+    """
+    Recompute rollups from HealthData (for one user, or everyone).
+
+    HealthData is streamed in id order in batches; totals are accumulated in
+    memory per (user, period, start), which is O(days) rather than O(meals).
+
+    Returns:
+        int: number of rollup rows written
+    """
+    totals = {}
+    last_id = 0
+    scanned = 0
+    while True:
+        stmt = (
+            select(HealthData.id, HealthData.user_id, HealthData.timestamp, HealthData.food_name)
+            .where(HealthData.id > last_id)
+            .order_by(HealthData.id)
+            .limit(batch_size)
+        )
+        if user_id is not None:
+            stmt = stmt.where(HealthData.user_id == user_id)
+        rows = session.execute(stmt).all()
+        if not rows:
+            break
+
+        for row in rows:
+            nutrients = meal_nutrients(row.food_name)
+            if nutrients is None:
+                continue
+            timestamp = row.timestamp or datetime.utcnow()
+            for period in PERIODS:
+                key = (row.user_id, period, period_start(timestamp, period))
+                entry = totals.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0.0) | {'meals': 0})
+                entry['meals'] += 1
+                for column, amount in nutrients.items():
+                    entry[column] += amount
+
+        scanned += len(rows)
+        last_id = rows[-1].id
+        if progress:
+            progress(scanned)
+
+    clear = delete(NutritionRollup)
+    if user_id is not None:
+        clear = clear.where(NutritionRollup.user_id == user_id)
+    session.execute(clear)
+
+    now = datetime.utcnow()
+    session.add_all(
+        NutritionRollup(user_id=uid, period=period, period_start=start, updated_at=now, **entry)
+        for (uid, period, start), entry in totals.items()
+    )
+    session.commit()
+    return len(totals)
+
+
+def trend(session, NutritionRollup, user_id, period='day', limit=30):
+    """
+    Return the most recent rollups for a user, oldest first, for charts.
+
+    Returns:
+        list: dicts with period_start (ISO date), meals and the totals
+    """
+    rows = session.execute(
+        select(NutritionRollup)
+        .where(NutritionRollup.user_id == user_id, NutritionRollup.period == period)
+        .order_by(NutritionRollup.period_start.desc())
+        .limit(limit)
+    ).scalars().all()
+    return [
+        {
+            'period_start': row.period_start.isoformat(),
+            'meals': row.meals,
+            **{column: round(getattr(row, column), 1) for column in ROLLUP_FIELDS},
+        }
+        for row in reversed(rows)
+    ]
@@ -0,0 +1,34 @@
+// Debug: Log page load and attach event listeners
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('Admin dashboard loaded');
+
+    const deleteButtons = document.querySelectorAll('.btn-delete');
+    console.log('Found', deleteButtons.length, 'delete buttons');
+
+    deleteButtons.forEach(function(button) {
+        button.addEventListener('click', function() {
+            const userId = this.getAttribute('data-user-id');
+            const userEmail = this.getAttribute('data-user-email');
+
+            console.log('Delete button clicked for user:', userId, userEmail);
+
+            const message = '⚠️ Are you sure you want to delete user ' + userEmail + '?\n\n' +
+                          'This will permanently delete:\n' +
+                          '- User account\n' +
+                          '- All health data\n' +
+                          '- Email verifications\n' +
+                          '- Password reset tokens\n\n' +
+                          'This action CANNOT be undone!';
+
+            if (confirm(message)) {
+                console.log('User confirmed deletion, submitting form...');
+                const form = document.getElementById('delete-form-' + userId);
+                console.log('Form action:', form.action);
+                console.log('Form method:', form.method);
+                form.submit();
+            } else {
+                console.log('User cancelled deletion');
+            }
+        });
+    });
+});
@@ -0,0 +1,50 @@
+// Preview uploaded image
+function previewImage(input) {
+    const preview = document.getElementById('preview');
+    if (input.files && input.files[0]) {
+        const reader = new FileReader();
+        reader.onload = function(e) {
+            preview.src = e.target.result;
+            preview.style.display = 'block';
+        }
+        reader.readAsDataURL(input.files[0]);
+    }
+}
+
+// Calculate BMI and other metrics when form inputs change
+document.addEventListener('DOMContentLoaded', function() {
+    const ageInput = document.getElementById('age');
+    const heightInput = document.getElementById('height');
+    const weightInput = document.getElementById('weight');
+
+    const updateMetrics = function() {
+        const age = parseFloat(ageInput.value) || 0;
+        const height = parseFloat(heightInput.value) || 0;
+        const weight = parseFloat(weightInput.value) || 0;
+
+        if (height > 0 && weight > 0) {
+            // Calculate BMI
+            const heightInMeters = height / 100;
+            const bmi = weight / (heightInMeters * heightInMeters);
+            document.getElementById('bmi-value').textContent = bmi.toFixed(1);
+
+            // Estimate daily caloric needs (using Harris-Benedict equation)
+            let bmr = 0;
+            if (age > 0) {
+                // Simplified calculation - would need gender specifics for accuracy
+                bmr = 10 * weight + 6.25 * height - 5 * age;
+                // Adding activity factor of 1.2 (sedentary)
+                const calories = Math.round(bmr * 1.2);
+                document.getElementById('calories-value').textContent = calories;
+            }
+
+            // Recommended water intake (ml) based on weight
+            const waterIntake = (weight * 0.033).toFixed(1);
+            document.getElementById('water-value').textContent = waterIntake;
+        }
+    };
+
+    ageInput.addEventListener('input', updateMetrics);
+    heightInput.addEventListener('input', updateMetrics);
+    weightInput.addEventListener('input', updateMetrics);
+});
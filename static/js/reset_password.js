@@ -0,0 +1,51 @@
+const passwordInput = document.getElementById('password');
+const confirmPasswordInput = document.getElementById('confirm_password');
+const passwordStrength = document.getElementById('passwordStrength');
+const passwordMatch = document.getElementById('passwordMatch');
+const form = document.getElementById('resetForm');
+
+// Password strength checker
+passwordInput.addEventListener('input', function() {
+    const password = this.value;
+    let strength = '';
+    let strengthClass = '';
+
+    if (password.length === 0) {
+        strength = '';
+    } else if (password.length < 6) {
+        strength = 'Weak - Password must be at least 6 characters';
+        strengthClass = 'weak';
+    } else if (password.length < 8) {
+        strength = 'Medium - Consider using more characters';
+        strengthClass = 'medium';
+    } else {
+        strength = 'Strong password';
+        strengthClass = 'strong';
+    }
+
+    passwordStrength.textContent = strength;
+    passwordStrength.className = 'password-strength ' + strengthClass;
+});
+
+// Password match checker
+function checkPasswordMatch() {
+    if (confirmPasswordInput.value && passwordInput.value !== confirmPasswordInput.value) {
+        passwordMatch.style.display = 'block';
+        confirmPasswordInput.setCustomValidity('Passwords do not match');
+    } else {
+        passwordMatch.style.display = 'none';
+        confirmPasswordInput.setCustomValidity('');
+    }
+}
+
+passwordInput.addEventListener('input', checkPasswordMatch);
+confirmPasswordInput.addEventListener('input', checkPasswordMatch);
+
+// Form validation
+form.addEventListener('submit', function(e) {
+    if (passwordInput.value !== confirmPasswordInput.value) {
+        e.preventDefault();
+        passwordMatch.style.display = 'block';
+        confirmPasswordInput.focus();
+    }
+});
@@ -0,0 +1,12 @@
+// Auto-format OTP input (numbers only)
+document.getElementById('otp').addEventListener('input', function(e) {
+    this.value = this.value.replace(/[^0-9]/g, '');
+});
+
+// Auto-submit when 6 digits are entered
+document.getElementById('otp').addEventListener('input', function(e) {
+    if (this.value.length === 6) {
+        // Optional: auto-submit (commented out for user control)
+        // this.form.submit();
+    }
+});
@@ -0,0 +1,172 @@
+"""
+Structured, low-overhead logging.
+
+- JSON records (or plain text with LOG_FORMAT=text) with level, logger,
+  message, request id and any `extra` fields
+- a QueueHandler so request threads only enqueue records; a background
+  QueueListener does the formatting and the blocking stdout write
+- a request id per request (taken from X-Request-ID or generated) attached
+  to every record and echoed in the response header
+- sampling for hot-path loggers: INFO/DEBUG records from loggers created
+  with a sample rate are kept with that probability; warnings always pass
+"""
+
+# Standard library imports
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# Third-party imports
+from flask import g, request, has_request_context
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+
+# Default keep-probability for INFO/DEBUG records of hot-path loggers
+HOT_PATH_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+
+ROOT_LOGGER = 'food_insight'
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id (or '-') to every record"""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep INFO/DEBUG records with the given probability"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Render the message and traceback on the caller's thread, keep extras intact"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} [{getattr(record, 'request_id', '-')}] {record.getMessage()}"
+        extras = {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS and not k.startswith('_')}
+        if extras:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in extras.items())
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+def configure():
+    """Install the queue handler on the application's root logger (idempotent)"""
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is not None:
+        return root
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    # The request id must be captured on the request thread, before queueing
+    queue_handler.addFilter(RequestIdFilter())
+
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def get_logger(name=None, sample_rate=None):
+    """
+    Return a logger under the application's root logger.
+
+    Args:
+        name (str): Suffix, e.g. 'auth' gives 'food_insight.auth'
+        sample_rate (float): Keep-probability for INFO/DEBUG records (hot paths)
+    """
+    logger = logging.getLogger(f'{ROOT_LOGGER}.{name}' if name else ROOT_LOGGER)
+    if sample_rate is not None and not any(isinstance(f, SamplingFilter) for f in logger.filters):
+        logger.addFilter(SamplingFilter(sample_rate))
+    return logger
+
+
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming[:64] if incoming else uuid.uuid4().hex[:16]
+
+
+def _echo_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def init_app(app):
+    """Configure logging and assign a request id to every request"""
+    configure()
+    app.before_request(_assign_request_id)
+    app.after_request(_echo_request_id)
+
+
+def redact_url(url):
+    """Strip credentials from a database URL before logging it"""
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return url
+    if '@' in rest:
+        rest = rest.split('@', 1)[1]
+    return f'{scheme}://{rest}'
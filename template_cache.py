@@ -0,0 +1,103 @@
+"""
+Template compilation cache and fragment cache.
+
+- bytecode cache: compiled templates are stored in TEMPLATE_CACHE_DIR
+  (default instance/jinja_cache) and shared by every gunicorn worker, so
+  only the first process to render a template compiles it; entries are
+  keyed by the template source checksum and written atomically by Jinja.
+  Run precompile_templates.py at deploy to fill it before traffic arrives.
+- fragment cache (opt-in, FRAGMENT_CACHE=1): static sections of a template
+  wrapped in
+
+      {% cache 'login-form' %} ... {% endcache %}
+
+  are rendered once per worker and then served from memory. Extra
+  arguments become part of the key ({% cache 'menu', user_id %}). Only
+  wrap markup that does not depend on the request (no flashed messages,
+  CAPTCHA images or user data); names must be unique across templates.
+"""
+
+# Standard library imports
+import os
+import threading
+from collections import OrderedDict
+
+# Third-party imports
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+# Local imports
+import structured_logging
+
+FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE', '0').lower() in ('1', 'true', 'yes')
+
+# Fragments kept per worker (least recently used are dropped)
+FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', '256'))
+
+logger = structured_logging.get_logger('template_cache')
+
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache name[, vary...] %}...{% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, caller):
+        if not FRAGMENT_CACHE_ENABLED:
+            return caller()
+        key = tuple(key)
+        with _fragments_lock:
+            if key in _fragments:
+                _fragments.move_to_end(key)
+                return _fragments[key]
+        value = caller()
+        with _fragments_lock:
+            _fragments[key] = value
+            while len(_fragments) > FRAGMENT_CACHE_SIZE:
+                _fragments.popitem(last=False)
+        return value
+
+
+def clear_fragments():
+    with _fragments_lock:
+        _fragments.clear()
+
+
+def cache_dir(app):
+    return os.getenv('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+
+
+def precompile(app):
+    """Compile every template into the bytecode cache; returns (compiled, failed) names"""
+    compiled, failed = [], []
+    for name in sorted(app.jinja_env.list_templates(extensions=('html',))):
+        try:
+            app.jinja_env.get_template(name)
+            compiled.append(name)
+        except Exception as e:
+            logger.warning("Could not compile template %s: %s", name, e)
+            failed.append(name)
+    return compiled, failed
+
+
+def init_app(app):
+    """Register the fragment cache tag and the shared bytecode cache"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    directory = cache_dir(app)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        logger.warning("Template bytecode cache disabled: %s", e)
+        return
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,44 @@
+import pytest
+
+import compressed_text
+
+
+def test_zlib_round_trip_has_no_dictionary():
+    value = '<ul><li>Calories: 450 kcal</li></ul>' * 20
+    stored = compressed_text.compress(value, codec=compressed_text.ZLIB)
+    assert stored.startswith('\x01z:')
+    assert compressed_text.dictionary_of(stored) is None
+    assert compressed_text.decompress(stored) == value
+
+
+def test_dictionary_id_is_read_from_the_marker():
+    assert compressed_text.dictionary_of('\x01dabcdef12:AAAA') == 'abcdef12'
+    # Values written before ids were recorded
+    assert compressed_text.dictionary_of('\x01d:AAAA') == ''
+    assert compressed_text.dictionary_of('plain text') is None
+
+
+def test_values_are_read_with_the_dictionary_that_wrote_them(monkeypatch):
+    pytest.importorskip('zstandard')
+    monkeypatch.setattr(compressed_text, '_codecs', {})
+    monkeypatch.setattr(compressed_text, 'DICT_PATH', None)
+    monkeypatch.setattr(compressed_text, 'OLD_DICT_PATHS', [])
+    samples = [f'<ul><li>Calories: {n} kcal</li><li>Protein: {n % 40} g</li></ul>' * 3 for n in range(400)]
+    value = samples[7] * 2
+
+    compressed_text.set_dictionary(compressed_text.train_dictionary(samples[:200], size=4096))
+    first = compressed_text.compress(value)
+    first_id = compressed_text.dictionary_of(first)
+    assert first_id == compressed_text.current_dictionary_id()
+
+    # Retrained dictionary: old values still decode with the old one
+    compressed_text.set_dictionary(compressed_text.train_dictionary(samples[200:], size=4096))
+    second = compressed_text.compress(value)
+    assert compressed_text.dictionary_of(second) != first_id
+    assert compressed_text.decompress(first) == value
+    assert compressed_text.decompress(second) == value
+
+    # Without the old dictionary the error names the missing id
+    del compressed_text._codecs['dicts'][first_id]
+    with pytest.raises(ValueError, match=first_id):
+        compressed_text.decompress(first)
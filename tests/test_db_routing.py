@@ -0,0 +1,44 @@
+import time
+
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+import db_routing
+
+
+def _app(tmp_path, monkeypatch, replica_url):
+    monkeypatch.setenv('DATABASE_REPLICA_URL', replica_url)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'primary.db'}"
+    app.config['SECRET_KEY'] = 'test'
+    db_routing.configure(app)
+    db = SQLAlchemy(app, session_options={'class_': db_routing.RoutingSession})
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+
+    db_routing.init_app(app, db)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Item())
+        db.session.commit()
+
+    @app.route('/items')
+    @db_routing.read_only
+    def items():
+        return jsonify(count=db.session.scalar(db.select(db.func.count()).select_from(Item)))
+
+    return app
+
+
+def test_read_falls_back_to_primary_on_non_disconnect_error(tmp_path, monkeypatch):
+    # An unopenable SQLite file raises OperationalError that is not a disconnect
+    app = _app(tmp_path, monkeypatch, f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    # The last health check passed, so the read is routed to the replica
+    monkeypatch.setattr(db_routing, '_health', {'checked_at': time.monotonic(), 'healthy': True})
+
+    response = app.test_client().get('/items')
+
+    assert response.status_code == 200
+    assert response.json == {'count': 1}
+    assert db_routing._health['healthy'] is False
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import db_sqlite
+
+
+def _engine(path):
+    engine = create_engine(f'sqlite:///{path}')
+    db_sqlite.configure_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS item (id INTEGER PRIMARY KEY, name TEXT)'))
+    return engine
+
+
+def test_read_then_write_sessions_wait_for_the_lock(tmp_path):
+    # Like a request: look something up, then insert. Each thread has its own
+    # connection; none may fail with "database is locked" within busy_timeout.
+    engine = _engine(tmp_path / 'app.db')
+    errors = []
+    barrier = threading.Barrier(6)
+
+    def register(index):
+        barrier.wait()
+        for attempt in range(10):
+            try:
+                with Session(engine) as session:
+                    session.execute(text('SELECT count(*) FROM item')).scalar()
+                    time.sleep(0.002)
+                    session.execute(text('INSERT INTO item (name) VALUES (:name)'), {'name': f'{index}-{attempt}'})
+                    session.commit()
+            except OperationalError as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=register, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT count(*) FROM item')).scalar() == 60
+
+
+def test_write_queue_commits_jobs_in_savepoints(tmp_path):
+    path = tmp_path / 'app.db'
+    _engine(path).dispose()
+    writer = db_sqlite.writer_engine(f'sqlite:///{path}')
+    write_queue = db_sqlite.WriteQueue(lambda: db_sqlite.write_session(writer))
+
+    def insert(session):
+        session.execute(text("INSERT INTO item (name) VALUES ('ok')"))
+
+    def fail(session):
+        session.execute(text("INSERT INTO item (name) VALUES ('failed')"))
+        raise ValueError('job failed')
+
+    futures = [write_queue.submit(job) for job in (insert, fail, insert)]
+    outcomes = [future.exception(timeout=10) for future in futures]
+    assert [type(outcome) for outcome in outcomes] == [type(None), ValueError, type(None)]
+    with writer.connect() as conn:
+        assert conn.execute(text('SELECT name FROM item ORDER BY id')).scalars().all() == ['ok', 'ok']
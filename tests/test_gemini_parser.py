@@ -0,0 +1,34 @@
+import json
+
+import gemini_parser
+
+ANALYSIS = {
+    'food_name': 'Masala Dosa',
+    'nutrition': '<ul><li>Calories: 350 kcal</li></ul>',
+    'good_for_user': 'Suitable in moderation',
+    'diet_plan': 'Track meals like this:\n```\nbreakfast: dosa\n```\nand add {protein} at lunch',
+    'recommendation': 'Add sambar for protein',
+}
+
+
+def test_fences_inside_string_values_are_kept():
+    text = f"```json\n{json.dumps(ANALYSIS)}\n```\nNote: values are estimates."
+    assert gemini_parser.parse_response(text) == ANALYSIS
+
+
+def test_trailing_commas_and_leading_prose():
+    text = 'Sure! {not json} ' + json.dumps(ANALYSIS, indent=2)[:-2] + ',\n}'
+    assert gemini_parser.parse_response(text) == ANALYSIS
+
+
+def test_escaped_quotes_do_not_end_a_string():
+    spans = list(gemini_parser._object_spans('x {"a": "q\\"}"} y {"b": 1}'))
+    assert spans == [(2, 15), (18, 26)]
+
+
+def test_truncated_response_falls_back_to_key_values():
+    text = json.dumps(ANALYSIS)[:-30]
+    result = gemini_parser.parse_response(text)
+    assert result['food_name'] == 'Masala Dosa'
+    assert result['diet_plan'] == ANALYSIS['diet_plan']
+    assert result['recommendation'] == gemini_parser.MISSING_VALUE
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+
+
+def _write_snapshot(directory, pid, checked_out, queries):
+    with open(os.path.join(directory, f'{pid}.json'), 'w') as snapshot_file:
+        json.dump({
+            'counters': {'db_queries_total': [[[], queries]]},
+            'histograms': {},
+            'gauges': {'db_pool_checked_out': [[[], checked_out]]},
+        }, snapshot_file)
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_gauges_of_exited_workers_are_dropped_but_counters_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    _write_snapshot(tmp_path, os.getpid(), checked_out=2, queries=10)
+    _write_snapshot(tmp_path, _dead_pid(), checked_out=7, queries=5)
+
+    counters, _, gauges = metrics._merged()
+
+    assert gauges['db_pool_checked_out'][()] == 2
+    assert counters['db_queries_total'][()] == 15
@@ -0,0 +1,26 @@
+import nutrition_db
+
+
+def _match(query):
+    result = nutrition_db.get_table().match(query)
+    return None if result is None else (nutrition_db.get_table().names[result[0]], result[1])
+
+
+def test_exact_and_misspelt_names_match():
+    assert _match('Chicken Biryani') == ('Chicken biryani', 1.0)
+    assert _match('chiken biryani') == ('Chicken biryani', 1.0)
+
+
+def test_dish_with_unknown_head_noun_does_not_match_its_ingredient():
+    for query in ('apple pie', 'apple anything', 'chocolate milkshake'):
+        assert _match(query) is None, query
+
+
+def test_unknown_words_lower_the_score():
+    name, score = _match('crunchy apple')
+    assert name == 'Apple'
+    assert nutrition_db.MATCH_CUTOFF <= score < 1.0
+
+
+def test_side_dishes_keep_the_main_food():
+    assert _match('burger with fries')[0] == 'Burger'
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+import passwords
+
+OLD_HASH = generate_password_hash('correct horse', 'pbkdf2:sha256:1000')
+
+
+def test_outdated_hash_is_upgraded_on_verify():
+    ok, new_hash = passwords.verify(OLD_HASH, 'correct horse')
+    assert ok
+    assert passwords.stored_method(new_hash) == passwords.METHOD
+
+
+def test_wrong_password_is_rejected():
+    assert passwords.verify(OLD_HASH, 'wrong') == (False, None)
+
+
+def test_full_hashing_queue_skips_the_rehash_but_accepts_the_password(monkeypatch):
+    def busy(password, method=None):
+        raise passwords.HashingBusy('Password hashing queue is full')
+
+    monkeypatch.setattr(passwords, 'hash_password', busy)
+    assert passwords.verify(OLD_HASH, 'correct horse') == (True, None)
+
+
+def test_queue_limit_holds_across_processes(tmp_path, monkeypatch):
+    pytest.importorskip('fcntl')
+    monkeypatch.setattr(passwords, 'SLOT_DIR', str(tmp_path))
+    monkeypatch.setattr(passwords, 'QUEUE_LIMIT', 1)
+    monkeypatch.setattr(passwords, 'WAIT_SECONDS', 0.1)
+    # Another worker process holds the only slot
+    holder = subprocess.Popen(
+        [sys.executable, '-c',
+         'import fcntl, sys, time\n'
+         f'slot = open({str(tmp_path / "slot-0")!r}, "a")\n'
+         'fcntl.flock(slot, fcntl.LOCK_EX)\n'
+         'print("held", flush=True)\n'
+         'sys.stdin.read()\n'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'held'
+        with pytest.raises(passwords.HashingBusy):
+            passwords.hash_password('correct horse')
+    finally:
+        holder.stdin.close()
+        holder.wait(timeout=10)
+    # Released when the other process exits
+    assert passwords.verify(OLD_HASH, 'correct horse')[0]
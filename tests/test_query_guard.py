@@ -0,0 +1,58 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+import query_guard
+
+
+def _app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+
+    query_guard.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    @app.route('/add/<int:count>', methods=['POST'])
+    @query_guard.budget(2)
+    def add(count):
+        for _ in range(count):
+            db.session.add(Item())
+            db.session.flush()
+        db.session.commit()
+        return 'ok'
+
+    def count_items():
+        with app.app_context():
+            return db.session.scalar(db.select(db.func.count()).select_from(Item))
+
+    return app, count_items
+
+
+def test_raise_mode_aborts_before_the_view_commits(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_guard, 'QUERY_GUARD_MODE', 'raise')
+    app, count_items = _app(tmp_path)
+
+    response = app.test_client().post('/add/2')
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '2'
+
+    app.testing = True
+    with pytest.raises(query_guard.QueryBudgetExceeded, match=r'3 queries \(budget 2\)'):
+        app.test_client().post('/add/3')
+    # The over-budget request wrote nothing
+    assert count_items() == 2
+
+
+def test_warn_mode_lets_the_request_finish(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_guard, 'QUERY_GUARD_MODE', 'warn')
+    app, count_items = _app(tmp_path)
+
+    response = app.test_client().post('/add/3')
+    assert response.status_code == 200
+    assert response.headers['X-Query-Count'] == '3'
+    assert count_items() == 3
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATABASE_URL', f"sqlite:///{tmp_path_factory.mktemp('db') / 'app.db'}")
+        mp.setenv('RATE_LIMIT_BACKEND', 'off')
+        import app as app_module
+    with app_module.app.app_context():
+        app_module.db.create_all()
+    return app_module
+
+
+def _result(app_module):
+    A = app_module
+    with A.app.app_context():
+        owner = A.User(name='owner', email='owner@example.com', password='x', number='1', gender='female')
+        A.db.session.add(owner)
+        A.db.session.commit()
+        row = A.HealthData(user_id=owner.id, age=30, height=170, weight=70, food_name='Apple',
+                           nutrition_info='<ul><li>Calories: 95 kcal</li></ul>', assessment='Good for you',
+                           diet_plan='Eat more fruit', recommendation='Keep it up',
+                           food_image='apple.jpg', timestamp=datetime(2026, 10, 14, 12, 0))
+        A.db.session.add(row)
+        A.db.session.commit()
+        return owner.id, row.id
+
+
+def test_result_is_only_shown_to_its_owner(app_module):
+    owner_id, result_id = _result(app_module)
+    client = app_module.app.test_client()
+
+    assert client.get(f'/result/{result_id}').status_code == 404
+    with client.session_transaction() as session:
+        session['user_id'] = owner_id + 1
+    # A share parameter no longer grants access
+    assert client.get(f'/result/{result_id}?share=anything').status_code == 404
+
+    with client.session_transaction() as session:
+        session['user_id'] = owner_id
+    response = client.get(f'/result/{result_id}')
+    assert response.status_code == 200
+    assert b'share' not in response.data.lower()
@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, Column, Date, DateTime, Float, Integer, String, UniqueConstraint, select
+from sqlalchemy.orm import Session, declarative_base
+
+import rollups
+
+Base = declarative_base()
+
+
+class NutritionRollup(Base):
+    __tablename__ = 'nutrition_rollup'
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    period = Column(String(5), nullable=False)
+    period_start = Column(Date, nullable=False)
+    meals = Column(Integer, default=0, nullable=False)
+    calories = Column(Float, default=0.0, nullable=False)
+    protein_g = Column(Float, default=0.0, nullable=False)
+    carbs_g = Column(Float, default=0.0, nullable=False)
+    fat_g = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime)
+    __table_args__ = (UniqueConstraint('user_id', 'period', 'period_start'),)
+
+
+def _session():
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def _meal(food_name):
+    return SimpleNamespace(user_id=1, food_name=food_name, timestamp=datetime(2026, 10, 14, 12, 0))
+
+
+def test_matched_meal_is_added_to_day_and_week():
+    session = _session()
+    assert rollups.record_meal(session, NutritionRollup, _meal('Chicken Biryani')) is True
+    day = session.execute(select(NutritionRollup).where(NutritionRollup.period == 'day')).scalar_one()
+    assert day.period_start == date(2026, 10, 14)
+    assert day.meals == 1
+    assert day.calories > 0
+
+
+def test_failed_analysis_and_unknown_food_are_not_counted():
+    session = _session()
+    for food_name in ('Analysis Failed', 'Network Error', 'Could not analyze food properly', 'Zorblax stew', None):
+        assert rollups.record_meal(session, NutritionRollup, _meal(food_name)) is False, food_name
+    assert session.execute(select(NutritionRollup)).first() is None
@@ -0,0 +1,239 @@
+"""
+Sharded upload folder and the background orphan collector.
+
+Food images are stored under hash-prefix subdirectories instead of one
+flat folder:
+
+    uploads/3f/<uuid><name>.jpg        UPLOAD_SHARD_LEVELS=1 (default)
+    uploads/3f/a2/<uuid><name>.jpg     UPLOAD_SHARD_LEVELS=2
+
+The prefix is taken from the SHA-1 of the filename, so a file's place
+follows from its name alone: HealthData.food_image and /uploads/<name>
+URLs keep the bare filename. One level (256 directories) keeps each
+directory at a few thousand entries up to about a million files; use two
+levels beyond that. Files saved before the layout existed (directly in
+uploads/, or at another UPLOAD_SHARD_LEVELS) are still found by locate()
+if they sit at the top level; migrate_uploads.py moves everything into
+place.
+
+Orphan collector (UPLOAD_GC_INTERVAL seconds, default 6 h; 0 disables):
+a daemon thread in each worker wakes up every few minutes and, once the
+last collection is older than the interval, runs the collect function
+given to init_app() (purge.delete_orphan_uploads(): files are streamed
+with os.scandir and checked against the database batch by batch, so
+memory stays bounded however many files there are). An flock on
+UPLOAD_GC_LOCK lets only one worker collect at a time, and the lock
+file's mtime records when the last collection finished.
+"""
+
+# Standard library imports
+import os
+import time
+import random
+import hashlib
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker collects
+    fcntl = None
+
+# Local imports
+import metrics
+import structured_logging
+
+SHARD_LEVELS = int(os.getenv('UPLOAD_SHARD_LEVELS', '1'))
+# Hex digits of the hash per level (2 = 256 directories per level)
+SHARD_WIDTH = 2
+
+GC_INTERVAL = int(os.getenv('UPLOAD_GC_INTERVAL', str(6 * 3600)))
+GC_LOCK = os.getenv('UPLOAD_GC_LOCK', os.path.join(tempfile.gettempdir(), 'food_insight_upload_gc.lock'))
+# How often each worker checks whether a collection is due
+GC_CHECK_SECONDS = min(300, max(GC_INTERVAL, 1))
+
+logger = structured_logging.get_logger('uploads')
+
+_collector = None
+
+
+# Layout
+
+def relative_path(filename, levels=SHARD_LEVELS):
+    """Path of filename inside the upload folder, e.g. '3f/<filename>'"""
+    name = os.path.basename(filename)
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    shards = [digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH] for level in range(levels)]
+    return os.path.join(*shards, name)
+
+
+def path(upload_folder, filename):
+    """Where filename belongs in upload_folder"""
+    return os.path.join(upload_folder, relative_path(filename))
+
+
+def save(file, upload_folder, filename):
+    """Save an uploaded FileStorage under its shard directory; returns the path"""
+    destination = path(upload_folder, filename)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    file.save(destination)
+    return destination
+
+
+def locate(upload_folder, filename):
+    """Path of an existing upload (sharded, or flat from before the layout), or None"""
+    if not upload_folder or not filename:
+        return None
+    name = os.path.basename(filename)
+    for candidate in (path(upload_folder, name), os.path.join(upload_folder, name)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def iter_files(folder):
+    """
+    Yield an os.DirEntry for every file below folder, at any depth.
+
+    Directories are read with os.scandir one at a time, so only the
+    entries of the directories on the current path are held in memory.
+    """
+    try:
+        entries = os.scandir(folder)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from iter_files(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+            except OSError:
+                continue
+
+
+def _prune_empty_dirs(folder, top=True):
+    """Remove empty subdirectories of folder (left behind by migrate())"""
+    try:
+        entries = os.scandir(folder)
+    except OSError:
+        return
+    with entries:
+        subdirs = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+    for subdir in subdirs:
+        _prune_empty_dirs(subdir, top=False)
+    if not top:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+
+
+def migrate(upload_folder, dry_run=False, keep=(), progress=None):
+    """
+    Move every file of upload_folder that is not at its sharded path there.
+
+    Renames stay on one filesystem, so each move is atomic and an
+    interrupted migration can simply be run again. A file whose sharded
+    path is already taken is left where it is and counted as a conflict.
+
+    Returns:
+        dict: 'moved', 'bytes' and 'conflicts'
+    """
+    totals = {'moved': 0, 'bytes': 0, 'conflicts': 0}
+    for entry in iter_files(upload_folder):
+        if entry.name in keep:
+            continue
+        destination = path(upload_folder, entry.name)
+        if os.path.abspath(entry.path) == os.path.abspath(destination):
+            continue
+        if os.path.exists(destination):
+            totals['conflicts'] += 1
+            logger.warning("Upload already exists at its sharded path", extra={'file': entry.path})
+            continue
+        size = entry.stat().st_size
+        if not dry_run:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            os.replace(entry.path, destination)
+        totals['moved'] += 1
+        totals['bytes'] += size
+        if progress and totals['moved'] % 100 == 0:
+            progress('uploads', totals['moved'])
+    if not dry_run:
+        _prune_empty_dirs(upload_folder)
+    return totals
+
+
+# Orphan collector
+
+class OrphanCollector:
+    """Daemon thread running collect() every interval seconds in one worker at a time"""
+
+    def __init__(self, app, collect, interval=GC_INTERVAL, lock_path=GC_LOCK):
+        self.app = app
+        self.collect = collect
+        self.interval = interval
+        self.lock_path = lock_path
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started lazily, and again in each forked worker
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='upload-gc', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            # Jitter so workers started together do not all wake at once
+            time.sleep(GC_CHECK_SECONDS * random.uniform(0.8, 1.2))
+            try:
+                self.run_if_due()
+            except Exception as e:
+                logger.exception("Orphaned upload collection failed: %s", e)
+
+    def run_if_due(self):
+        """Collect if no other worker is and the last run is older than the interval"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+            # A new lock file counts as a fresh run, so nothing is collected right at startup
+            if time.time() - os.fstat(lock_file.fileno()).st_mtime < self.interval:
+                return None
+            start = time.perf_counter()
+            with self.app.app_context():
+                result = self.collect()
+            os.utime(self.lock_path)
+        seconds = time.perf_counter() - start
+        metrics.observe('upload_gc_seconds', seconds)
+        metrics.inc('upload_gc_deleted_files_total', amount=result['files'])
+        logger.info("Collected orphaned uploads", extra={
+            'files': result['files'], 'bytes': result['bytes'], 'duration_ms': round(seconds * 1000, 1),
+        })
+        return result
+
+
+def init_app(app, collect):
+    """
+    Start the orphan collector in each worker on its first request.
+
+    Args:
+        collect (callable): collect() deletes orphaned files (run inside
+            an app context) and returns a dict with 'files' and 'bytes'
+    """
+    global _collector
+    if GC_INTERVAL <= 0:
+        return
+    _collector = OrphanCollector(app, collect)
+
+    @app.before_request
+    def start_upload_gc():
+        _collector.ensure_started()